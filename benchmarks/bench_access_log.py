@@ -0,0 +1,133 @@
+"""
+Microbenchmark do custo por linha do access log (`request.end`).
+
+Cenários (handler síncrono escrevendo em /dev/null, salvo indicação):
+  - legacy:       get_logger(...) novo por linha + cópias de dict no adapter
+                  + logger.info (findCaller) + formatter montando dict/json.dumps
+  - fast-json:    log_fields (1 record, sem adapter) + JsonFormatter stdlib
+  - fast-orjson:  idem, com orjson (se instalado)
+  - fast-queued:  custo no chamador com o QueuedStreamHandler (só enfileira)
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_access_log.py [-n 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from collections.abc import Callable
+from typing import Any
+
+from services.shared.logging_utils import (
+    ContextAdapter,
+    JsonFormatter,
+    QueuedStreamHandler,
+    log_fields,
+    orjson,
+)
+
+
+def _legacy_json_format(fmt: JsonFormatter, record: logging.LogRecord) -> str:
+    import json
+
+    payload: dict[str, Any] = {
+        "timestamp": fmt.formatTime(record),
+        "level": record.levelname,
+        "logger": record.name,
+        "message": record.getMessage(),
+    }
+    payload.update(getattr(record, "__extra__", {}))
+    return json.dumps(payload, ensure_ascii=False)
+
+
+class _LegacyFormatter(JsonFormatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return _legacy_json_format(self, record)
+
+
+class _LegacyAdapter(ContextAdapter):
+    def process(self, msg, kwargs):
+        extra_obj = kwargs.pop("extra", None)
+        base = dict(self.extra) if self.extra else {}
+        extra_add = dict(extra_obj) if extra_obj else {}
+        merged = base.copy()
+        merged.update(extra_add)
+        kwargs["extra"] = {"__extra__": merged}
+        return msg, kwargs
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def _ctx(i: int) -> dict[str, Any]:
+    return {
+        "request_id": "3c3c3ad3-0d8e-4f7d-8b1e-f45d9f6b9a11",
+        "tenant_id": "1",
+        "path": "/v1/ping",
+        "method": "GET",
+    }
+
+
+def _time(n: int, fn: Callable[[int], None]) -> float:
+    for i in range(1000):
+        fn(i)
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=100_000)
+    args = ap.parse_args()
+    sink = open(os.devnull, "w")
+
+    def sync_handler(fmt: logging.Formatter) -> logging.Handler:
+        h = logging.StreamHandler(sink)
+        h.setFormatter(fmt)
+        return h
+
+    legacy = _logger("bench.legacy", sync_handler(_LegacyFormatter()))
+
+    def run_legacy(i: int) -> None:
+        ctx = _ctx(i)
+        _LegacyAdapter(legacy, {**ctx, "status": 200, "duration_ms": 1}).info("request.end")
+
+    def run_fast(logger: logging.Logger) -> Callable[[int], None]:
+        def run(i: int) -> None:
+            fields = _ctx(i)
+            fields["status"] = 200
+            fields["duration_ms"] = 1
+            log_fields(logger, logging.INFO, "request.end", fields)
+
+        return run
+
+    results = [("legacy", _time(args.n, run_legacy))]
+    fast_json = _logger("bench.fast.json", sync_handler(JsonFormatter(encoder="json")))
+    results.append(("fast-json", _time(args.n, run_fast(fast_json))))
+    if orjson is not None:
+        fast_or = _logger("bench.fast.orjson", sync_handler(JsonFormatter(encoder="orjson")))
+        results.append(("fast-orjson", _time(args.n, run_fast(fast_or))))
+
+    queued = QueuedStreamHandler(sink, maxsize=args.n + 2000, batch_size=512)
+    queued.setFormatter(JsonFormatter(encoder="auto"))
+    results.append(("fast-queued", _time(args.n, run_fast(_logger("bench.q", queued)))))
+    queued.close()
+
+    base = results[0][1]
+    print(f"{'cenário':<14} {'µs/linha':>10} {'vs legacy':>10}")
+    for label, us in results:
+        print(f"{label:<14} {us:>10.2f} {base / us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark do parser de metadados de imagem (`parse_image_meta`): o custo por
+imagem deve ser O(cabeçalho), igual para 10 KiB ou 16 MiB de pixels.
+
+Para cada formato monta um arquivo sintético (cabeçalhos válidos + payload
+de zeros) em tamanhos crescentes e mede µs/chamada sobre um memoryview do
+buffer. Como referência O(n), mede também `bytes.count` no mesmo buffer
+(uma passada pelos dados, o mínimo de qualquer decode).
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_image_meta.py [-n 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import struct
+import time
+import zlib
+from collections.abc import Callable
+
+from services.sextinha_vision_api.app.image_meta import parse_image_meta
+
+SIZES = (10 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+
+
+def _png_chunk(ctype: bytes, data: bytes) -> bytes:
+    crc = struct.pack(">I", zlib.crc32(ctype + data))
+    return struct.pack(">I", len(data)) + ctype + data + crc
+
+
+def _png(payload: int) -> bytes:
+    ihdr = _png_chunk(b"IHDR", struct.pack(">IIBBBBB", 4000, 3000, 8, 6, 0, 0, 0))
+    return b"\x89PNG\r\n\x1a\n" + ihdr + _png_chunk(b"IDAT", bytes(payload))
+
+
+def _jpeg(payload: int) -> bytes:
+    exif = b"Exif\0\0II" + struct.pack("<HIH", 42, 8, 1) + struct.pack("<HHIHH", 0x112, 3, 1, 6, 0)
+    sof = struct.pack(">BHHB", 8, 3000, 4000, 3) + b"\x01\x11\x00" * 3
+    return (
+        b"\xff\xd8"
+        + b"\xff\xe1"
+        + struct.pack(">H", len(exif) + 2)
+        + exif
+        + b"\xff\xc0"
+        + struct.pack(">H", len(sof) + 2)
+        + sof
+        + b"\xff\xda"
+        + bytes(payload)
+    )
+
+
+def _gif(payload: int) -> bytes:
+    return b"GIF89a" + struct.pack("<HHBBB", 4000, 3000, 0xF7, 0, 0) + bytes(payload)
+
+
+def _webp(payload: int) -> bytes:
+    vp8 = b"\0\0\0\x9d\x01\x2a" + struct.pack("<HH", 4000, 3000) + bytes(payload)
+    chunk = b"VP8 " + struct.pack("<I", len(vp8)) + vp8
+    return b"RIFF" + struct.pack("<I", 4 + len(chunk)) + b"WEBP" + chunk
+
+
+def _bmp(payload: int) -> bytes:
+    header = b"BM" + struct.pack("<IHHI", 54 + payload, 0, 0, 54)
+    info = struct.pack("<IiiHH", 40, 4000, -3000, 1, 24) + bytes(24)
+    return header + info + bytes(payload)
+
+
+BUILDERS: dict[str, Callable[[int], bytes]] = {
+    "png": _png,
+    "jpeg": _jpeg,
+    "gif": _gif,
+    "webp": _webp,
+    "bmp": _bmp,
+}
+
+
+def _us_per_call(n: int, fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20000, help="chamadas por medição")
+    args = ap.parse_args()
+
+    header = f"{'formato':<8}" + "".join(f"{s // 1024:>10} KiB" for s in SIZES)
+    print(header + f"{'ref O(n) 16 MiB':>18}")
+    for fmt, build in BUILDERS.items():
+        row = []
+        data = b""
+        for size in SIZES:
+            data = build(size)
+            view = memoryview(data)
+            assert parse_image_meta(view).width == 4000, fmt
+            row.append(_us_per_call(args.n, lambda v=view: parse_image_meta(v)))
+        scan = _us_per_call(3, lambda d=data: d.count(b"\xff"))
+        cells = "".join(f"{us:>11.2f}µs" for us in row)
+        print(f"{fmt:<8}{cells}{scan:>16.0f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Microbenchmark do custo por request da pilha de middlewares.
+
+Chama a app ASGI diretamente (sem socket/HTTP) para isolar o overhead dos
+middlewares. Todos os cenários com pilha fazem o mesmo trabalho (request-id,
+auth, config, body limit, rate limit, concorrência, CORS, métricas e access
+log); muda só a forma de encadear as etapas:
+  - bare:              app sem middlewares (piso)
+  - per-step-basehttp: desenho antigo, uma BaseHTTPMiddleware por etapa
+                       chamando as mesmas funções das etapas do gateway
+  - per-step-asgi:     as classes por etapa que ainda existem
+                       (RequestIdMiddleware, TenantMiddleware, ...), ASGI puras
+  - gateway:           `apply_middlewares(app)` (pilha real)
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_middleware_stack.py [-n 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+import services.shared.middleware.rate_limit as rl
+from services.shared.app_middleware import apply_middlewares
+from services.shared.logging_utils import get_logger
+from services.shared.middleware.body_limit import (
+    BodySizeLimitMiddleware,
+    check_content_length,
+    request_body_limit,
+)
+from services.shared.middleware.concurrency import (
+    ConcurrencyLimitMiddlewarePerTenant,
+    acquire_concurrency_slot,
+)
+from services.shared.middleware.cors import CORSMiddlewarePerTenant, check_cors
+from services.shared.middleware.metrics import MetricsMiddleware
+from services.shared.middleware.rate_limit import RateLimitMiddlewarePerTenant, check_rate_limit
+from services.shared.middleware.request_logging import RequestLoggingMiddleware
+from services.shared.middleware_utils import (
+    REQUEST_ID_HEADER,
+    TENANT_ID_HEADER,
+    RequestIdMiddleware,
+    TenantMiddleware,
+    _ensure_request_id,
+    authenticate_tenant,
+    build_route_classifier,
+    classify_request,
+    load_tenant_config,
+    requires_tenant,
+)
+
+# --- desenho antigo: uma BaseHTTPMiddleware por etapa ---
+
+
+class _RequestIdStep(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        req_id = _ensure_request_id(request)
+        response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = req_id
+        return response
+
+
+class _TenantStep(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self._classifier = build_route_classifier()
+
+    async def dispatch(self, request: Request, call_next):
+        classify_request(request, self._classifier)
+        if requires_tenant(request):
+            error = authenticate_tenant(request) or load_tenant_config(request)
+            if error is not None:
+                return error
+        response = await call_next(request)
+        tenant = getattr(request.state, "tenant", None)
+        if tenant is not None:
+            response.headers[TENANT_ID_HEADER] = tenant.id
+        return response
+
+
+class _BodyLimitStep(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        error = check_content_length(request, request_body_limit(request))
+        return error or await call_next(request)
+
+
+class _RateLimitStep(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        return check_rate_limit(request) or await call_next(request)
+
+
+class _ConcurrencyStep(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        error, gate = await acquire_concurrency_slot(request)
+        if error is not None:
+            return error
+        try:
+            return await call_next(request)
+        finally:
+            if gate is not None:
+                gate.release()
+
+
+class _CORSStep(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        error, headers = check_cors(request)
+        if error is not None:
+            return error
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
+
+
+def _base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+_PER_STEP: dict[str, tuple[type, ...]] = {
+    # do mais interno para o mais externo (ordem de `add_middleware`)
+    "per-step-basehttp": (
+        _CORSStep,
+        _ConcurrencyStep,
+        _RateLimitStep,
+        _BodyLimitStep,
+        _TenantStep,
+        _RequestIdStep,
+    ),
+    "per-step-asgi": (
+        CORSMiddlewarePerTenant,
+        ConcurrencyLimitMiddlewarePerTenant,
+        RateLimitMiddlewarePerTenant,
+        BodySizeLimitMiddleware,
+        TenantMiddleware,
+        RequestIdMiddleware,
+    ),
+}
+
+
+def build(kind: str) -> FastAPI:
+    app = _base_app()
+    if kind == "gateway":
+        apply_middlewares(app, service="bench")
+    elif kind in _PER_STEP:
+        for cls in _PER_STEP[kind]:
+            app.add_middleware(cls)
+        # métricas e access log iguais aos da pilha real
+        app.add_middleware(MetricsMiddleware, service="bench")
+        app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+
+def _scope(path: str, headers: list[tuple[bytes, bytes]]) -> dict[str, Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def _run(app: FastAPI, path: str, headers: list[tuple[bytes, bytes]], n: int) -> float:
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status: list[int] = []
+
+    async def send(message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    reset: Callable[[], None] = rl._BUCKETS.clear  # evita 429 durante o loop
+
+    for _ in range(200):  # aquecimento (monta a pilha, caches, etc.)
+        reset()
+        await app(_scope(path, headers), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        reset()
+        await app(_scope(path, headers), receive, send)
+    elapsed = time.perf_counter() - start
+
+    assert set(status) == {200}, set(status)
+    return elapsed / n * 1e6
+
+
+def _silence_access_log() -> None:
+    # mantém formatação/escrita no caminho medido, mas descarta a saída
+    get_logger("access")
+    sink = open(os.devnull, "w")
+    for h in logging.getLogger("access").handlers:
+        if isinstance(h, logging.StreamHandler):
+            h.setStream(sink)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5000)
+    args = ap.parse_args()
+    _silence_access_log()
+
+    cases = [
+        ("public /health", "/health", []),
+        ("auth /v1/ping", "/v1/ping", [(b"x-api-key", b"camila123")]),
+    ]
+    print(f"{'cenário':<18} {'rota':<16} {'µs/req':>10} {'overhead':>10}")
+    for label, path, headers in cases:
+        bare = asyncio.run(_run(build("bare"), path, headers, args.n))
+        for kind in ("bare", "per-step-basehttp", "per-step-asgi", "gateway"):
+            us = bare if kind == "bare" else asyncio.run(_run(build(kind), path, headers, args.n))
+            print(f"{kind:<18} {label:<16} {us:>10.1f} {us - bare:>+10.1f}")
+
+
+if __name__ == "__main__":
+    main()
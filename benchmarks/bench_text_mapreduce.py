@@ -0,0 +1,74 @@
+"""
+Benchmark da análise de um documento grande: passada única de `analyze_text`
+(caminho atual, uma thread) vs map-reduce em process pool (`split_text` +
+`count_words` por fatia), variando o número de workers.
+
+O tempo inclui o corte e a serialização das fatias para os processos; o pool é aquecido
+antes de medir (o fork dos workers não entra na conta).
+
+Uso:
+    PYTHONPATH=. python benchmarks/bench_text_mapreduce.py [--mb 20] [-r 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from services.sextinha_text_api.app.analysis import analyze_text, count_words, split_text
+
+_PARAGRAPH = (
+    "Sextinha é braba demais! Olá, mundo — 你好，世界. "
+    "Palavras_com_sublinhado, números 12345 e pontuação... "
+)
+
+
+def _document(mb: float) -> str:
+    size = int(mb * 1024 * 1024)
+    return (_PARAGRAPH * (size // len(_PARAGRAPH) + 1))[:size]
+
+
+def _best_ms(repeat: int, fn: Callable[[], int]) -> tuple[float, int]:
+    best, out = float("inf"), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, out
+
+
+def _mapreduce(pool: ProcessPoolExecutor, text: str, workers: int) -> int:
+    return sum(pool.map(count_words, split_text(text, workers)))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=20.0, help="tamanho do documento (MiB)")
+    ap.add_argument("-r", "--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    text = _document(args.mb)
+    base_ms, expected = _best_ms(args.repeat, lambda: analyze_text(text).word_count)
+    results = [("single", base_ms)]
+
+    cpus = os.cpu_count() or 1
+    workers = sorted({w for w in (2, 4, 8, cpus) if 2 <= w <= cpus})
+    for n in workers:
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            list(pool.map(count_words, ["aquece"] * n))
+            ms, got = _best_ms(args.repeat, partial(_mapreduce, pool, text, n))
+        assert got == expected, (got, expected)
+        results.append((f"pool-{n}", ms))
+
+    print(f"documento: {args.mb:g} MiB, {expected} palavras, {cpus} CPUs")
+    print(f"{'cenário':<10} {'ms':>10} {'speedup':>9}")
+    for label, ms in results:
+        print(f"{label:<10} {ms:>10.1f} {base_ms / ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# services/sextinha_text_api/app/analysis.py
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from collections.abc import Sequence
+from typing import Final
+
+from .models import AnalyzeResponse
+
+# Compilado uma vez (antes: `re.findall` recompilava/consultava o cache a cada chamada)
+WORD_RE: Final[re.Pattern[str]] = re.compile(r"\b\w+\b", flags=re.UNICODE)
+
+PREVIEW_CHARS: Final[int] = 120
+
+# Entra na chave do cache de resultados: subir ao mudar tokenização/preview
+ANALYSIS_VERSION: Final[str] = "1"
+
+# Corte seguro para dividir um documento: nenhum token `\w+` atravessa um `\W`
+_BOUNDARY_RE: Final[re.Pattern[str]] = re.compile(r"\W", flags=re.UNICODE)
+
+# Um caractere de palavra (testa só as bordas de cada chunk)
+_WORD_CHAR_RE: Final[re.Pattern[str]] = re.compile(r"\w", flags=re.UNICODE)
+
+
+def count_words(text: str, limit: int | None = None) -> int:
+    """
+    Conta tokens `\\b\\w+\\b` iterando os matches, sem montar a lista.
+    Com `limit`, para em `limit + 1` (suficiente para saber que estourou).
+    """
+    n = 0
+    for _ in WORD_RE.finditer(text):
+        n += 1
+        if limit is not None and n > limit:
+            break
+    return n
+
+
+def make_preview(text: str) -> str:
+    return text[:PREVIEW_CHARS] + ("…" if len(text) > PREVIEW_CHARS else "")
+
+
+class InputTooLarge(ValueError):
+    """Texto acima de `limits.max_input_tokens` do tenant."""
+
+    def __init__(self, max_tokens: int):
+        super().__init__(f"input exceeds max_input_tokens ({max_tokens})")
+        self.max_tokens = max_tokens
+
+
+def analyze_text(text: str, max_tokens: int | None = None) -> AnalyzeResponse:
+    """Tamanho, contagem de palavras e preview; acima de `max_tokens` -> InputTooLarge."""
+    word_count = count_words(text, limit=max_tokens)
+    if max_tokens is not None and word_count > max_tokens:
+        raise InputTooLarge(max_tokens)
+    return AnalyzeResponse(length=len(text), word_count=word_count, preview=make_preview(text))
+
+
+def split_text(text: str, parts: int) -> list[str]:
+    """
+    Divide `text` em até `parts` fatias de tamanho parecido, cortando sempre em
+    um caractere não-palavra: a soma de `count_words` das fatias é a do todo.
+    """
+    size = len(text) // max(1, parts)
+    if parts < 2 or size == 0:
+        return [text]
+    out: list[str] = []
+    start = 0
+    while len(out) < parts - 1:
+        cut = _BOUNDARY_RE.search(text, max(start, (len(out) + 1) * size))
+        if cut is None:
+            break
+        out.append(text[start : cut.start()])
+        start = cut.start()
+    out.append(text[start:])
+    return [chunk for chunk in out if chunk]
+
+
+def analyze_many(
+    texts: Sequence[str], max_tokens: int | None = None
+) -> list[AnalyzeResponse | str]:
+    """
+    Analisa um lote; item acima do limite vira a mensagem de erro (str) no lugar
+    do resultado, sem derrubar o lote. Função de módulo: roda no process pool.
+    """
+    out: list[AnalyzeResponse | str] = []
+    for text in texts:
+        try:
+            out.append(analyze_text(text, max_tokens))
+        except InputTooLarge as ex:
+            out.append(str(ex))
+    return out
+
+
+class StreamingAnalyzer:
+    """
+    Mesmo resultado de `analyze_text(text.strip())`, mas alimentado por chunks
+    de texto (`feed`), sem guardar o documento: só os primeiros PREVIEW_CHARS
+    caracteres e se o chunk anterior terminou no meio de uma palavra.
+
+    - palavras partidas entre chunks contam uma vez: cada chunk é contado
+      inteiro e, se ele começa com `\\w` e o anterior terminou em `\\w`, o
+      primeiro token é a continuação do último (desconta 1);
+    - `length` ignora espaços nas bordas, como o `strip_whitespace` do modelo;
+    - acima de `max_tokens` levanta InputTooLarge já no chunk que estourou.
+    """
+
+    def __init__(self, max_tokens: int | None = None):
+        self.max_tokens = max_tokens
+        self.word_count = 0
+        self._chars = 0  # desde o primeiro caractere não-espaço
+        self._trailing_ws = 0
+        self._in_word = False  # o último caractere visto é `\w`
+        self._preview: list[str] = []
+        self._preview_len = 0
+
+    def _count(self, text: str, joined: int) -> None:
+        limit = None if self.max_tokens is None else self.max_tokens - self.word_count + joined
+        self.word_count += count_words(text, limit=limit) - joined
+        if self.max_tokens is not None and self.word_count > self.max_tokens:
+            raise InputTooLarge(self.max_tokens)
+
+    def feed(self, chunk: str) -> None:
+        if not self._chars:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+        self._chars += len(chunk)
+        body = chunk.rstrip()
+        self._trailing_ws = self._trailing_ws + len(chunk) if not body else len(chunk) - len(body)
+
+        if self._preview_len < PREVIEW_CHARS:
+            head = chunk[: PREVIEW_CHARS - self._preview_len]
+            self._preview.append(head)
+            self._preview_len += len(head)
+
+        if not chunk:
+            return
+        joined = int(self._in_word and _WORD_CHAR_RE.match(chunk) is not None)
+        self._in_word = _WORD_CHAR_RE.match(chunk[-1]) is not None
+        self._count(chunk, joined)
+
+    def result(self) -> AnalyzeResponse:
+        length = self._chars - self._trailing_ws
+        preview = "".join(self._preview)[: min(length, PREVIEW_CHARS)]
+        if length > PREVIEW_CHARS:
+            preview += "…"
+        return AnalyzeResponse(length=length, word_count=self.word_count, preview=preview)
+
+
+class StreamFormatError(ValueError):
+    """Corpo de streaming malformado (UTF-8 inválido ou linha NDJSON sem `text`)."""
+
+
+class TextStreamDecoder:
+    """
+    bytes -> texto incremental. `text/plain`: UTF-8 cru (sequência multibyte
+    partida entre chunks fica no decoder). NDJSON: uma linha `{"text": "..."}`
+    por trecho; os trechos são concatenados como estão (o cliente decide os
+    separadores). Só a linha em andamento fica em memória.
+    """
+
+    def __init__(self, ndjson: bool = False):
+        self.ndjson = ndjson
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._line = ""
+
+    def _decode(self, data: bytes, final: bool = False) -> str:
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError as ex:
+            raise StreamFormatError("body is not valid UTF-8") from ex
+
+    @staticmethod
+    def _segment(line: str) -> str:
+        try:
+            obj = json.loads(line)
+        except ValueError as ex:
+            raise StreamFormatError("invalid NDJSON line") from ex
+        if not isinstance(obj, dict) or not isinstance(obj.get("text"), str):
+            raise StreamFormatError('NDJSON lines must be objects with a string "text"')
+        return obj["text"]
+
+    def _segments(self, text: str, final: bool) -> list[str]:
+        *lines, self._line = (self._line + text).split("\n")
+        if final:
+            lines.append(self._line)
+            self._line = ""
+        return [self._segment(line) for line in lines if line.strip()]
+
+    def decode(self, data: bytes) -> list[str]:
+        text = self._decode(data)
+        if not self.ndjson:
+            return [text] if text else []
+        return self._segments(text, final=False)
+
+    def close(self) -> list[str]:
+        text = self._decode(b"", final=True)
+        if not self.ndjson:
+            return [text] if text else []
+        return self._segments(text, final=True)
@@ -4,15 +4,36 @@ from __future__ import annotations
 from collections.abc import Mapping
 from typing import Any
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request, status
+
+from services.shared.config_schema import TenantLimits
+from services.shared.middleware.rate_limit import check_rate_limit
+
+from ...analysis import (
+    InputTooLarge,
+    StreamFormatError,
+    StreamingAnalyzer,
+    TextStreamDecoder,
+)
+from ...models import (
+    AnalyzeRequest,
+    AnalyzeResponse,
+    BatchAnalyzeItem,
+    BatchAnalyzeRequest,
+    BatchAnalyzeResponse,
+)
+from ...result_cache import analyze_batch_cached, analyze_cached
 
 router = APIRouter(prefix="/v1", tags=["v1"])
 
+_DEFAULT_MAX_INPUT_TOKENS = TenantLimits().max_input_tokens
+_DEFAULT_MAX_BATCH_ITEMS = TenantLimits().max_batch_items
+
 
 def _as_dict(model_or_dict: Any) -> Mapping[str, Any] | None:
     if model_or_dict is None:
         return None
-    if isinstance(model_or_dict, dict):
+    if isinstance(model_or_dict, Mapping):
         return model_or_dict
     if hasattr(model_or_dict, "model_dump"):
         try:
@@ -43,7 +64,135 @@ def whoami(request: Request):
     return {
         "tenant_id": t.id if t else None,
         "tenant_name": t.name if t else None,
-        "features": d.get("features") if isinstance(d, dict) else None,
-        "limits": d.get("limits") if isinstance(d, dict) else None,
-        "models": d.get("models") if isinstance(d, dict) else None,
+        "features": d.get("features") if isinstance(d, Mapping) else None,
+        "limits": d.get("limits") if isinstance(d, Mapping) else None,
+        "models": d.get("models") if isinstance(d, Mapping) else None,
     }
+
+
+def _tenant_section(request: Request, name: str) -> Mapping[str, Any]:
+    d = _as_dict(getattr(request.state, "tenant_config", None)) or {}
+    section = d.get(name)
+    return section if isinstance(section, Mapping) else {}
+
+
+def _ensure_text_enabled(request: Request) -> None:
+    if not _tenant_section(request, "features").get("enable_text", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Text analysis disabled for tenant",
+        )
+
+
+def _max_input_tokens(request: Request) -> int:
+    return int(
+        _tenant_section(request, "limits").get("max_input_tokens", _DEFAULT_MAX_INPUT_TOKENS)
+    )
+
+
+def _cache_scope(request: Request) -> tuple[str, int | None]:
+    """(tenant_id, cota do tenant no cache de resultados) — o cache é por tenant."""
+    tenant = getattr(request.state, "tenant", None)
+    quota = _tenant_section(request, "limits").get("result_cache_bytes")
+    return str(getattr(tenant, "id", "unknown")), None if quota is None else int(quota)
+
+
+@router.post("/text/analyze", response_model=AnalyzeResponse, summary="Analyze text")
+async def text_analyze(req: AnalyzeRequest, request: Request) -> AnalyzeResponse:
+    _ensure_text_enabled(request)
+    tenant_id, quota = _cache_scope(request)
+    try:
+        return await analyze_cached(tenant_id, req.text, _max_input_tokens(request), quota)
+    except InputTooLarge as ex:
+        raise HTTPException(status_code=413, detail=str(ex)) from ex
+
+
+@router.post(
+    "/text/analyze/batch",
+    response_model=BatchAnalyzeResponse,
+    summary="Analyze a batch of texts",
+    responses={429: {"description": "Batch exceeds the tenant's remaining rate limit"}},
+)
+async def text_analyze_batch(req: BatchAnalyzeRequest, request: Request):
+    """
+    Um lote de até `limits.max_batch_items` textos por chamada. Cada texto custa
+    `rate_limit.batch_item_weight` (default 1) tokens no bucket de /v1/text/analyze;
+    item acima de `max_input_tokens` volta com `error`, sem derrubar o lote.
+    """
+    _ensure_text_enabled(request)
+    n = len(req.texts)
+    max_items = int(
+        _tenant_section(request, "limits").get("max_batch_items", _DEFAULT_MAX_BATCH_ITEMS)
+    )
+    if n > max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"batch exceeds max_batch_items ({max_items})",
+        )
+
+    weight = float(_tenant_section(request, "rate_limit").get("batch_item_weight", 1.0))
+    limited = check_rate_limit(request, units=n * weight, route="/v1/text/analyze")
+    if limited is not None:
+        return limited
+
+    tenant_id, quota = _cache_scope(request)
+    results = await analyze_batch_cached(tenant_id, req.texts, _max_input_tokens(request), quota)
+    items = [
+        (
+            BatchAnalyzeItem(index=i, error=r)
+            if isinstance(r, str)
+            else BatchAnalyzeItem(index=i, result=r)
+        )
+        for i, r in enumerate(results)
+    ]
+    return BatchAnalyzeResponse(count=n, items=items)
+
+
+_STREAM_MEDIA_TYPES = {"text/plain": False, "application/x-ndjson": True}
+
+
+@router.post(
+    "/text/analyze/stream",
+    response_model=AnalyzeResponse,
+    summary="Analyze a streamed text body",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "text/plain": {"schema": {"type": "string"}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def text_analyze_stream(request: Request) -> AnalyzeResponse:
+    """
+    Corpo cru (`text/plain`, UTF-8) ou NDJSON (`{"text": "..."}` por linha),
+    inclusive chunked. Contagem feita chunk a chunk enquanto o corpo chega: a
+    memória não cresce com o documento e o 413 sai assim que o limite estoura.
+    """
+    _ensure_text_enabled(request)
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in _STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use text/plain or application/x-ndjson",
+        )
+
+    decoder = TextStreamDecoder(ndjson=_STREAM_MEDIA_TYPES[media_type])
+    analyzer = StreamingAnalyzer(max_tokens=_max_input_tokens(request))
+    try:
+        async for data in request.stream():
+            for text in decoder.decode(data):
+                analyzer.feed(text)
+        for text in decoder.close():
+            analyzer.feed(text)
+        result = analyzer.result()
+    except InputTooLarge as ex:
+        raise HTTPException(status_code=413, detail=str(ex)) from ex
+    except StreamFormatError as ex:
+        raise HTTPException(status_code=422, detail=str(ex)) from ex
+
+    if not result.length:
+        raise HTTPException(status_code=422, detail="text must not be empty")
+    return result
@@ -9,14 +9,18 @@ from fastapi.responses import JSONResponse
 from services.shared.config_loader import reload_all_configs
 from services.shared.config_provisioner import sync_from_db
 from services.shared.health import HealthChecker, ProbeStatus
-from services.shared.middleware.cors import CORSMiddlewarePerTenant
-from services.shared.middleware.rate_limit import RateLimitMiddlewarePerTenant
-from services.shared.middleware_utils import RequestIdMiddleware, TenantMiddleware
+from services.shared.logging_utils import flush_access_log
+from services.shared.loop_monitor import LoopLagMonitor
+from services.shared.metrics import metrics_router
+from services.shared.profiler import profiler_router
+from services.shared.tracing import flush_traces
 
 from ...shared.app_middleware import apply_middlewares
 from .admin.dev_router import router as admin_dev_router
 from .api.v1.router import router as v1_router
 from .models import AnalyzeRequest, AnalyzeResponse
+from .pool import shutdown_pool
+from .result_cache import PUBLIC_CACHE_SCOPE, analyze_cached
 
 
 class SextinhaFastAPI(FastAPI):
@@ -67,41 +71,44 @@ app = SextinhaFastAPI(
     swagger_ui_parameters={"persistAuthorization": True, "displayRequestDuration": True},
 )
 
-# ORDEM IMPORTA (o último adicionado roda primeiro / outermost):
-# Queremos: RequestId (outermost) -> Tenant -> RateLimit -> CORS (innermost)
-app.add_middleware(CORSMiddlewarePerTenant)  # innermost
-app.add_middleware(RateLimitMiddlewarePerTenant)  # entre Tenant e CORS
-app.add_middleware(TenantMiddleware)  # middle
-app.add_middleware(RequestIdMiddleware)  # outermost
+# RequestLogging (outermost) -> Metrics -> TenantGateway (request-id, auth, config, RL, CORS)
+# -> Idempotency-Key nos POSTs de análise do v1 (rotas públicas não têm tenant)
+apply_middlewares(
+    app,
+    service="sextinha_text_api",
+    idempotent_paths=("/v1/text/analyze", "/v1/text/analyze/batch"),
+    # o lote cobra os itens no bucket de /v1/text/analyze (não também no dele)
+    handler_rate_limited_paths=("/v1/text/analyze/batch",),
+)
 
 # Rotas v1
-apply_middlewares(app)
 app.include_router(v1_router, tags=["v1"])
 
 
 # --- rotas auxiliares/ops ---
-def _count_words(txt: str) -> int:
-    import re
-
-    tokens = re.findall(r"\b\w+\b", txt, flags=re.UNICODE)
-    return len(tokens)
-
-
 @app.post("/analyze", response_model=AnalyzeResponse, tags=["ops"])
-def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
-    txt = req.text
-    length = len(txt)
-    word_count = _count_words(txt)
-    preview = txt[:120] + ("…" if len(txt) > 120 else "")
-    return AnalyzeResponse(length=length, word_count=word_count, preview=preview)
+async def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
+    return await analyze_cached(PUBLIC_CACHE_SCOPE, req.text)
 
 
 checker = HealthChecker(service_name="sextinha_text_api")
+loop_monitor = LoopLagMonitor(service="sextinha_text_api")
 
 
 @app.on_event("startup")
 async def _startup_health() -> None:
     checker.register("app_started", lambda: True)
+    loop_monitor.start()
+    checker.register("event_loop", loop_monitor.healthy)
+
+
+@app.on_event("shutdown")
+async def _shutdown_flush_logs() -> None:
+    await loop_monitor.stop()
+    # drena as filas do access log e dos traces antes do processo sair
+    flush_access_log()
+    flush_traces()
+    shutdown_pool()
 
 
 @app.get("/health", response_model=ProbeStatus, tags=["ops"])
@@ -144,4 +151,7 @@ def sync_configs():
 
 app.include_router(admin)
 
+app.include_router(metrics_router, tags=["ops"])
+app.include_router(profiler_router)
+
 app.include_router(admin_dev_router)
@@ -19,3 +19,18 @@ class AnalyzeResponse(AppBaseModel):
     length: int
     word_count: int
     preview: str
+
+
+class BatchAnalyzeRequest(AppBaseModel):
+    texts: list[TextField] = Field(..., min_length=1, examples=[["Deu bom!", "Sextou!"]])
+
+
+class BatchAnalyzeItem(AppBaseModel):
+    index: int
+    result: AnalyzeResponse | None = None
+    error: str | None = None
+
+
+class BatchAnalyzeResponse(AppBaseModel):
+    count: int
+    items: list[BatchAnalyzeItem]
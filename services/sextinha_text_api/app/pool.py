@@ -0,0 +1,122 @@
+# services/sextinha_text_api/app/pool.py
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from services.shared import settings
+
+from .analysis import (
+    InputTooLarge,
+    analyze_many,
+    analyze_text,
+    count_words,
+    make_preview,
+    split_text,
+)
+from .models import AnalyzeResponse
+
+_pool: ProcessPoolExecutor | None = None
+# Sem fork: o processo já tem as threads do access log e do exportador de
+# traces, e o filho herdaria os locks delas no estado do momento (deadlock).
+# forkserver onde existe (Linux/macOS), spawn no resto.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+# Teto generoso de caracteres por token: abaixo de max_tokens * isto o texto
+# certamente cabe; acima, o teto (e não o tamanho) domina a varredura
+_MAX_CHARS_PER_TOKEN = 64
+
+
+def pool_size() -> int:
+    return settings.TEXT_POOL_WORKERS or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool do serviço (criado no primeiro uso; regex segura o GIL)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=_MP_CONTEXT)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _split(items: Sequence[str], parts: int) -> list[Sequence[str]]:
+    size, rest = divmod(len(items), parts)
+    out, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < rest else 0)
+        if end > start:
+            out.append(items[start:end])
+        start = end
+    return out
+
+
+async def analyze_batch(
+    texts: Sequence[str], max_tokens: int | None
+) -> list[AnalyzeResponse | str]:
+    """
+    Lotes pequenos rodam numa thread (o custo é o overhead por request, não a
+    regex). Acima de TEXT_BATCH_PARALLEL_MIN_CHARS o lote é dividido em fatias
+    contíguas, uma por worker do process pool, e os resultados voltam em ordem.
+    """
+    workers = pool_size()
+    total = sum(len(t) for t in texts)
+    if workers < 2 or len(texts) < 2 or total < settings.TEXT_BATCH_PARALLEL_MIN_CHARS:
+        return await run_in_threadpool(analyze_many, texts, max_tokens)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    parts = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, analyze_many, chunk, max_tokens)
+            for chunk in _split(texts, min(workers, len(texts)))
+        )
+    )
+    return [item for part in parts for item in part]
+
+
+async def analyze_document(text: str, max_tokens: int | None = None) -> AnalyzeResponse:
+    """
+    `analyze_text` fora do event loop. A partir de TEXT_PARALLEL_MIN_CHARS o
+    documento vira map-reduce: fatias cortadas em não-palavra (`split_text`),
+    `count_words` de cada uma num worker do process pool, soma das contagens.
+
+    Na prática o map-reduce serve a chamadas sem teto (o /analyze público) ou
+    a tenants com `max_input_tokens` na ordem do tamanho do documento: com o
+    teto default (4096) um documento desse tamanho sempre estoura, e a
+    contagem sequencial já para em `max_tokens + 1`. Por isso, com mais de
+    `max_tokens * _MAX_CHARS_PER_TOKEN` caracteres, o documento nem vai para
+    o pool (a cópia para os workers custaria mais que a varredura).
+    """
+    workers = pool_size()
+    capped = max_tokens is not None and max_tokens * _MAX_CHARS_PER_TOKEN < len(text)
+    if workers < 2 or capped or len(text) < settings.TEXT_PARALLEL_MIN_CHARS:
+        return await run_in_threadpool(analyze_text, text, max_tokens)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    # cada fatia para no limite inteiro: basta uma estourar para o todo estourar
+    counts = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, count_words, chunk, max_tokens)
+            for chunk in split_text(text, workers)
+        )
+    )
+    word_count = sum(counts)
+    if max_tokens is not None and word_count > max_tokens:
+        raise InputTooLarge(max_tokens)
+    return AnalyzeResponse(length=len(text), word_count=word_count, preview=make_preview(text))
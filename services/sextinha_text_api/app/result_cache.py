@@ -0,0 +1,172 @@
+# services/sextinha_text_api/app/result_cache.py
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Final
+
+from starlette.concurrency import run_in_threadpool
+
+from services.shared import settings
+from services.shared.metrics import record_cache
+
+from .analysis import ANALYSIS_VERSION, InputTooLarge
+from .models import AnalyzeResponse
+from .pool import analyze_batch, analyze_document
+
+SERVICE: Final[str] = "sextinha_text_api"
+CACHE_NAME: Final[str] = "text_analysis"
+# "Tenant" do /analyze sem autenticação
+PUBLIC_CACHE_SCOPE: Final[str] = "public"
+
+# Custo fixo estimado de uma entrada (chave, tupla, modelo pydantic, nó do OrderedDict)
+_ENTRY_OVERHEAD: Final[int] = 512
+# LRU vazia para o `get` de tenant sem entradas (nunca é alterada)
+_EMPTY: Final[OrderedDict[bytes, tuple[AnalyzeResponse, int]]] = OrderedDict()
+# Acima disso o hash sai do event loop (blake2b solta o GIL em buffers grandes)
+_HASH_INLINE_MAX_CHARS: Final[int] = 64 * 1024
+
+
+def cache_key(text: str) -> bytes:
+    """blake2b-128 da versão da análise + texto normalizado (já com strip)."""
+    h = hashlib.blake2b(ANALYSIS_VERSION.encode(), digest_size=16)
+    h.update(b"\0")
+    h.update(text.encode("utf-8", "surrogatepass"))
+    return h.digest()
+
+
+class ResultCache:
+    """
+    LRU de resultados por (tenant, hash do texto) com orçamento em bytes.
+
+    Cada tenant tem uma cota própria: ao passar dela, saem as entradas mais
+    antigas *do próprio tenant*, então um tenant barulhento não expulsa os
+    outros. O orçamento global só despeja (LRU geral) quando a soma das cotas
+    não cabe. Só resultados de sucesso entram: como a contagem é completa,
+    um hit ainda respeita o `max_input_tokens` de quem pergunta.
+
+    Duas ordens LRU, ambas O(1) por operação: uma global (para o orçamento
+    total) e uma por tenant (para a cota, despejada pela frente).
+    """
+
+    def __init__(self, max_bytes: int, tenant_max_bytes: int):
+        self.max_bytes = max_bytes
+        self.tenant_max_bytes = tenant_max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[tuple[str, bytes], int] = OrderedDict()
+        self._tenants: dict[str, OrderedDict[bytes, tuple[AnalyzeResponse, int]]] = {}
+        self._tenant_bytes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def tenant_bytes(self, tenant: str) -> int:
+        return self._tenant_bytes.get(tenant, 0)
+
+    def get(self, tenant: str, key: bytes) -> AnalyzeResponse | None:
+        with self._lock:
+            lru = self._tenants.get(tenant, _EMPTY)
+            entry = lru.get(key)
+            if entry is not None:
+                lru.move_to_end(key)
+                self._entries.move_to_end((tenant, key))
+        record_cache(SERVICE, CACHE_NAME, entry is not None)
+        return entry[0] if entry is not None else None
+
+    def put(
+        self, tenant: str, key: bytes, result: AnalyzeResponse, quota: int | None = None
+    ) -> None:
+        size = _ENTRY_OVERHEAD + len(result.preview.encode("utf-8", "surrogatepass"))
+        quota = self.tenant_max_bytes if quota is None else quota
+        if size > quota or size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(tenant, key)
+            # cota estourada: sai a frente da LRU do próprio tenant
+            while self.tenant_bytes(tenant) + size > quota:
+                self._discard(tenant, next(iter(self._tenants[tenant])))
+            self._tenants.setdefault(tenant, OrderedDict())[key] = (result, size)
+            self._entries[(tenant, key)] = size
+            self._tenant_bytes[tenant] = self.tenant_bytes(tenant) + size
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._discard(*next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tenants.clear()
+            self._tenant_bytes.clear()
+            self.bytes = 0
+
+    def _discard(self, tenant: str, key: bytes) -> None:
+        size = self._entries.pop((tenant, key), None)
+        if size is None:
+            return
+        lru = self._tenants[tenant]
+        del lru[key]
+        self.bytes -= size
+        left = self._tenant_bytes[tenant] - size
+        if left:
+            self._tenant_bytes[tenant] = left
+        else:
+            del self._tenant_bytes[tenant]
+            del self._tenants[tenant]
+
+
+RESULT_CACHE = ResultCache(settings.TEXT_CACHE_MAX_BYTES, settings.TEXT_CACHE_TENANT_MAX_BYTES)
+
+
+async def _key(text: str) -> bytes:
+    if len(text) > _HASH_INLINE_MAX_CHARS:
+        return await run_in_threadpool(cache_key, text)
+    return cache_key(text)
+
+
+def _check_limit(result: AnalyzeResponse, max_tokens: int | None) -> AnalyzeResponse:
+    if max_tokens is not None and result.word_count > max_tokens:
+        raise InputTooLarge(max_tokens)
+    return result
+
+
+async def analyze_cached(
+    tenant: str, text: str, max_tokens: int | None = None, quota: int | None = None
+) -> AnalyzeResponse:
+    """`analyze_document` com o cache na frente (TEXT_CACHE_MAX_BYTES=0 desliga)."""
+    if not RESULT_CACHE.max_bytes:
+        return await analyze_document(text, max_tokens)
+    key = await _key(text)
+    cached = RESULT_CACHE.get(tenant, key)
+    if cached is not None:
+        return _check_limit(cached, max_tokens)
+    result = await analyze_document(text, max_tokens)
+    RESULT_CACHE.put(tenant, key, result, quota)
+    return result
+
+
+async def analyze_batch_cached(
+    tenant: str, texts: Sequence[str], max_tokens: int | None = None, quota: int | None = None
+) -> list[AnalyzeResponse | str]:
+    """Lote com cache por item: só os textos sem hit vão para `analyze_batch`."""
+    if not RESULT_CACHE.max_bytes:
+        return await analyze_batch(texts, max_tokens)
+    keys = [await _key(t) for t in texts]
+    out: list[AnalyzeResponse | str | None] = []
+    for key in keys:
+        cached = RESULT_CACHE.get(tenant, key)
+        if cached is not None and max_tokens is not None and cached.word_count > max_tokens:
+            out.append(str(InputTooLarge(max_tokens)))
+        else:
+            out.append(cached)
+
+    misses = [i for i, r in enumerate(out) if r is None]
+    if misses:
+        computed = await analyze_batch([texts[i] for i in misses], max_tokens)
+        for i, result in zip(misses, computed, strict=True):
+            out[i] = result
+            if not isinstance(result, str):
+                RESULT_CACHE.put(tenant, keys[i], result, quota)
+    return [r for r in out if r is not None]
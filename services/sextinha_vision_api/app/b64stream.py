@@ -0,0 +1,196 @@
+# services/sextinha_vision_api/app/b64stream.py
+from __future__ import annotations
+
+import binascii
+from typing import Final
+
+from .image_meta import HeaderSniffer
+
+# Fatia de base64 decodificada por vez (múltiplo de 4)
+B64_CHUNK_CHARS: Final[int] = 64 * 1024
+
+_ALPHABET: Final[bytes] = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+class Base64Error(ValueError):
+    """Base64 inválido (mesmas regras de `b64decode(..., validate=True)`)."""
+
+
+class Base64StreamDecoder:
+    """
+    Decodificador base64 incremental: `feed` devolve os bytes dos quantums de
+    4 caracteres completos e guarda só o resto (< 4 caracteres). Valida como
+    `b64decode(validate=True)`: só o alfabeto padrão, `=` apenas no fim (no
+    máximo 2) e comprimento total múltiplo de 4.
+    """
+
+    def __init__(self) -> None:
+        self._rest = b""
+        self._padding = 0
+        self.consumed = 0  # caracteres vistos (para mensagens de erro)
+
+    def feed(self, data: bytes) -> bytes:
+        self.consumed += len(data)
+        if self._padding:
+            if data.strip(b"="):
+                raise Base64Error("data after base64 padding")
+            self._padding += len(data)
+            self._rest += data
+            return b""
+        body = data.rstrip(b"=")
+        if body.translate(None, _ALPHABET):
+            raise Base64Error("non-base64 character")
+        if len(body) != len(data):
+            self._padding = len(data) - len(body)
+
+        buf = self._rest + data
+        if self._padding:
+            self._rest = buf  # o último quantum (com `=`) só sai no close
+            return b""
+        cut = len(buf) - len(buf) % 4
+        self._rest = buf[cut:]
+        return binascii.a2b_base64(buf[:cut])
+
+    def close(self) -> bytes:
+        rest = self._rest
+        self._rest = b""
+        if self._padding > 2 or len(rest) % 4:
+            raise Base64Error("incorrect base64 padding")
+        try:
+            return binascii.a2b_base64(rest)
+        except binascii.Error as ex:
+            raise Base64Error(str(ex)) from ex
+
+
+def sniff_base64(value: str, sniffer: HeaderSniffer | None = None) -> HeaderSniffer:
+    """
+    Decodifica `value` em fatias de B64_CHUNK_CHARS direto para o `sniffer`
+    (tamanho + bytes iniciais): a imagem decodificada nunca existe inteira.
+    """
+    sniffer = sniffer or HeaderSniffer()
+    decoder = Base64StreamDecoder()
+    for start in range(0, len(value), B64_CHUNK_CHARS):
+        try:
+            piece = value[start : start + B64_CHUNK_CHARS].encode("ascii")
+        except UnicodeEncodeError as ex:
+            raise Base64Error("non-base64 character") from ex
+        sniffer.feed(decoder.feed(piece))
+    sniffer.feed(decoder.close())
+    return sniffer
+
+
+class JsonFieldError(ValueError):
+    """Corpo JSON fora do formato `{"<campo>": "<string>"}`."""
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = (
+            kind  # json_invalid | missing | extra_forbidden | string_type | string_too_short
+        )
+
+
+class JsonStringField:
+    """
+    Leitor incremental de um corpo JSON `{"<field>": "<string>"}` que devolve
+    (`feed`) os pedaços do valor conforme chegam, sem montar a string. Feito
+    para base64: o único escape aceito no valor é `\\/`. Outro campo é erro
+    (como `extra="forbid"` no modelo).
+    """
+
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.found = False
+        self._state = "start"
+        self._key = bytearray()
+        self._escape = False
+
+    def feed(self, data: bytes) -> list[bytes]:
+        out: list[bytes] = []
+        pos, n = 0, len(data)
+        while pos < n:
+            state = self._state
+            if state == "value":
+                # caminho quente: copia até a próxima aspa/barra de uma vez
+                if self._escape:
+                    if data[pos : pos + 1] != b"/":
+                        raise JsonFieldError("string_type", "unsupported escape in value")
+                    out.append(b"/")
+                    self._escape = False
+                    pos += 1
+                    continue
+                end = _next_special(data, pos)
+                if end > pos:
+                    out.append(data[pos:end])
+                if end == n:
+                    return out
+                if data[end] == 0x5C:  # "\"
+                    self._escape = True
+                else:
+                    self._state = "after_value"
+                pos = end + 1
+                continue
+
+            c = data[pos]
+            pos += 1
+            if c in b" \t\r\n":
+                if state == "key":
+                    self._key.append(c)
+                continue
+            if state == "start":
+                self._expect(c, b"{", "object_open")
+            elif state == "object_open":
+                if c == 0x7D:  # "}" -> objeto vazio
+                    self._state = "end"
+                else:
+                    self._expect(c, b'"', "key")
+            elif state == "key":
+                if c == 0x22:
+                    self._end_key()
+                else:
+                    self._key.append(c)
+            elif state == "colon":
+                self._expect(c, b":", "value_open")
+            elif state == "value_open":
+                if c != 0x22:
+                    raise JsonFieldError("string_type", "Input should be a valid string")
+                self._state = "value"
+            elif state == "after_value":
+                if c == 0x7D:
+                    self._state = "end"
+                elif c == 0x2C:
+                    self._state = "next_key"
+                else:
+                    raise JsonFieldError("json_invalid", "JSON decode error")
+            elif state == "next_key":
+                self._expect(c, b'"', "key")
+            else:
+                raise JsonFieldError("json_invalid", "JSON decode error")
+        return out
+
+    def close(self) -> None:
+        if self._state != "end":
+            raise JsonFieldError("json_invalid", "JSON decode error")
+        if not self.found:
+            raise JsonFieldError("missing", "Field required")
+
+    def _expect(self, c: int, token: bytes, next_state: str) -> None:
+        if c != token[0]:
+            raise JsonFieldError("json_invalid", "JSON decode error")
+        self._state = next_state
+
+    def _end_key(self) -> None:
+        key = bytes(self._key)
+        self._key.clear()
+        if key != self.field:
+            raise JsonFieldError("extra_forbidden", "Extra inputs are not permitted")
+        if self.found:
+            raise JsonFieldError("json_invalid", "duplicate field")
+        self.found = True
+        self._state = "colon"
+
+
+def _next_special(data: bytes, pos: int) -> int:
+    quote = data.find(b'"', pos)
+    slash = data.find(b"\\", pos)
+    ends = [i for i in (quote, slash) if i >= 0]
+    return min(ends) if ends else len(data)
@@ -0,0 +1,153 @@
+# services/sextinha_vision_api/app/dedupe.py
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Final
+
+from services.shared import settings
+from services.shared.metrics import DEDUPE_BYTES, record_cache
+
+SERVICE: Final[str] = "sextinha_vision_api"
+STORE_NAME: Final[str] = "image_dedupe"
+
+# registro no disco: sha256 (32) + tamanho do valor (4) + valor
+_RECORD: Final[struct.Struct] = struct.Struct(">32sI")
+
+
+class DedupeStore:
+    """
+    Valores (o JSON da análise) por SHA-256 dos bytes decodificados da imagem.
+
+    Dois níveis, por processo:
+    - memória: LRU de até `max_entries`; quem sai vai para o disco;
+    - disco (opcional, `disk_dir`): log circular de `disk_max_bytes` num
+      arquivo mapeado com mmap. A escrita avança um cursor; ao dar a volta,
+      os registros mais antigos à frente dele são descartados (despejo por
+      tamanho). O índice (hash -> posição) fica em memória, então o arquivo é
+      rascunho do processo: criado no 1º spill, apagado no `close`.
+
+    Hit no disco volta para a memória. `get` conta hit/miss em
+    `cache_requests_total` e os bytes de imagem em `dedupe_bytes_total`
+    (razão de dedupe = duplicate / total).
+    """
+
+    def __init__(self, max_entries: int, disk_dir: str = "", disk_max_bytes: int = 0):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: OrderedDict[bytes, bytes] = OrderedDict()
+        # ordem de inserção = ordem de escrita no log (mais antigo primeiro)
+        self._index: dict[bytes, tuple[int, int]] = {}
+        self._pos = 0
+        self._path = ""
+        self._file: int | None = None
+        self._mm: mmap.mmap | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._memory) + len(self._index)
+
+    def disk_entries(self) -> int:
+        return len(self._index)
+
+    def get(self, digest: bytes, size: int = 0) -> bytes | None:
+        with self._lock:
+            value = self._memory.get(digest)
+            if value is not None:
+                self._memory.move_to_end(digest)
+            elif digest in self._index:
+                value = self._read(digest)
+                if value is not None:
+                    self._remember(digest, value)
+        hit = value is not None
+        record_cache(SERVICE, STORE_NAME, hit)
+        DEDUPE_BYTES.inc(SERVICE, STORE_NAME, "duplicate" if hit else "unique", amount=size)
+        return value
+
+    def put(self, digest: bytes, value: bytes) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if digest in self._memory or digest in self._index:
+                return  # endereçado por conteúdo: o valor é o mesmo
+            self._remember(digest, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._index.clear()
+            self._pos = 0
+
+    def close(self) -> None:
+        """Desmapeia e apaga o arquivo do nível em disco."""
+        with self._lock:
+            self._index.clear()
+            self._pos = 0
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._file is not None:
+                os.close(self._file)
+                self._file = None
+                os.unlink(self._path)
+
+    # -------- internos (com o lock) --------
+
+    def _remember(self, digest: bytes, value: bytes) -> None:
+        self._memory[digest] = value
+        while len(self._memory) > self.max_entries:
+            self._spill(*self._memory.popitem(last=False))
+
+    def _spill(self, digest: bytes, value: bytes) -> None:
+        size = _RECORD.size + len(value)
+        if not self.disk_dir or size > self.disk_max_bytes:
+            return
+        mm = self._mm or self._open()
+        if self._pos + size > self.disk_max_bytes:
+            self._evict_until(self.disk_max_bytes)  # a cauda sem espaço fica vazia
+            self._pos = 0
+        self._evict_until(self._pos + size)
+        offset = self._pos
+        _RECORD.pack_into(mm, offset, digest, len(value))
+        mm[offset + _RECORD.size : offset + size] = value
+        self._index[digest] = (offset, size)
+        self._pos += size
+
+    def _evict_until(self, end: int) -> None:
+        # os registros mais antigos ficam logo à frente do cursor
+        while self._index:
+            digest, (offset, _size) = next(iter(self._index.items()))
+            if offset < self._pos or offset >= end:
+                break
+            del self._index[digest]
+
+    def _read(self, digest: bytes) -> bytes | None:
+        offset, size = self._index.pop(digest)
+        assert self._mm is not None
+        stored, length = _RECORD.unpack_from(self._mm, offset)
+        if stored != digest or _RECORD.size + length != size:
+            return None  # não deveria acontecer: trata como miss
+        return self._mm[offset + _RECORD.size : offset + size]
+
+    def _open(self) -> mmap.mmap:
+        os.makedirs(self.disk_dir, exist_ok=True)
+        self._path = os.path.join(self.disk_dir, f"vision-dedupe-{os.getpid()}.bin")
+        self._file = os.open(self._path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.ftruncate(self._file, self.disk_max_bytes)
+        self._mm = mmap.mmap(self._file, self.disk_max_bytes)
+        return self._mm
+
+
+DEDUPE = DedupeStore(
+    settings.VISION_DEDUPE_MAX_ENTRIES,
+    settings.VISION_DEDUPE_DISK_DIR,
+    settings.VISION_DEDUPE_DISK_MAX_BYTES,
+)
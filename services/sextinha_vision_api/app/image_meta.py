@@ -0,0 +1,369 @@
+# services/sextinha_vision_api/app/image_meta.py
+from __future__ import annotations
+
+import hashlib
+import struct
+from dataclasses import dataclass
+from typing import Final
+
+Buffer = bytes | bytearray | memoryview
+
+# Quanto do começo do arquivo guardar para achar os metadados em upload
+# streaming (JPEG: SOF vem depois do APP1/EXIF, que pode ter dezenas de KB)
+META_HEADER_BYTES: Final[int] = 64 * 1024
+
+_PNG_SIG: Final[bytes] = b"\x89PNG\r\n\x1a\n"
+_PNG_COLOR: Final[dict[int, str]] = {
+    0: "gray",
+    2: "rgb",
+    3: "palette",
+    4: "gray_alpha",
+    6: "rgba",
+}
+_JPEG_COLOR: Final[dict[int, str]] = {1: "gray", 3: "ycbcr", 4: "cmyk"}
+# SOF0..SOF15, exceto DHT (C4), JPG (C8) e DAC (CC)
+_JPEG_SOF: Final[frozenset[int]] = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_EXIF_ORIENTATION_TAG: Final[int] = 0x0112
+_GIF_SIGS: Final[tuple[bytes, bytes]] = (b"GIF87a", b"GIF89a")
+
+
+@dataclass(frozen=True, slots=True)
+class ImageMeta:
+    format: str  # png | jpeg | gif | webp | bmp | unknown
+    width: int | None = None
+    height: int | None = None
+    bit_depth: int | None = None  # bits por canal (BMP/GIF: por pixel / da paleta)
+    color_type: str | None = None
+    orientation: int | None = None  # EXIF 1..8
+    frames: int | None = None
+
+
+class GifFrameCounter:
+    """
+    Conta os frames de um GIF em streaming: lê só os descritores e pula os
+    sub-blocos pelo tamanho, sem guardar o arquivo (pendente entre chunks:
+    no máximo um descritor de 13 bytes). `frames` é None até o trailer.
+    """
+
+    # bytes lidos em cada estado antes de decidir o próximo
+    _NEED: Final[dict[str, int]] = {
+        "header": 13,  # assinatura + logical screen descriptor
+        "block": 1,
+        "label": 1,  # rótulo da extensão
+        "image": 9,  # image descriptor, depois do 0x2C
+        "lzw": 1,  # LZW minimum code size
+        "sub": 1,  # tamanho do próximo sub-bloco (0 = fim)
+    }
+
+    def __init__(self) -> None:
+        self._count = 0
+        self._state = "header"
+        self._pending = bytearray()
+        self._skip = 0
+
+    @property
+    def frames(self) -> int | None:
+        return self._count if self._state == "done" else None
+
+    def feed(self, chunk: Buffer) -> None:
+        view = memoryview(chunk).cast("B")
+        pos, n = 0, len(view)
+        while self._state not in ("done", "invalid"):
+            if self._skip:
+                step = min(self._skip, n - pos)
+                pos += step
+                self._skip -= step
+                if self._skip:
+                    return
+                continue
+            need = self._NEED[self._state] - len(self._pending)
+            if n - pos < need:
+                self._pending += view[pos:]
+                return
+            field = bytes(self._pending) + bytes(view[pos : pos + need])
+            self._pending.clear()
+            pos += need
+            self._step(field)
+
+    def _step(self, field: bytes) -> None:
+        state = self._state
+        if state == "header":
+            if field[:6] not in _GIF_SIGS:
+                self._state = "invalid"
+                return
+            if field[10] & 0x80:  # global color table
+                self._skip = 3 << ((field[10] & 0x07) + 1)
+            self._state = "block"
+        elif state == "block":
+            self._state = {0x3B: "done", 0x21: "label", 0x2C: "image"}.get(field[0], "invalid")
+        elif state == "label":
+            self._state = "sub"
+        elif state == "image":
+            self._count += 1
+            if field[8] & 0x80:  # local color table
+                self._skip = 3 << ((field[8] & 0x07) + 1)
+            self._state = "lzw"
+        elif state == "lzw":
+            self._state = "sub"
+        elif field[0]:  # sub
+            self._skip = field[0]
+        else:
+            self._state = "block"
+
+
+class HeaderSniffer:
+    """
+    Conta bytes e guarda só os META_HEADER_BYTES iniciais, chunk a chunk; com
+    `digest=True` também calcula o SHA-256 do conteúdo inteiro (dedupe). Se o
+    conteúdo é GIF, conta os frames no caminho (GifFrameCounter).
+    """
+
+    def __init__(self, digest: bool = False) -> None:
+        self.size = 0
+        self._head = bytearray()
+        self._sha = hashlib.sha256() if digest else None
+        self._gif: GifFrameCounter | None = None
+
+    @property
+    def head(self) -> bytes:
+        return bytes(self._head)
+
+    @property
+    def digest(self) -> bytes | None:
+        return self._sha.digest() if self._sha is not None else None
+
+    @property
+    def gif_frames(self) -> int | None:
+        return self._gif.frames if self._gif is not None else None
+
+    def feed(self, chunk: Buffer) -> None:
+        before = len(self._head)
+        if before < META_HEADER_BYTES:
+            self._head += chunk[: META_HEADER_BYTES - before]
+        if self._sha is not None:
+            self._sha.update(chunk)
+        self.size += len(chunk)
+
+        if self._gif is not None:
+            self._gif.feed(chunk)
+        elif before < 6 <= len(self._head) and bytes(self._head[:6]) in _GIF_SIGS:
+            # assinatura completou agora: o contador recebe o que já passou
+            self._gif = GifFrameCounter()
+            self._gif.feed(self._head)
+            self._gif.feed(memoryview(chunk)[META_HEADER_BYTES - before :])
+
+
+def detect_image_format(data: Buffer) -> str:
+    """Formato pelos magic bytes (bastam os 12 primeiros)."""
+    head = bytes(data[:12])
+    if head.startswith(_PNG_SIG):
+        return "png"
+    if head.startswith(b"\xff\xd8"):
+        return "jpeg"
+    if head[:6] in _GIF_SIGS:
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:2] == b"BM":
+        return "bmp"
+    return "unknown"
+
+
+def parse_image_meta(data: Buffer, *, count_gif_frames: bool = True) -> ImageMeta:
+    """
+    Metadados lidos só dos cabeçalhos, sem decodificar pixels nem copiar o
+    buffer (trabalha com `struct.unpack_from` sobre o memoryview). Campo que
+    não cabe no trecho recebido (upload truncado em META_HEADER_BYTES) fica
+    None. Custo por formato:
+
+    - PNG: IHDR + cabeçalhos de chunk até o IDAT (acTL dá os frames de APNG);
+    - JPEG: segmentos até o SOF (APP1/EXIF dá a orientação), pulando pelo tamanho;
+    - WebP: cabeçalhos de chunk RIFF (ANMF = frame, EXIF = orientação);
+    - BMP: BITMAPINFOHEADER;
+    - GIF: logical screen descriptor; com `count_gif_frames` (default), os
+      frames percorrendo os blocos de `data` (saltos de sub-bloco, sem
+      decodificar; limitado ao trecho recebido: truncado -> None).
+    """
+    view = memoryview(data).cast("B")
+    fmt = detect_image_format(view)
+    parser = _PARSERS.get(fmt)
+    if parser is None:
+        return ImageMeta(format=fmt)
+    try:
+        return parser(view, count_gif_frames)
+    except (struct.error, IndexError, ValueError):
+        return ImageMeta(format=fmt)
+
+
+# -------- EXIF (TIFF) --------
+
+
+def _exif_orientation(view: memoryview, start: int, end: int) -> int | None:
+    """Tag 0x0112 no IFD0 de um bloco TIFF em view[start:end]."""
+    if end - start < 8:
+        return None
+    order = bytes(view[start : start + 2])
+    if order == b"II":
+        e = "<"
+    elif order == b"MM":
+        e = ">"
+    else:
+        return None
+    ifd = start + struct.unpack_from(e + "I", view, start + 4)[0]
+    if ifd + 2 > end:
+        return None
+    (count,) = struct.unpack_from(e + "H", view, ifd)
+    for i in range(count):
+        entry = ifd + 2 + 12 * i
+        if entry + 12 > end:
+            return None
+        tag, _type, _n, value = struct.unpack_from(e + "HHIH", view, entry)
+        if tag == _EXIF_ORIENTATION_TAG:
+            return value if 1 <= value <= 8 else None
+    return None
+
+
+# -------- formatos --------
+
+
+def _png(view: memoryview, _count: bool) -> ImageMeta:
+    width, height, depth, color = struct.unpack_from(">IIBB", view, 16)
+    frames: int | None = 1
+    orientation = None
+    pos = 33  # depois do IHDR (8 sig + 4 len + 4 tipo + 13 dados + 4 crc)
+    while pos + 8 <= len(view):
+        length, ctype = struct.unpack_from(">I4s", view, pos)
+        if ctype == b"IDAT":
+            break
+        if ctype == b"acTL" and pos + 12 <= len(view):
+            frames = struct.unpack_from(">I", view, pos + 8)[0]
+        elif ctype == b"eXIf":
+            orientation = _exif_orientation(view, pos + 8, min(pos + 8 + length, len(view)))
+        pos += 12 + length
+    return ImageMeta("png", width, height, depth, _PNG_COLOR.get(color), orientation, frames)
+
+
+def _jpeg(view: memoryview, _count: bool) -> ImageMeta:
+    pos = 2
+    orientation = None
+    size = len(view)
+    while pos + 4 <= size:
+        if view[pos] != 0xFF:
+            raise ValueError("JPEG marker expected")
+        marker = view[pos + 1]
+        if marker == 0xFF:  # preenchimento entre segmentos
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # sem payload
+            pos += 2
+            continue
+        (length,) = struct.unpack_from(">H", view, pos + 2)
+        body = pos + 4
+        if marker == 0xE1 and bytes(view[body : body + 6]) == b"Exif\0\0":
+            orientation = _exif_orientation(view, body + 6, min(pos + 2 + length, size))
+        elif marker in _JPEG_SOF:
+            depth, height, width, comps = struct.unpack_from(">BHHB", view, body)
+            return ImageMeta("jpeg", width, height, depth, _JPEG_COLOR.get(comps), orientation, 1)
+        elif marker == 0xDA:  # SOS sem SOF antes: arquivo inválido
+            break
+        pos += 2 + length
+    return ImageMeta("jpeg", orientation=orientation)
+
+
+def _gif_skip_sub_blocks(view: memoryview, pos: int) -> int:
+    while True:
+        n = view[pos]
+        pos += 1 + n
+        if n == 0:
+            return pos
+
+
+def _gif_frames(view: memoryview, pos: int) -> int | None:
+    frames = 0
+    while pos < len(view):
+        block = view[pos]
+        if block == 0x3B:  # trailer
+            return frames
+        if block == 0x21:  # extensão
+            pos = _gif_skip_sub_blocks(view, pos + 2)
+        elif block == 0x2C:  # image descriptor
+            frames += 1
+            packed = view[pos + 9]
+            pos += 10
+            if packed & 0x80:
+                pos += 3 << ((packed & 0x07) + 1)
+            pos = _gif_skip_sub_blocks(view, pos + 1)  # + LZW min code size
+        else:
+            return None
+    return None  # truncado
+
+
+def _gif(view: memoryview, count_frames: bool) -> ImageMeta:
+    width, height, packed = struct.unpack_from("<HHB", view, 6)
+    depth = ((packed >> 4) & 0x07) + 1
+    frames = None
+    if count_frames:
+        pos = 13
+        if packed & 0x80:
+            pos += 3 << ((packed & 0x07) + 1)
+        frames = _gif_frames(view, pos)
+    return ImageMeta("gif", width, height, depth, "palette", None, frames)
+
+
+def _webp(view: memoryview, _count: bool) -> ImageMeta:
+    riff_end = 8 + struct.unpack_from("<I", view, 4)[0]
+    end = min(len(view), riff_end)
+    width: int | None = None
+    height: int | None = None
+    color = None
+    orientation = None
+    anmf = 0
+    animated = False
+    pos = 12
+    while pos + 8 <= end:
+        ctype, length = struct.unpack_from("<4sI", view, pos)
+        body = pos + 8
+        if ctype == b"VP8X":
+            flags = view[body]
+            animated = bool(flags & 0x02)
+            color = "rgba" if flags & 0x10 else "rgb"
+            w = view[body + 4] | view[body + 5] << 8 | view[body + 6] << 16
+            h = view[body + 7] | view[body + 8] << 8 | view[body + 9] << 16
+            width, height = w + 1, h + 1
+        elif ctype == b"VP8 " and width is None:
+            if bytes(view[body + 3 : body + 6]) != b"\x9d\x01\x2a":
+                raise ValueError("bad VP8 start code")
+            w, h = struct.unpack_from("<HH", view, body + 6)
+            width, height, color = w & 0x3FFF, h & 0x3FFF, "rgb"
+        elif ctype == b"VP8L" and width is None:
+            if view[body] != 0x2F:
+                raise ValueError("bad VP8L signature")
+            (bits,) = struct.unpack_from("<I", view, body + 1)
+            width = (bits & 0x3FFF) + 1
+            height = ((bits >> 14) & 0x3FFF) + 1
+            color = "rgba" if bits >> 28 & 1 else "rgb"
+        elif ctype == b"ANMF":
+            anmf += 1
+        elif ctype == b"EXIF":
+            exif = body + 6 if bytes(view[body : body + 6]) == b"Exif\0\0" else body
+            orientation = _exif_orientation(view, exif, min(body + length, end))
+        pos = body + length + (length & 1)  # chunks alinhados em 2 bytes
+    frames: int | None = anmf
+    if not animated:
+        frames = 1
+    elif riff_end > len(view) or not anmf:
+        frames = None  # animação truncada: contagem incompleta
+    return ImageMeta("webp", width, height, 8, color, orientation, frames)
+
+
+def _bmp(view: memoryview, _count: bool) -> ImageMeta:
+    (header_size,) = struct.unpack_from("<I", view, 14)
+    if header_size == 12:  # BITMAPCOREHEADER (OS/2)
+        width, height, _planes, bpp = struct.unpack_from("<HHHH", view, 18)
+    else:
+        width, height, _planes, bpp = struct.unpack_from("<iiHH", view, 18)
+    color = "palette" if bpp <= 8 else ("rgba" if bpp == 32 else "rgb")
+    return ImageMeta("bmp", width, abs(height), bpp, color, None, 1)
+
+
+_PARSERS = {"png": _png, "jpeg": _jpeg, "gif": _gif, "webp": _webp, "bmp": _bmp}
@@ -1,55 +1,203 @@
-import base64
+from collections.abc import Mapping
+from typing import Any
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from services.shared.app_middleware import apply_middlewares
+from services.shared.config_schema import TenantLimits
 from services.shared.health import HealthChecker, ProbeStatus
-from services.shared.middleware_utils import RequestIdMiddleware, TenantMiddleware
-
-from .models import VisionAnalyzeRequest, VisionAnalyzeResponse
+from services.shared.logging_utils import flush_access_log
+from services.shared.loop_monitor import LoopLagMonitor
+from services.shared.metrics import metrics_router
+from services.shared.middleware.rate_limit import check_rate_limit
+from services.shared.profiler import profiler_router
+from services.shared.tracing import flush_traces
+
+from .b64stream import Base64Error, JsonFieldError
+from .dedupe import DEDUPE
+from .models import (
+    VisionAnalyzeRequest,
+    VisionAnalyzeResponse,
+    VisionBatchItem,
+    VisionBatchRequest,
+    VisionBatchResponse,
+)
+from .pool import analyze_batch, shutdown_pool
+from .upload import (
+    UploadError,
+    analyze_json_stream,
+    analyze_multipart,
+    analyze_octet_stream,
+    describe_sniffed,
+)
 
 app = FastAPI(title="Sextinha Vision API", version="0.1.0")
 
-# ✅ ORDEM IMPORTA: RequestId antes de Tenant
-app.add_middleware(RequestIdMiddleware)
-app.add_middleware(TenantMiddleware)
+# RequestLogging (outermost) -> Metrics -> TenantGateway (request-id, auth, config, RL, CORS)
+# -> Idempotency-Key nos POSTs de análise do v1 (rotas públicas não têm tenant)
+apply_middlewares(
+    app,
+    service="sextinha_vision_api",
+    idempotent_paths=("/v1/vision/analyze", "/v1/vision/analyze/batch"),
+    # o lote cobra as imagens no bucket de /v1/vision/analyze (não também no dele)
+    handler_rate_limited_paths=("/v1/vision/analyze/batch",),
+)
 
 
-def _detect_image_format(data: bytes) -> str:
-    if data.startswith(b"\x89PNG\r\n\x1a\n"):
-        return "png"
-    if data.startswith(b"\xff\xd8"):
-        return "jpeg"
-    return "unknown"
+_DEFAULT_MAX_IMAGES = TenantLimits().max_images_per_request
+
+
+def _tenant_section(request: Request, name: str) -> Mapping[str, Any]:
+    cfg = getattr(request.state, "tenant_config", None)
+    section = cfg.get(name) if isinstance(cfg, Mapping) else None
+    return section if isinstance(section, Mapping) else {}
+
+
+async def _analyze_json(request: Request) -> VisionAnalyzeResponse:
+    """
+    Caminho JSON do v1 em streaming: o base64 é validado e decodificado em
+    fatias conforme o corpo chega. Erros no mesmo formato da validação do
+    modelo (422 com `loc` a partir de "body").
+    """
+    field = "image_base64"
+    error: dict[str, Any]
+    try:
+        return await analyze_json_stream(request.stream(), field)
+    except JsonFieldError as ex:
+        loc = ("body",) if ex.kind == "json_invalid" else ("body", field)
+        error = {"type": ex.kind, "loc": loc, "msg": str(ex), "input": None}
+    except Base64Error as ex:
+        error = {
+            "type": "value_error",
+            "loc": ("body",),
+            "msg": "Value error, image_base64 inválido",
+            "input": None,
+            "ctx": {"error": str(ex)},
+        }
+    raise RequestValidationError([error])
+
+
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": VisionAnalyzeRequest.model_json_schema()},
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"image": {"type": "string", "format": "binary"}},
+                    "required": ["image"],
+                }
+            },
+        },
+    }
+}
 
 
 # --------- ROTAS ---------
 
 
-# ✅ Versão versionada (protegida pelo TenantMiddleware via /v1/*)
-@app.post("/v1/vision/analyze", response_model=VisionAnalyzeResponse, tags=["v1"])
-def vision_analyze_v1(req: VisionAnalyzeRequest) -> VisionAnalyzeResponse:
-    data = base64.b64decode(req.image_base64, validate=True)
-    fmt = _detect_image_format(data)
-    return VisionAnalyzeResponse(size_bytes=len(data), format=fmt)
+# ✅ Versão versionada (protegida pelo TenantGateway via /v1/*)
+@app.post(
+    "/v1/vision/analyze",
+    response_model=VisionAnalyzeResponse,
+    tags=["v1"],
+    openapi_extra=_UPLOAD_OPENAPI,
+)
+async def vision_analyze_v1(request: Request) -> VisionAnalyzeResponse:
+    """
+    JSON com `image_base64` ou upload binário: `application/octet-stream`
+    (corpo = imagem) ou `multipart/form-data` (arquivo / campo `image`). Tudo
+    é lido em streaming (o base64 decodificado em fatias): só os bytes
+    iniciais (formato e metadados) ficam em memória.
+    """
+    content_type = request.headers.get("content-type", "")
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        if media_type == "application/octet-stream":
+            return await analyze_octet_stream(request.stream())
+        if media_type == "multipart/form-data":
+            return await analyze_multipart(request.stream(), content_type)
+    except UploadError as ex:
+        raise HTTPException(status_code=422, detail=str(ex)) from ex
+    if media_type not in ("", "application/json"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use application/json, application/octet-stream or multipart/form-data",
+        )
+    return await _analyze_json(request)
+
+
+@app.post(
+    "/v1/vision/analyze/batch",
+    response_model=VisionBatchResponse,
+    tags=["v1"],
+    responses={429: {"description": "Batch exceeds the tenant's remaining rate limit"}},
+)
+async def vision_analyze_batch(req: VisionBatchRequest, request: Request):
+    """
+    Até `limits.max_images_per_request` imagens por chamada, decodificadas e
+    inspecionadas em paralelo. Cada imagem custa `rate_limit.image_item_weight`
+    (default 1) tokens no bucket de /v1/vision/analyze; imagem inválida volta
+    com `error`, sem derrubar o lote.
+    """
+    n = len(req.images_base64)
+    max_images = int(
+        _tenant_section(request, "limits").get("max_images_per_request", _DEFAULT_MAX_IMAGES)
+    )
+    if n > max_images:
+        raise HTTPException(
+            status_code=413,
+            detail=f"batch exceeds max_images_per_request ({max_images})",
+        )
+
+    weight = float(_tenant_section(request, "rate_limit").get("image_item_weight", 1.0))
+    limited = check_rate_limit(request, units=n * weight, route="/v1/vision/analyze")
+    if limited is not None:
+        return limited
+
+    results = await analyze_batch(req.images_base64)
+    items = [
+        (
+            VisionBatchItem(index=i, error=r)
+            if isinstance(r, str)
+            else VisionBatchItem(index=i, result=r)
+        )
+        for i, r in enumerate(results)
+    ]
+    return VisionBatchResponse(count=n, items=items)
 
 
 # (Opcional) Alias não versionado para compatibilidade. Fica público.
 # Remova se não quiser manter esse caminho legacy.
 @app.post("/vision/analyze", response_model=VisionAnalyzeResponse, tags=["ops"])
 def vision_analyze_legacy(req: VisionAnalyzeRequest) -> VisionAnalyzeResponse:
-    data = base64.b64decode(req.image_base64, validate=True)
-    fmt = _detect_image_format(data)
-    return VisionAnalyzeResponse(size_bytes=len(data), format=fmt)
+    return describe_sniffed(req.sniffer)
 
 
 # --- health/readiness padronizados ---
 checker = HealthChecker(service_name="sextinha_vision_api")
+loop_monitor = LoopLagMonitor(service="sextinha_vision_api")
 
 
 @app.on_event("startup")
 async def _startup_health() -> None:
     checker.register("app_started", lambda: True)
+    loop_monitor.start()
+    checker.register("event_loop", loop_monitor.healthy)
+
+
+@app.on_event("shutdown")
+async def _shutdown_flush_logs() -> None:
+    await loop_monitor.stop()
+    # drena as filas do access log e dos traces antes do processo sair
+    flush_access_log()
+    flush_traces()
+    shutdown_pool()
+    DEDUPE.close()
 
 
 @app.get("/health", response_model=ProbeStatus, tags=["ops"])
@@ -68,3 +216,7 @@ async def readiness_probe():
     if ok:
         return payload
     return JSONResponse(status_code=503, content=payload.model_dump())
+
+
+app.include_router(metrics_router, tags=["ops"])
+app.include_router(profiler_router)
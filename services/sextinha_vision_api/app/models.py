@@ -1,24 +1,55 @@
-import base64
-import binascii
-
-from pydantic import Field, field_validator
+from pydantic import Field, PrivateAttr, model_validator
 
 from services.shared.models import AppBaseModel
 
+from .b64stream import Base64Error, sniff_base64
+from .dedupe import DEDUPE
+from .image_meta import HeaderSniffer
+
 
 class VisionAnalyzeRequest(AppBaseModel):
     image_base64: str = Field(..., min_length=1, description="Imagem codificada em base64")
 
-    @field_validator("image_base64")
-    @classmethod
-    def validate_b64(cls, v: str) -> str:
+    # a validação decodifica em fatias (a única decodificação): guarda só o
+    # tamanho, os bytes iniciais e o hash, nunca a imagem inteira
+    _sniffer: HeaderSniffer = PrivateAttr(default_factory=HeaderSniffer)
+
+    @model_validator(mode="after")
+    def decode_b64(self) -> "VisionAnalyzeRequest":
         try:
-            base64.b64decode(v, validate=True)
-        except (binascii.Error, ValueError) as e:
+            self._sniffer = sniff_base64(self.image_base64, HeaderSniffer(DEDUPE.enabled))
+        except Base64Error as e:
             raise ValueError("image_base64 inválido") from e
-        return v
+        return self
+
+    @property
+    def sniffer(self) -> HeaderSniffer:
+        return self._sniffer
 
 
 class VisionAnalyzeResponse(AppBaseModel):
     size_bytes: int
-    format: str  # png | jpeg | unknown
+    format: str  # png | jpeg | gif | webp | bmp | unknown
+    # metadados dos cabeçalhos (None quando o formato/trecho lido não traz)
+    width: int | None = None
+    height: int | None = None
+    bit_depth: int | None = None
+    color_type: str | None = None
+    orientation: int | None = None  # EXIF 1..8
+    frames: int | None = None
+
+
+class VisionBatchRequest(AppBaseModel):
+    # sem validação aqui: cada imagem é decodificada uma vez, no worker
+    images_base64: list[str] = Field(..., min_length=1, description="Imagens em base64")
+
+
+class VisionBatchItem(AppBaseModel):
+    index: int
+    result: VisionAnalyzeResponse | None = None
+    error: str | None = None
+
+
+class VisionBatchResponse(AppBaseModel):
+    count: int
+    items: list[VisionBatchItem]
@@ -0,0 +1,98 @@
+# services/sextinha_vision_api/app/pool.py
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from services.shared import settings
+
+from .b64stream import Base64Error, sniff_base64
+from .dedupe import DEDUPE
+from .image_meta import HeaderSniffer
+from .models import VisionAnalyzeResponse
+from .upload import describe_sniffed
+
+_pool: ProcessPoolExecutor | None = None
+# Sem fork: o processo já tem as threads do access log e do exportador de
+# traces, e o filho herdaria os locks delas no estado do momento (deadlock).
+# forkserver onde existe (Linux/macOS), spawn no resto.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def pool_size() -> int:
+    return settings.VISION_POOL_WORKERS or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool do serviço (criado no primeiro uso; base64 segura o GIL)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=_MP_CONTEXT)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def analyze_b64_many(
+    images: Sequence[str], dedupe: bool = True
+) -> list[VisionAnalyzeResponse | str]:
+    """
+    Decodifica (em fatias, sem materializar a imagem) e inspeciona cada item;
+    base64 inválido vira a mensagem de erro (str) sem derrubar o lote. Função
+    de módulo: roda no process pool, onde vai com `dedupe=False` (o DEDUPE é
+    do processo do app; o worker teria só uma cópia).
+    """
+    out: list[VisionAnalyzeResponse | str] = []
+    for b64 in images:
+        try:
+            sniffer = sniff_base64(b64, HeaderSniffer(dedupe and DEDUPE.enabled))
+        except Base64Error:
+            out.append("image_base64 inválido")
+            continue
+        out.append(describe_sniffed(sniffer))
+    return out
+
+
+def _split(items: Sequence[str], parts: int) -> list[Sequence[str]]:
+    size, rest = divmod(len(items), parts)
+    out, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < rest else 0)
+        if end > start:
+            out.append(items[start:end])
+        start = end
+    return out
+
+
+async def analyze_batch(images: Sequence[str]) -> list[VisionAnalyzeResponse | str]:
+    """
+    Lotes pequenos rodam numa thread; a partir de VISION_BATCH_PARALLEL_MIN_BYTES
+    (de base64) o lote é dividido em fatias contíguas, uma por worker do process
+    pool, e os resultados voltam na ordem de entrada.
+    """
+    workers = pool_size()
+    total = sum(len(b64) for b64 in images)
+    if workers < 2 or len(images) < 2 or total < settings.VISION_BATCH_PARALLEL_MIN_BYTES:
+        return await run_in_threadpool(analyze_b64_many, images)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    parts = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, analyze_b64_many, chunk, False)
+            for chunk in _split(images, min(workers, len(images)))
+        )
+    )
+    return [item for part in parts for item in part]
@@ -0,0 +1,186 @@
+# services/sextinha_vision_api/app/upload.py
+from __future__ import annotations
+
+import re
+from collections.abc import AsyncIterator
+from typing import Final
+
+from .b64stream import Base64StreamDecoder, JsonFieldError, JsonStringField
+from .dedupe import DEDUPE
+from .image_meta import HeaderSniffer, parse_image_meta
+from .models import VisionAnalyzeResponse
+
+_BOUNDARY_RE: Final[re.Pattern[str]] = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_DISPOSITION_RE: Final[re.Pattern[bytes]] = re.compile(
+    rb"^content-disposition:(.*)$", re.IGNORECASE | re.MULTILINE
+)
+# Campo escolhido quando nenhuma parte traz `filename`
+IMAGE_FIELD: Final[str] = "image"
+
+
+class UploadError(ValueError):
+    """Upload malformado (multipart sem boundary/parte de imagem, corpo vazio)."""
+
+
+def describe_image(
+    data: bytes | bytearray | memoryview, size: int, gif_frames: int | None = None
+) -> VisionAnalyzeResponse:
+    """
+    Resposta com os metadados de cabeçalho de `data` (o arquivo ou o começo
+    dele). `gif_frames` vem da contagem em streaming, que vê o arquivo todo.
+    """
+    meta = parse_image_meta(data, count_gif_frames=gif_frames is None)
+    return VisionAnalyzeResponse(
+        size_bytes=size,
+        format=meta.format,
+        width=meta.width,
+        height=meta.height,
+        bit_depth=meta.bit_depth,
+        color_type=meta.color_type,
+        orientation=meta.orientation,
+        frames=gif_frames if meta.format == "gif" and gif_frames is not None else meta.frames,
+    )
+
+
+def describe_sniffed(sniffer: HeaderSniffer) -> VisionAnalyzeResponse:
+    """`describe_image` com o DEDUPE na frente quando o sniffer calculou o hash."""
+    digest = sniffer.digest
+    if digest is None:
+        return describe_image(sniffer.head, sniffer.size, sniffer.gif_frames)
+    cached = DEDUPE.get(digest, sniffer.size)
+    if cached is not None:
+        return VisionAnalyzeResponse.model_validate_json(cached)
+    result = describe_image(sniffer.head, sniffer.size, sniffer.gif_frames)
+    DEDUPE.put(digest, result.model_dump_json().encode())
+    return result
+
+
+class ImageSniffer(HeaderSniffer):
+    def __init__(self) -> None:
+        super().__init__(digest=DEDUPE.enabled)
+
+    def result(self) -> VisionAnalyzeResponse:
+        if not self.size:
+            raise UploadError("empty image")
+        return describe_sniffed(self)
+
+
+def multipart_boundary(content_type: str) -> bytes:
+    match = _BOUNDARY_RE.search(content_type)
+    if match is None:
+        raise UploadError("multipart body without boundary")
+    return match.group(1).strip().encode("latin-1")
+
+
+def _is_image_part(headers: bytes) -> bool:
+    match = _DISPOSITION_RE.search(headers)
+    if match is None:
+        return False
+    disposition = match.group(1)
+    return b"filename=" in disposition or f'name="{IMAGE_FIELD}"'.encode() in disposition
+
+
+class MultipartImageReader:
+    """
+    Parser incremental de multipart/form-data que devolve (`feed`) só os bytes
+    da primeira parte de imagem (com `filename` ou campo `image`); as demais
+    são descartadas sem acumular. Guarda no máximo o tamanho do delimitador
+    entre um chunk e outro, para achar um boundary partido ao meio.
+    """
+
+    def __init__(self, boundary: bytes):
+        self._delimiter = b"\r\n--" + boundary
+        self._buf = bytearray(b"\r\n")  # o primeiro "--boundary" vem sem CRLF antes
+        self._state = "preamble"  # preamble | headers | body | skip | done
+        self.found = False
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._buf += data
+        out: list[bytes] = []
+        while self._step(out):
+            pass
+        return out
+
+    def _step(self, out: list[bytes]) -> bool:
+        buf = self._buf
+        if self._state == "done":
+            buf.clear()
+            return False
+
+        if self._state in ("preamble", "body", "skip"):
+            idx = buf.find(self._delimiter)
+            if idx < 0:
+                # tudo menos uma possível ponta do delimitador já pode sair
+                keep = len(self._delimiter) - 1
+                if self._state == "body" and len(buf) > keep:
+                    out.append(bytes(buf[:-keep]))
+                if len(buf) > keep:
+                    del buf[:-keep]
+                return False
+            if self._state == "body":
+                if idx:
+                    out.append(bytes(buf[:idx]))
+                self._state = "done"
+                return True
+            after = idx + len(self._delimiter)
+            if len(buf) < after + 2:
+                return False
+            if buf[after : after + 2] == b"--":
+                self._state = "done"  # fim do multipart
+                return True
+            del buf[: after + 2]  # "\r\n" depois do boundary
+            self._state = "headers"
+            return True
+
+        # headers da parte
+        end = buf.find(b"\r\n\r\n")
+        if end < 0:
+            return False
+        headers = bytes(buf[:end])
+        del buf[: end + 4]
+        if not self.found and _is_image_part(headers):
+            self.found = True
+            self._state = "body"
+        else:
+            self._state = "skip"  # parte ignorada: só procura o próximo delimitador
+        return True
+
+
+async def analyze_octet_stream(chunks: AsyncIterator[bytes]) -> VisionAnalyzeResponse:
+    sniffer = ImageSniffer()
+    async for chunk in chunks:
+        sniffer.feed(chunk)
+    return sniffer.result()
+
+
+async def analyze_multipart(
+    chunks: AsyncIterator[bytes], content_type: str
+) -> VisionAnalyzeResponse:
+    reader = MultipartImageReader(multipart_boundary(content_type))
+    sniffer = ImageSniffer()
+    async for chunk in chunks:
+        for part in reader.feed(chunk):
+            sniffer.feed(part)
+    if not reader.found:
+        raise UploadError(f'multipart body without a file or "{IMAGE_FIELD}" part')
+    return sniffer.result()
+
+
+async def analyze_json_stream(chunks: AsyncIterator[bytes], field: str) -> VisionAnalyzeResponse:
+    """
+    Corpo `{"<field>": "<base64>"}` lido em streaming: o valor vai do leitor
+    JSON direto para o decodificador base64 e dele para o sniffer. Nem o
+    corpo, nem a string, nem a imagem decodificada ficam inteiros em memória.
+    Erros: JsonFieldError (formato do JSON) e Base64Error (conteúdo).
+    """
+    reader = JsonStringField(field)
+    decoder = Base64StreamDecoder()
+    sniffer = HeaderSniffer(digest=DEDUPE.enabled)
+    async for chunk in chunks:
+        for piece in reader.feed(chunk):
+            sniffer.feed(decoder.feed(piece))
+    reader.close()
+    sniffer.feed(decoder.close())
+    if not decoder.consumed:
+        raise JsonFieldError("string_too_short", "String should have at least 1 character")
+    return describe_sniffed(sniffer)
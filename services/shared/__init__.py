@@ -1 +1,2 @@
+from .gateway import TenantGatewayMiddleware  # noqa: F401
 from .middleware_utils import RequestIdMiddleware, TenantMiddleware  # noqa: F401
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import hashlib
+import hmac
 import os
+import time
+from collections.abc import Iterable
 
 from fastapi import HTTPException, status
 
@@ -22,3 +26,54 @@ def ensure_admin_enabled() -> None:
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Admin routes disabled in this environment",
     )
+
+
+# --- token de debug assinado (diagnóstico por request) ------------------------
+
+DEBUG_TOKEN_HEADER = "X-Debug-Token"
+
+
+def _debug_secret() -> bytes | None:
+    secret = os.getenv("ADMIN_DEBUG_SECRET", "").strip()
+    return secret.encode() if secret else None
+
+
+def _sign(secret: bytes, features: str, expires_at: int) -> str:
+    msg = f"{features}.{expires_at}".encode()
+    return hmac.new(secret, msg, hashlib.sha256).hexdigest()
+
+
+def sign_debug_token(features: Iterable[str], ttl_s: int = 300) -> str:
+    """
+    Gera o valor do header `X-Debug-Token` liberando `features` (ex.: "timing")
+    por `ttl_s` segundos: "<features>.<expira_em>.<hmac-sha256>".
+    Requer ADMIN_DEBUG_SECRET; usado por operadores/scripts de diagnóstico.
+    """
+    secret = _debug_secret()
+    if secret is None:
+        raise RuntimeError("ADMIN_DEBUG_SECRET not configured")
+    joined = ",".join(sorted(set(features)))
+    expires_at = int(time.time()) + ttl_s
+    return f"{joined}.{expires_at}.{_sign(secret, joined, expires_at)}"
+
+
+def debug_features(token: str | None, now: float | None = None) -> frozenset[str]:
+    """
+    Features liberadas por um `X-Debug-Token` válido (assinatura e validade).
+    Token ausente/inválido/expirado, ou sem ADMIN_DEBUG_SECRET -> vazio.
+    """
+    if not token:
+        return frozenset()
+    secret = _debug_secret()
+    if secret is None:
+        return frozenset()
+    try:
+        features, expires_raw, sig = token.split(".")
+        expires_at = int(expires_raw)
+    except ValueError:
+        return frozenset()
+    if expires_at < (time.time() if now is None else now):
+        return frozenset()
+    if not hmac.compare_digest(sig, _sign(secret, features, expires_at)):
+        return frozenset()
+    return frozenset(f for f in features.split(",") if f)
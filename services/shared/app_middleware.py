@@ -1,18 +1,43 @@
+from collections.abc import Iterable
+
 from fastapi import FastAPI
 
-from services.shared.middleware.cors import CORSMiddlewarePerTenant
-from services.shared.middleware.rate_limit import RateLimitMiddlewarePerTenant
+from services.shared.gateway import DEFAULT_PIPELINE, GatewayPipeline, TenantGatewayMiddleware
+from services.shared.middleware.idempotency import IdempotencyMiddleware
+from services.shared.middleware.metrics import MetricsMiddleware
 from services.shared.middleware.request_logging import RequestLoggingMiddleware
-from services.shared.middleware_utils import RequestIdMiddleware, TenantMiddleware
 
 
-def apply_middlewares(app: FastAPI) -> None:
+def apply_middlewares(
+    app: FastAPI,
+    pipeline: GatewayPipeline = DEFAULT_PIPELINE,
+    service: str | None = None,
+    idempotent_paths: Iterable[str] = (),
+    handler_rate_limited_paths: Iterable[str] = (),
+) -> None:
     """
     Ordem efetiva de execução (o ÚLTIMO adicionado roda primeiro):
-      RequestLogging -> RequestId -> Tenant -> RateLimit -> CORS
+      RequestLogging -> Metrics -> TenantGateway(request_id, profile, auth, config,
+      body_limit, rate_limit, concurrency, cors) -> Idempotency (só se `idempotent_paths`)
+
+    `service` é o rótulo das métricas e o `service.name` dos traces (default: título da app).
+    Em `handler_rate_limited_paths` o estágio rate_limit não cobra: o handler
+    cobra por conta própria (lotes: N itens no bucket da rota unitária).
+    Chamar duas vezes na mesma app é erro: cada etapa rodaria duas vezes por request.
     """
-    app.add_middleware(CORSMiddlewarePerTenant)  # innermost
-    app.add_middleware(RateLimitMiddlewarePerTenant)
-    app.add_middleware(TenantMiddleware)
-    app.add_middleware(RequestIdMiddleware)
+    if any(m.cls is TenantGatewayMiddleware for m in app.user_middleware):
+        raise RuntimeError("apply_middlewares() já aplicado nesta app")
+
+    service = service or app.title
+    paths = tuple(idempotent_paths)
+    if paths:
+        # dentro do gateway: precisa do tenant resolvido para escopar as chaves
+        app.add_middleware(IdempotencyMiddleware, paths=paths)
+    app.add_middleware(
+        TenantGatewayMiddleware,
+        pipeline=pipeline,
+        service=service,
+        handler_rate_limited_paths=tuple(handler_rate_limited_paths),
+    )
+    app.add_middleware(MetricsMiddleware, service=service)
     app.add_middleware(RequestLoggingMiddleware)  # outermost
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import threading
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, cast
 
 import yaml
@@ -9,6 +12,10 @@ from .config_schema import TenantConfig
 
 BASE_DIR = Path(__file__).resolve().parent / "tenants"
 
+# slug -> ((mtime_ns, size) do arquivo, config já parseado e congelado)
+_CACHE: dict[str, tuple[tuple[int, int], Mapping[str, Any]]] = {}
+_CACHE_LOCK = threading.Lock()
+
 
 def _read_yaml(path: Path) -> dict:
     if not path.exists():
@@ -44,7 +51,34 @@ def _fallback_minimal_config(slug: str) -> dict[str, Any] | None:
     }
 
 
-def load_config(slug: str):
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw_config(value: Any) -> Any:
+    """Cópia mutável (dicts e listas) de um config devolvido por `load_config`."""
+    if isinstance(value, Mapping):
+        return {k: thaw_config(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw_config(v) for v in value]
+    return value
+
+
+def load_config(slug: str) -> Mapping[str, Any]:
+    """
+    Config do tenant, parseado uma vez por versão do arquivo: roda no event
+    loop a cada request protegida, então o caminho comum é um `stat` (mtime
+    e tamanho), sem reler o YAML nem copiar. Arquivo reescrito (provisioner,
+    edição) invalida sozinho.
+
+    O valor é compartilhado entre requests, por isso vem congelado
+    (`MappingProxyType`, listas como tuplas); quem precisa alterar usa
+    `thaw_config`.
+    """
     cfg_path = BASE_DIR / slug / "config.yaml"
     if not cfg_path.exists():
         from .config_provisioner import sync_from_db
@@ -53,11 +87,23 @@ def load_config(slug: str):
             sync_from_db(overwrite=False)
         except Exception:
             pass
-    if not cfg_path.exists():
-        raise FileNotFoundError(f"config for tenant '{slug}' not found")
-    with cfg_path.open("r", encoding="utf-8") as fh:
-        data: dict[str, Any] = yaml.safe_load(fh)
-    return data
+    try:
+        st = cfg_path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"config for tenant '{slug}' not found") from None
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _CACHE.get(slug)
+    if cached is None or cached[0] != version:
+        with cfg_path.open("r", encoding="utf-8") as fh:
+            data = _freeze(yaml.safe_load(fh) or {})
+        with _CACHE_LOCK:
+            _CACHE[slug] = cached = (version, data)
+    return cached[1]
+
+
+def clear_config_cache() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
 
 
 def reload_all_configs() -> int:
@@ -65,6 +111,7 @@ def reload_all_configs() -> int:
     Varre tenants/*/config.yaml e valida todos.
     Retorna a contagem validada. Útil para o endpoint /admin/reload-config.
     """
+    clear_config_cache()
     if not BASE_DIR.exists():
         return 0
 
@@ -21,6 +21,9 @@ class TenantLimits(BaseModel):
     max_input_tokens: IntGE1 = 4096
     max_output_tokens: IntGE1 = 1024
     max_images_per_request: IntGE0 = 4
+    max_batch_items: IntGE1 = 100  # textos por chamada em /v1/text/analyze/batch
+    result_cache_bytes: IntGE0 | None = None  # cota no cache de análises (None = default)
+    max_request_bytes: IntGE1 = 10 * 1024 * 1024  # corpo da request (413 antes de bufferizar)
 
 
 class TenantModels(BaseModel):
@@ -33,6 +36,35 @@ class TenantCORS(BaseModel):
     origins: list[StrNonEmpty] = Field(default_factory=list)
 
 
+class TenantConcurrency(BaseModel):
+    # Requests simultâneas por tenant; excedente aguarda em fila limitada
+    max_in_flight: IntGE1 = 8
+    max_queue: IntGE0 = 32
+    max_wait_ms: IntGE0 = 2000
+
+
+class TenantLogRoute(BaseModel):
+    sample_rate: Annotated[float, Field(ge=0.0, le=1.0)] | None = None
+    slow_ms: IntGE0 | None = None
+
+
+class TenantLogging(BaseModel):
+    # Fração de sucessos (status < 400) logados; erros e lentas sempre entram
+    sample_rate: Annotated[float, Field(ge=0.0, le=1.0)] = 1.0
+    slow_ms: IntGE0 = 1000
+    routes: dict[str, TenantLogRoute] = Field(default_factory=dict)
+
+
+class TenantDiagnostics(BaseModel):
+    # Header `Server-Timing` com a duração de cada estágio do gateway
+    server_timing: bool = False
+
+
+class TenantTracing(BaseModel):
+    # Fração de requests com trace exportado (None -> TRACE_SAMPLE_RATE)
+    sample_rate: Annotated[float, Field(ge=0.0, le=1.0)] | None = None
+
+
 class TenantConfig(BaseModel):
     # nome do tenant (exibido no /v1/ping)
     name: StrNonEmpty
@@ -41,3 +73,7 @@ class TenantConfig(BaseModel):
     limits: TenantLimits
     models: TenantModels
     cors: TenantCORS
+    concurrency: TenantConcurrency = Field(default_factory=TenantConcurrency)
+    logging: TenantLogging = Field(default_factory=TenantLogging)
+    diagnostics: TenantDiagnostics = Field(default_factory=TenantDiagnostics)
+    tracing: TenantTracing = Field(default_factory=TenantTracing)
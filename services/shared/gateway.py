@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from time import perf_counter_ns
+from typing import Final
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admin_guard import DEBUG_TOKEN_HEADER, debug_features
+from .middleware.body_limit import (
+    BodyTooLarge,
+    check_content_length,
+    limit_receive,
+    request_body_limit,
+    too_large,
+)
+from .middleware.concurrency import acquire_concurrency_slot
+from .middleware.cors import check_cors
+from .middleware.rate_limit import check_rate_limit
+from .middleware_utils import (
+    REQUEST_ID_HEADER,
+    TENANT_ID_HEADER,
+    _ensure_request_id,
+    authenticate_tenant,
+    build_route_classifier,
+    classify_request,
+    load_tenant_config,
+    requires_tenant,
+    send_with_headers,
+)
+from .profiler import PROFILE_FEATURE, PROFILE_SUMMARY_HEADER, RequestProfile
+from .route_matcher import route_template
+from .server_timing import (
+    APP_STAGE,
+    SERVER_TIMING_HEADER,
+    format_server_timing,
+    server_timing_enabled,
+)
+from .tenant_context import set_current_tenant
+from .tracing import TRACEPARENT_HEADER, Trace, span, tenant_sample_rate, traced_request
+
+# Estágios conhecidos e de quais dependem (precisam aparecer antes no pipeline)
+STAGE_DEPENDENCIES: Final[dict[str, tuple[str, ...]]] = {
+    "request_id": (),
+    "profile": (),
+    "auth": (),
+    "config": ("auth",),
+    "body_limit": ("config",),
+    "rate_limit": ("config",),
+    "concurrency": ("config",),
+    "cors": ("config",),
+}
+
+# Ordem padrão de execução (um único passe por request)
+DEFAULT_STAGES: Final[tuple[str, ...]] = (
+    "request_id",
+    "profile",
+    "auth",
+    "config",
+    "body_limit",
+    "rate_limit",
+    "concurrency",
+    "cors",
+)
+
+
+@dataclass(frozen=True)
+class GatewayPipeline:
+    """
+    Definição declarativa dos estágios do gateway, na ordem de execução.
+    Validada na construção (startup): estágio desconhecido, duplicado ou fora
+    de ordem em relação às dependências -> ValueError.
+    """
+
+    stages: tuple[str, ...] = DEFAULT_STAGES
+
+    def __post_init__(self) -> None:
+        seen: set[str] = set()
+        for name in self.stages:
+            if name not in STAGE_DEPENDENCIES:
+                raise ValueError(f"unknown gateway stage: {name!r}")
+            if name in seen:
+                raise ValueError(f"duplicate gateway stage: {name!r}")
+            missing = [dep for dep in STAGE_DEPENDENCIES[name] if dep not in seen]
+            if missing:
+                raise ValueError(f"gateway stage {name!r} requires {missing} before it")
+            seen.add(name)
+
+
+# Pipeline padrão das apps (apply_middlewares)
+DEFAULT_PIPELINE: Final[GatewayPipeline] = GatewayPipeline()
+
+
+@dataclass
+class _GatewayContext:
+    request: Request
+    # `receive` entregue ao app (estágios podem envolvê-lo, ex.: body_limit)
+    receive: Receive
+    # headers acrescentados à resposta (normal ou de erro)
+    headers: dict[str, str] = field(default_factory=dict)
+    # executados (em ordem reversa) depois que a resposta foi enviada
+    cleanups: list[Callable[[], object]] = field(default_factory=list)
+    # executados no `http.response.start`, antes de os headers serem lidos
+    on_response_start: list[Callable[[], None]] = field(default_factory=list)
+    protected: bool = False
+    # estágio -> duração (ns); o mesmo dict fica em `request.state.timings`
+    timings: dict[str, int] = field(default_factory=dict)
+    app_started_ns: int = 0
+    response_started: bool = False
+    trace: Trace | None = None
+    # rota que cobra o rate limit no handler (lotes): o estágio não cobra de novo
+    rate_limited_in_handler: bool = False
+
+
+Stage = Callable[[_GatewayContext], Awaitable[Response | None]]
+
+
+async def _stage_request_id(ctx: _GatewayContext) -> Response | None:
+    ctx.headers[REQUEST_ID_HEADER] = _ensure_request_id(ctx.request)
+    return None
+
+
+async def _stage_profile(ctx: _GatewayContext) -> Response | None:
+    # opt-in por request via X-Debug-Token assinado (feature "profile")
+    token = ctx.request.headers.get(DEBUG_TOKEN_HEADER)
+    if token is None or PROFILE_FEATURE not in debug_features(token):
+        return None
+    profile = RequestProfile()
+
+    def attach_summary() -> None:
+        ctx.headers[PROFILE_SUMMARY_HEADER] = profile.finish()
+
+    ctx.on_response_start.append(attach_summary)
+    ctx.cleanups.append(profile.finish)  # garante a parada do sampler em exceção
+    return None
+
+
+async def _stage_auth(ctx: _GatewayContext) -> Response | None:
+    ctx.protected = requires_tenant(ctx.request)
+    if not ctx.protected:
+        return None
+    # a busca pela key pode ir ao Postgres (psycopg síncrono): fora do loop
+    error = await run_in_threadpool(authenticate_tenant, ctx.request)
+    if error is not None:
+        return error
+
+    tenant_info = ctx.request.state.tenant
+    ctx.headers[TENANT_ID_HEADER] = tenant_info.id
+    set_current_tenant(tenant_info)
+    ctx.cleanups.append(lambda: set_current_tenant(None))
+    return None
+
+
+async def _stage_config(ctx: _GatewayContext) -> Response | None:
+    if not ctx.protected:
+        return None
+    return load_tenant_config(ctx.request)
+
+
+async def _stage_body_limit(ctx: _GatewayContext) -> Response | None:
+    # limite do tenant (ou o global, em rotas públicas): Content-Length já aqui,
+    # bytes efetivamente recebidos conforme o app lê o corpo
+    limit = request_body_limit(ctx.request)
+    error = check_content_length(ctx.request, limit)
+    if error is None:
+        ctx.receive = limit_receive(ctx.receive, limit)
+    return error
+
+
+async def _stage_rate_limit(ctx: _GatewayContext) -> Response | None:
+    if not ctx.protected or ctx.rate_limited_in_handler:
+        return None
+    return check_rate_limit(ctx.request)
+
+
+async def _stage_concurrency(ctx: _GatewayContext) -> Response | None:
+    if not ctx.protected:
+        return None
+    error, gate = await acquire_concurrency_slot(ctx.request)
+    if gate is not None:
+        ctx.cleanups.append(gate.release)
+    return error
+
+
+async def _stage_cors(ctx: _GatewayContext) -> Response | None:
+    if not ctx.protected:
+        return None
+    error, headers = check_cors(ctx.request)
+    if error is None:
+        ctx.headers.update(headers)
+    return error
+
+
+_STAGES: Final[dict[str, Stage]] = {
+    "request_id": _stage_request_id,
+    "profile": _stage_profile,
+    "auth": _stage_auth,
+    "config": _stage_config,
+    "body_limit": _stage_body_limit,
+    "rate_limit": _stage_rate_limit,
+    "concurrency": _stage_concurrency,
+    "cors": _stage_cors,
+}
+
+
+def _send_with_hooks(ctx: _GatewayContext, send: Send) -> Send:
+    """
+    No início da resposta roda os hooks dos estágios, fecha a medição do app
+    (tempo até o primeiro byte), publica os estágios no header `Server-Timing`
+    (se habilitado) e o `traceparent` do trace amostrado.
+    """
+
+    async def wrapped(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            ctx.response_started = True
+            for hook in ctx.on_response_start:
+                hook()
+            if ctx.app_started_ns:
+                ctx.timings[APP_STAGE] = perf_counter_ns() - ctx.app_started_ns
+            if server_timing_enabled(ctx.request):
+                ctx.headers[SERVER_TIMING_HEADER] = format_server_timing(ctx.timings)
+            trace = ctx.trace
+            if trace is not None and trace.root is not None:
+                trace.root.attributes["http.status_code"] = message["status"]
+                if trace.sampled:
+                    ctx.headers[TRACEPARENT_HEADER] = trace.traceparent()
+        await send(message)
+
+    return wrapped
+
+
+def _decide_sampling(ctx: _GatewayContext) -> None:
+    # amostragem "head": decidida quando o tenant (e o config) já é conhecido,
+    # antes do handler; os estágios até aqui ficam no trace se amostrado
+    trace = ctx.trace
+    if trace is None:
+        return
+    state = ctx.request.state
+    tenant = getattr(state, "tenant", None)
+    if trace.root is not None:
+        trace.root.attributes["request_id"] = getattr(state, "request_id", None) or ""
+        if tenant is not None:
+            trace.root.attributes["tenant.id"] = tenant.id
+    trace.decide(tenant_sample_rate(getattr(state, "tenant_config", None)))
+
+
+class TenantGatewayMiddleware:
+    """
+    Gateway por tenant em uma única camada ASGI: request-id, auth, config,
+    rate limit, concorrência e CORS executados em sequência sobre o mesmo
+    scope/`request.state`, no lugar de uma camada de middleware por etapa.
+
+    Cada estágio (e o app) é cronometrado com `perf_counter_ns`; as durações
+    ficam em `request.state.timings` para o access log e as métricas. Com
+    tracing ligado, cada estágio e o handler viram spans do trace da request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        pipeline: GatewayPipeline | None = None,
+        service: str = "app",
+        handler_rate_limited_paths: Iterable[str] = (),
+    ):
+        self.app = app
+        self.service = service
+        self.pipeline = pipeline or GatewayPipeline()
+        self.handler_rate_limited_paths = frozenset(handler_rate_limited_paths)
+        self._stages: tuple[tuple[str, Stage], ...] = tuple(
+            (n, _STAGES[n]) for n in self.pipeline.stages
+        )
+        self._classifier = build_route_classifier()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = _GatewayContext(
+            request=Request(scope, receive),
+            receive=receive,
+            rate_limited_in_handler=scope["path"] in self.handler_rate_limited_paths,
+        )
+        ctx.request.state.timings = ctx.timings
+        # classificação única da rota; os estágios leem a tag do scope
+        classify_request(ctx.request, self._classifier)
+        send = _send_with_hooks(ctx, send_with_headers(send, ctx.headers))
+        root_attrs = {"http.method": scope["method"], "http.target": scope["path"]}
+        with traced_request(
+            self.service, ctx.request.headers.get(TRACEPARENT_HEADER), root_attrs
+        ) as trace:
+            ctx.trace = trace
+            try:
+                for name, stage in self._stages:
+                    t0 = perf_counter_ns()
+                    with span(f"gateway.{name}"):
+                        error = await stage(ctx)
+                    ctx.timings[name] = perf_counter_ns() - t0
+                    if error is not None:
+                        _decide_sampling(ctx)
+                        await error(scope, receive, send)
+                        return
+                _decide_sampling(ctx)
+                ctx.app_started_ns = perf_counter_ns()
+                with span("handler") as handler_span:
+                    try:
+                        await self.app(scope, ctx.receive, send)
+                    except BodyTooLarge as ex:
+                        # estourou fora do handler do FastAPI (ex.: middleware interno
+                        # lendo o corpo): responde aqui se ainda der
+                        if ctx.response_started:
+                            raise
+                        await too_large(ex.limit)(scope, receive, send)
+                    finally:
+                        if handler_span is not None:
+                            handler_span.attributes["http.route"] = route_template(ctx.request)
+            finally:
+                for cleanup in reversed(ctx.cleanups):
+                    cleanup()
@@ -9,6 +9,8 @@ from dataclasses import dataclass
 
 import psycopg
 
+from .tracing import db_span
+
 
 @dataclass(frozen=True)
 class ApiKeyRow:
@@ -55,7 +57,11 @@ def _derive(api_key_plain: bytes, *, iterations: int = _PBKDF2_ITER) -> tuple[st
 
 
 def list_keys(tenant_id: str) -> list[ApiKeyRow]:
-    with psycopg.connect(_dsn()) as conn, conn.cursor() as cur:
+    with (
+        psycopg.connect(_dsn()) as conn,
+        conn.cursor() as cur,
+        db_span("SELECT", "tenants_api_keys"),
+    ):
         cur.execute(
             """
             SELECT id, tenant_id, name, algo, iterations, salt_b64, hash_b64,
@@ -88,7 +94,11 @@ def list_keys(tenant_id: str) -> list[ApiKeyRow]:
 
 def _insert_key(tenant_id: str, name: str, api_key_plain: str) -> None:
     salt_b64, hash_b64, iterations = _derive(api_key_plain.encode("utf-8"))
-    with psycopg.connect(_dsn()) as conn, conn.cursor() as cur:
+    with (
+        psycopg.connect(_dsn()) as conn,
+        conn.cursor() as cur,
+        db_span("INSERT", "tenants_api_keys"),
+    ):
         cur.execute(
             """
             INSERT INTO tenants_api_keys
@@ -131,7 +141,11 @@ def revoke_key(tenant_id: str, name: str) -> int:
     Revoga a chave (marca revoked_at = now()).
     Retorna número de linhas afetadas (0|1).
     """
-    with psycopg.connect(_dsn()) as conn, conn.cursor() as cur:
+    with (
+        psycopg.connect(_dsn()) as conn,
+        conn.cursor() as cur,
+        db_span("UPDATE", "tenants_api_keys"),
+    ):
         cur.execute(
             """
             UPDATE tenants_api_keys
@@ -161,7 +175,11 @@ def rotate_key(
       - cria nova (retorna (new_name, new_api_key_plain))
     """
     # 1) Revogar anterior
-    with psycopg.connect(_dsn()) as conn, conn.cursor() as cur:
+    with (
+        psycopg.connect(_dsn()) as conn,
+        conn.cursor() as cur,
+        db_span("UPDATE", "tenants_api_keys"),
+    ):
         if previous_name:
             cur.execute(
                 """
@@ -2,24 +2,99 @@ from __future__ import annotations
 
 import json
 import logging
+import queue
 import sys
-from collections.abc import Mapping, MutableMapping
+import threading
+import time
+from collections.abc import Callable, Mapping, MutableMapping
 from datetime import UTC, datetime
-from typing import Any
+from typing import IO, Any, Final, cast
+
+from . import settings
 
 # -------- JSON Formatter --------
 
+# Encoder JSON opcional mais rápido (usado se instalado e pedido via encoder="auto")
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = cast(Any, None)
+
+_BASE_KEYS: Final[frozenset[str]] = frozenset({"timestamp", "level", "logger", "message"})
+
+
+def _resolve_encoder(encoder: str) -> tuple[Callable[[Any], str], str, str]:
+    """Retorna (dumps, separador de itens, separador chave/valor) do encoder."""
+    if encoder == "orjson" or (encoder == "auto" and orjson is not None):
+        if orjson is None:
+            raise RuntimeError("orjson não instalado")
+        fast = orjson
+
+        def dumps_fast(obj: Any) -> str:
+            return fast.dumps(obj).decode("utf-8")
+
+        return dumps_fast, ",", ":"
+    if encoder not in ("json", "auto"):
+        raise ValueError(f"unknown JSON encoder: {encoder!r}")
+
+    def dumps_std(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    return dumps_std, ", ", ": "
+
+
+def report_internal_error(component: str, message: str) -> None:
+    """
+    Falha numa thread de background (escritor do access log, exportador de
+    traces): vai para `logging.lastResort` (stderr) com o traceback corrente,
+    sem passar pelos handlers da app, que podem ser justamente o que falhou.
+    """
+    record = logging.LogRecord(component, logging.ERROR, __file__, 0, message, None, sys.exc_info())
+    (logging.lastResort or logging.StreamHandler(sys.stderr)).handle(record)
+
 
 class JsonFormatter(logging.Formatter):
+    """
+    Uma linha JSON por record: timestamp, level, logger, message + extras
+    (`record.__extra__`) + exc_type/exc_text.
+
+    Caminho rápido: o prefixo estático (`level`/`logger`) é pré-codificado por
+    combinação, o timestamp reaproveita o trecho até os segundos e os extras são
+    codificados direto, sem montar um dict intermediário.
+    `encoder`: "json" (stdlib, padrão), "orjson" ou "auto" (orjson se instalado).
+    """
+
+    def __init__(self, *args: Any, encoder: str = "json", **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._dumps, self._item_sep, self._kv_sep = _resolve_encoder(encoder)
+        self._static: dict[tuple[str, str], str] = {}
+        self._ts_second = -1
+        self._ts_prefix = ""
+
     def formatTime(
         self, record: logging.LogRecord, datefmt: str | None = None
     ) -> str:  # noqa: N802
-        dt = datetime.fromtimestamp(record.created, tz=UTC)
         if datefmt:
-            return dt.strftime(datefmt)
-        return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+            return datetime.fromtimestamp(record.created, tz=UTC).strftime(datefmt)
+        second = int(record.created)
+        if second != self._ts_second:
+            prefix = datetime.fromtimestamp(second, tz=UTC).strftime("%Y-%m-%dT%H:%M:%S")
+            self._ts_second, self._ts_prefix = second, prefix
+        return f"{self._ts_prefix}.{int(record.msecs):03d}Z"
 
-    def format(self, record: logging.LogRecord) -> str:
+    def _static_fields(self, record: logging.LogRecord) -> str:
+        key = (record.levelname, record.name)
+        frag = self._static.get(key)
+        if frag is None:
+            d, sep, kv = self._dumps, self._item_sep, self._kv_sep
+            frag = (
+                f"{d('level')}{kv}{d(record.levelname)}{sep}"
+                f"{d('logger')}{kv}{d(record.name)}{sep}{d('message')}{kv}"
+            )
+            self._static[key] = frag
+        return frag
+
+    def _format_dict(self, record: logging.LogRecord, extra_dict: Any) -> str:
         payload: dict[str, Any] = {
             "timestamp": self.formatTime(record),
             "level": record.levelname,
@@ -27,7 +102,6 @@ class JsonFormatter(logging.Formatter):
             "message": record.getMessage(),
         }
 
-        extra_dict = getattr(record, "__extra__", {})
         if isinstance(extra_dict, dict):
             payload.update(extra_dict)
 
@@ -38,7 +112,151 @@ class JsonFormatter(logging.Formatter):
             payload["exc_type"] = exc_type
             payload["exc_text"] = self.formatException(record.exc_info)
 
-        return json.dumps(payload, ensure_ascii=False)
+        return self._dumps(payload)
+
+    def format(self, record: logging.LogRecord) -> str:
+        extra_dict = getattr(record, "__extra__", None)
+        if record.exc_info or (
+            isinstance(extra_dict, dict) and not _BASE_KEYS.isdisjoint(extra_dict)
+        ):
+            return self._format_dict(record, extra_dict)
+
+        d, sep, kv = self._dumps, self._item_sep, self._kv_sep
+        out = (
+            f"{{{d('timestamp')}{kv}{d(self.formatTime(record))}{sep}"
+            f"{self._static_fields(record)}{d(record.getMessage())}"
+        )
+        if isinstance(extra_dict, dict) and extra_dict:
+            out += sep + d(extra_dict)[1:-1]
+        return out + "}"
+
+
+# -------- Handler assíncrono --------
+
+OVERFLOW_DROP: Final[str] = "drop"
+OVERFLOW_BLOCK: Final[str] = "block"
+
+_STOP: Final = object()  # sentinela para encerrar a thread escritora
+
+
+class QueuedStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler que não escreve no thread de quem loga.
+
+    `emit` só enfileira o record numa fila limitada; uma thread de fundo
+    formata e escreve em lote (um `write` + `flush` por lote). Com a fila
+    cheia, a política `overflow` decide:
+      - "drop": descarta e conta em `dropped` (reportado como `log.dropped`);
+      - "block": espera vaga (nunca perde log, mas pode segurar o chamador).
+    Lote que o stream não aceita também conta em `dropped` (e vai para o stderr).
+    `flush()` espera a fila esvaziar; `close()` drena e encerra a thread.
+    """
+
+    def __init__(
+        self,
+        stream: IO[str] | None = None,
+        *,
+        maxsize: int = 10000,
+        batch_size: int = 256,
+        overflow: str = OVERFLOW_DROP,
+    ):
+        super().__init__(stream)
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"invalid overflow policy: {overflow!r}")
+        self.overflow = overflow
+        self.batch_size = max(1, batch_size)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(1, maxsize))
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+        self._writer.start()
+
+    # --- lado produtor (event loop / threads de request) ---
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._closed:
+            return
+        if self.overflow == OVERFLOW_BLOCK:
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # contador aproximado é suficiente aqui
+
+    # --- lado consumidor (thread escritora) ---
+
+    def _drop_report(self) -> str | None:
+        dropped = self.dropped
+        if dropped == self._reported_dropped:
+            return None
+        delta = dropped - self._reported_dropped
+        self._reported_dropped = dropped
+        rec = logging.LogRecord("access", logging.WARNING, __file__, 0, "log.dropped", None, None)
+        rec.__extra__ = {"dropped": delta, "dropped_total": dropped}
+        return self.format(rec)
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            lines: list[str] = []
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                    continue
+                try:
+                    lines.append(self.format(item))
+                except Exception:
+                    self.handleError(item)
+            report = self._drop_report()
+            if report is not None:
+                lines.append(report)
+
+            if lines:
+                try:
+                    self.stream.write(self.terminator.join(lines) + self.terminator)
+                    self.stream.flush()
+                except Exception:
+                    # sem record específico: conta as linhas perdidas e reporta
+                    # sem derrubar a thread escritora
+                    self.dropped += len(lines)
+                    report_internal_error(
+                        "access-log-writer", f"falha ao escrever lote ({len(lines)} linhas)"
+                    )
+
+            for _ in batch:
+                q.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Espera a fila esvaziar (até `timeout`s) e faz flush do stream."""
+        deadline = time.monotonic() + timeout
+        while (
+            self._queue.unfinished_tasks and self._writer.is_alive() and time.monotonic() < deadline
+        ):
+            time.sleep(0.001)
+        super().flush()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            if self._writer.is_alive():
+                try:
+                    self._queue.put(_STOP, timeout=5.0)
+                except queue.Full:
+                    pass
+                self._writer.join(timeout=5.0)
+        super().close()
 
 
 # -------- Loggers --------
@@ -46,47 +264,148 @@ class JsonFormatter(logging.Formatter):
 
 def _install_access_logger(level: int = logging.INFO) -> logging.Logger:
     logger = logging.getLogger("access")
-    has_json = any(
-        isinstance(h, logging.StreamHandler)
-        and isinstance(getattr(h, "formatter", None), JsonFormatter)
-        for h in logger.handlers
-    )
-    if not has_json:
-        handler = logging.StreamHandler(stream=sys.stdout)
-        handler.setFormatter(JsonFormatter())
+    has_queued = any(isinstance(h, QueuedStreamHandler) for h in logger.handlers)
+    if not has_queued:
+        handler = QueuedStreamHandler(
+            stream=sys.stdout,
+            maxsize=settings.ACCESS_LOG_QUEUE_SIZE,
+            batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+            overflow=settings.ACCESS_LOG_OVERFLOW,
+        )
+        handler.setFormatter(JsonFormatter(encoder=settings.LOG_JSON_ENCODER))
         logger.addHandler(handler)
     logger.setLevel(level)
     logger.propagate = False
     return logger
 
 
+def flush_access_log(timeout: float = 5.0) -> None:
+    """Drena a fila do access log (usar no shutdown da app)."""
+    report_suppressed(logging.getLogger("access"), force=True)
+    for h in logging.getLogger("access").handlers:
+        if isinstance(h, QueuedStreamHandler):
+            h.flush(timeout=timeout)
+
+
 class ContextAdapter(logging.LoggerAdapter):
     """Permite passar extras por request (request_id, tenant_id, etc.)."""
 
     def process(self, msg: str, kwargs: MutableMapping[str, Any]):
         extra_obj = kwargs.pop("extra", None)
+        base = self.extra if isinstance(self.extra, Mapping) else {}
 
-        base: dict[str, Any]
-        if isinstance(self.extra, Mapping):
-            base = dict(self.extra)
-        else:
-            base = {}
-
-        extra_add: dict[str, Any]
-        if isinstance(extra_obj, Mapping):
-            extra_add = dict(extra_obj)
-        else:
-            extra_add = {}
-
-        merged = base.copy()
-        merged.update(extra_add)
+        # uma única cópia, e só quando há o que mesclar (o formatter só lê)
+        merged = {**base, **extra_obj} if isinstance(extra_obj, Mapping) and extra_obj else base
 
         kwargs["extra"] = {"__extra__": merged}
         return msg, kwargs
 
 
+_access_logger: logging.Logger | None = None
+
+
 def get_logger(name: str, base_extra: Mapping[str, Any] | None = None) -> logging.Logger:
-    logger = _install_access_logger() if name == "access" else logging.getLogger(name)
+    logger = access_logger() if name == "access" else logging.getLogger(name)
     # LoggerAdapter retorna LoggerAdapter; expor como Logger é suficiente para uso
     # e evita ruído no typing.
     return ContextAdapter(logger, dict(base_extra or {}))  # type: ignore[return-value]
+
+
+def access_logger() -> logging.Logger:
+    """Logger `access` já configurado (instalado uma vez por processo)."""
+    global _access_logger
+    if _access_logger is None:
+        _access_logger = _install_access_logger()
+    return _access_logger
+
+
+def log_fields(
+    logger: logging.Logger,
+    level: int,
+    msg: str,
+    fields: dict[str, Any],
+    exc_info: Any = None,
+) -> None:
+    """
+    Caminho rápido para logs estruturados: monta um único LogRecord com
+    `fields` como extras, sem LoggerAdapter, sem cópias de dict e sem o
+    `findCaller` (caminhada na stack) que `logger.info(...)` faz por padrão.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if exc_info is True:
+        exc_info = sys.exc_info()
+    record = logger.makeRecord(logger.name, level, "(unknown file)", 0, msg, (), exc_info)
+    record.__extra__ = fields
+    logger.handle(record)
+
+
+# -------- Throttle de erros repetidos --------
+
+
+class LogThrottle:
+    """
+    Suprime mensagens idênticas repetidas dentro de uma janela de `window_s`.
+
+    A primeira ocorrência de cada chave na janela passa; as seguintes são só
+    contadas. O total suprimido é reportado na próxima ocorrência que passar
+    (campo `suppressed`) ou por `expired()`, quando a janela fecha sem nova
+    ocorrência (vira uma linha `log.suppressed`).
+    """
+
+    def __init__(self, window_s: float = 10.0, max_keys: int = 1024):
+        self.window_s = window_s
+        self.max_keys = max_keys
+        # chave -> [início da janela, suprimidas na janela]
+        self._state: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def allow(self, key: str, now: float) -> tuple[bool, int]:
+        """Retorna (deve logar?, suprimidas na janela anterior)."""
+        with self._lock:
+            st = self._state.get(key)
+            if st is None or now - st[0] >= self.window_s:
+                suppressed = int(st[1]) if st else 0
+                if st is None and len(self._state) >= self.max_keys:
+                    self._state.pop(next(iter(self._state)))
+                self._state[key] = [now, 0]
+                return True, suppressed
+            st[1] += 1
+            return False, 0
+
+    def expired(self, now: float, *, force: bool = False) -> list[tuple[str, int]]:
+        """Remove janelas encerradas e retorna as que tiveram supressões."""
+        if not force and now < self._next_sweep:
+            return []
+        out: list[tuple[str, int]] = []
+        with self._lock:
+            self._next_sweep = now + self.window_s
+            for key, (started, suppressed) in list(self._state.items()):
+                if now - started >= self.window_s:
+                    del self._state[key]
+                    if suppressed:
+                        out.append((key, int(suppressed)))
+        return out
+
+
+_throttle = LogThrottle(window_s=settings.LOG_ERROR_THROTTLE_S)
+
+
+def report_suppressed(logger: logging.Logger, *, force: bool = False) -> None:
+    """Emite `log.suppressed` para as janelas encerradas (chamada barata e periódica)."""
+    now = float("inf") if force else time.monotonic()
+    for key, count in _throttle.expired(now, force=force):
+        log_fields(logger, logging.WARNING, "log.suppressed", {"key": key, "suppressed": count})
+
+
+def log_throttled(logger: logging.Logger, level: int, msg: str, fields: dict[str, Any]) -> None:
+    """Como `log_fields`, mas suprimindo repetições de `msg` dentro da janela."""
+    now = time.monotonic()
+    report_suppressed(logger)
+    allowed, suppressed = _throttle.allow(f"{logger.name}:{msg}", now)
+    if not allowed:
+        return
+    if suppressed:
+        fields["suppressed"] = suppressed
+    log_fields(logger, level, msg, fields)
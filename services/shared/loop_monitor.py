@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import Final
+
+from . import settings
+from .logging_utils import access_logger, log_fields
+from .metrics import LOOP_BLOCKED, LOOP_LAG
+
+# Frames mais internos reportados no `loop.blocked` (o resto é asyncio/uvicorn)
+_STACK_DEPTH: Final[int] = 25
+
+
+def _stack_of(thread_id: int) -> list[str]:
+    frame = sys._current_frames().get(thread_id)
+    out: list[str] = []
+    while frame is not None and len(out) < _STACK_DEPTH:
+        code = frame.f_code
+        out.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}:{frame.f_lineno}")
+        frame = frame.f_back
+    return out  # folha primeiro: quem está bloqueando aparece no topo
+
+
+class LoopLagMonitor:
+    """
+    Mede o atraso de agendamento do event loop: uma task dorme `interval_s`
+    e compara com o tempo real decorrido. Lag alto = algum callback síncrono
+    (psycopg, leitura de YAML, write em stdout...) segurou o loop.
+
+    - cada amostra vai para `event_loop_lag_seconds`; acima de `threshold_s`
+      também conta em `event_loop_blocked_total`;
+    - `healthy()` entra no /readiness (pior lag recente < `ready_max_s`);
+    - `debug=True` liga um watchdog (thread) que, com o loop parado além do
+      limite, captura a pilha da thread do loop e loga `loop.blocked`.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        *,
+        interval_s: float | None = None,
+        threshold_s: float | None = None,
+        ready_max_s: float | None = None,
+        debug: bool | None = None,
+        window: int = 10,
+    ):
+        self.service = service
+        self.interval_s = interval_s or settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        self.threshold_s = threshold_s or settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        self.ready_max_s = ready_max_s or settings.LOOP_LAG_READY_MS / 1000
+        self.debug = settings.LOOP_MONITOR_DEBUG if debug is None else debug
+        self.recent: deque[float] = deque(maxlen=window)
+        self.blocked_stacks: list[list[str]] = []  # últimas capturas (debug)
+        self._last_tick = time.monotonic()
+        self._task: asyncio.Task[None] | None = None
+        self._loop_thread = 0
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    # --- amostragem (no loop) ---
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            self._last_tick = time.monotonic()
+            self.observe(time.perf_counter() - t0 - self.interval_s)
+
+    def observe(self, lag_s: float) -> None:
+        lag_s = max(0.0, lag_s)
+        self.recent.append(lag_s)
+        LOOP_LAG.observe(lag_s, self.service)
+        if lag_s >= self.threshold_s:
+            LOOP_BLOCKED.inc(self.service)
+
+    def healthy(self) -> bool:
+        stalled = time.monotonic() - self._last_tick
+        worst = max(self.recent, default=0.0)
+        return max(worst, stalled - self.interval_s) < self.ready_max_s
+
+    # --- watchdog (thread, só em debug) ---
+
+    def _watch(self) -> None:
+        reported_tick = 0.0
+        poll = self.threshold_s / 2
+        while not self._stop.wait(poll):
+            tick = self._last_tick
+            stalled = time.monotonic() - tick - self.interval_s
+            if stalled < self.threshold_s or tick == reported_tick:
+                continue
+            reported_tick = tick  # uma captura por travamento
+            stack = _stack_of(self._loop_thread)
+            self.blocked_stacks = (self.blocked_stacks + [stack])[-10:]
+            log_fields(
+                access_logger(),
+                logging.WARNING,
+                "loop.blocked",
+                {"service": self.service, "blocked_ms": int(stalled * 1000), "stack": stack},
+            )
+
+    # --- ciclo de vida ---
+
+    def start(self) -> LoopLagMonitor:
+        """Chamar de dentro do loop (ex.: evento de startup)."""
+        if self._task is not None and not self._task.done():
+            return self
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.debug:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        return self
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from typing import Final
+
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from . import settings
+
+# Valor que substitui rótulos acima do orçamento de cardinalidade
+OTHER_LABEL: Final[str] = "__other__"
+
+CONTENT_TYPE: Final[str] = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets fixos de latência (segundos), no estilo do client oficial do Prometheus
+LATENCY_BUCKETS: Final[tuple[float, ...]] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Estágios do gateway: sub-milissegundo na maioria dos casos
+STAGE_BUCKETS: Final[tuple[float, ...]] = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.1,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    inner = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True))
+    return "{" + inner + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class LabelBudget:
+    """
+    Limita os valores distintos de um rótulo (ex.: `tenant`): os primeiros
+    `max_values` vistos ganham série própria; o resto cai em OTHER_LABEL.
+    Assim 10k tenants não viram 10k séries por métrica.
+    """
+
+    __slots__ = ("max_values", "_seen", "_lock")
+
+    def __init__(self, max_values: int):
+        self.max_values = max_values
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def admit(self, value: str) -> str:
+        if value in self._seen:
+            return value
+        with self._lock:
+            if value in self._seen:
+                return value
+            if len(self._seen) >= self.max_values:
+                return OTHER_LABEL
+            self._seen.add(value)
+            return value
+
+
+class _Metric(ABC):
+    kind: str = ""
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Sequence[str] = (),
+        *,
+        max_series: int | None = None,
+        budgets: dict[str, LabelBudget] | None = None,
+    ):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series or settings.METRICS_MAX_SERIES
+        # rótulo -> orçamento (posição no tuple de labels)
+        self._budgets = tuple((self.labelnames.index(n), b) for n, b in (budgets or {}).items())
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()  # criação de série nova
+        # atualização dos valores: há chamadas do event loop e de threads do
+        # threadpool (hash do cache, dedupe), e `+=` em lista não é atômico
+        self._update_lock = threading.Lock()
+
+    @abstractmethod
+    def _new_values(self) -> list[float]: ...
+
+    def _slot(self, labels: Sequence[str]) -> list[float]:
+        key = tuple(labels)
+        values = self._series.get(key)
+        if values is not None:
+            return values
+
+        if self._budgets:
+            mutable = list(key)
+            for idx, budget in self._budgets:
+                mutable[idx] = budget.admit(mutable[idx])
+            key = tuple(mutable)
+            values = self._series.get(key)
+            if values is not None:
+                return values
+
+        with self._lock:
+            values = self._series.get(key)
+            if values is None:
+                if len(self._series) >= self.max_series:
+                    # teto duro: tudo que passar daqui divide uma série só
+                    key = (OTHER_LABEL,) * len(self.labelnames)
+                    values = self._series.get(key)
+                if values is None:
+                    values = self._new_values()
+                    self._series[key] = values
+        return values
+
+    def series_count(self) -> int:
+        return len(self._series)
+
+    @abstractmethod
+    def collect(self) -> Iterable[str]: ...
+
+    def _snapshot(self) -> list[tuple[tuple[str, ...], list[float]]]:
+        with self._update_lock:
+            return [(key, list(values)) for key, values in list(self._series.items())]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+
+    kind = "counter"
+
+    def _new_values(self) -> list[float]:
+        return [0.0]
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        values = self._slot(labels)
+        with self._update_lock:
+            values[0] += amount
+
+    def value(self, *labels: str) -> float:
+        values = self._series.get(tuple(labels))
+        return values[0] if values else 0.0
+
+    def collect(self) -> Iterable[str]:
+        for key, values in self._snapshot():
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(values[0])}"
+
+
+class Histogram(_Metric):
+    """
+    Histograma de buckets fixos. Cada série guarda contagens NÃO cumulativas
+    por bucket (+Inf no fim), soma e total: `observe` é um bisect e dois
+    incrementos; a acumulação fica para a exposição.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        max_series: int | None = None,
+        budgets: dict[str, LabelBudget] | None = None,
+    ):
+        super().__init__(name, doc, labelnames, max_series=max_series, budgets=budgets)
+        self.buckets = tuple(sorted(buckets))
+        self._n = len(self.buckets)
+
+    def _new_values(self) -> list[float]:
+        # [bucket_0 .. bucket_n-1, +Inf, sum]
+        return [0.0] * (self._n + 2)
+
+    def observe(self, value: float, *labels: str) -> None:
+        values = self._slot(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._update_lock:
+            values[idx] += 1
+            values[-1] += value
+
+    def count(self, *labels: str) -> int:
+        values = self._series.get(tuple(labels))
+        return int(sum(values[:-1])) if values else 0
+
+    def collect(self) -> Iterable[str]:
+        names = self.labelnames + ("le",)
+        for key, values in self._snapshot():
+            acc = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), values[:-1], strict=True):
+                acc += n
+                labels = _fmt_labels(names, key + (_fmt_value(bound),))
+                yield f"{self.name}_bucket{labels} {_fmt_value(acc)}"
+            labels = _fmt_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_fmt_value(values[-1])}"
+            yield f"{self.name}_count{labels} {_fmt_value(acc)}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric already registered: {metric.name!r}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, doc: str, labelnames: Sequence[str] = (), **kw) -> Counter:
+        metric = Counter(name, doc, labelnames, **kw)
+        self.register(metric)
+        return metric
+
+    def histogram(self, name: str, doc: str, labelnames: Sequence[str] = (), **kw) -> Histogram:
+        metric = Histogram(name, doc, labelnames, **kw)
+        self.register(metric)
+        return metric
+
+    def render(self) -> str:
+        """Formato texto de exposição do Prometheus (0.0.4)."""
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.doc}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Zera todas as séries (uso em testes)."""
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+# Orçamento compartilhado do rótulo `tenant` entre as métricas HTTP
+TENANT_BUDGET = LabelBudget(settings.METRICS_MAX_TENANTS)
+_tenant = {"tenant": TENANT_BUDGET}
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total",
+    "Requests HTTP por status.",
+    ("service", "tenant", "route", "status"),
+    budgets=_tenant,
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Latência das requests HTTP (segundos).",
+    ("service", "tenant", "route"),
+    budgets=_tenant,
+)
+HTTP_RATE_LIMITED = REGISTRY.counter(
+    "http_rate_limited_total",
+    "Requests recusadas com 429 (rate limit ou fila de concorrência cheia).",
+    ("service", "tenant", "route"),
+    budgets=_tenant,
+)
+GATEWAY_STAGE_LATENCY = REGISTRY.histogram(
+    "gateway_stage_duration_seconds",
+    "Duração de cada estágio do gateway (e do app até o 1º byte), em segundos.",
+    ("service", "stage"),
+    buckets=STAGE_BUCKETS,
+)
+AUTH_FAILURES = REGISTRY.counter(
+    "auth_failures_total",
+    "Falhas de autenticação por x-api-key, por motivo.",
+    ("service", "reason"),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total",
+    "Consultas a caches internos, por resultado (hit|miss).",
+    ("service", "cache", "result"),
+)
+DEDUPE_BYTES = REGISTRY.counter(
+    "dedupe_bytes_total",
+    "Bytes consultados em stores por hash de conteúdo, por resultado (duplicate|unique).",
+    ("service", "store", "result"),
+)
+
+LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "Atraso de agendamento do event loop (segundos).",
+    ("service",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "event_loop_blocked_total",
+    "Amostras com o event loop bloqueado acima de LOOP_BLOCK_THRESHOLD_MS.",
+    ("service",),
+)
+
+
+def record_cache(service: str, cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(service, cache, "hit" if hit else "miss")
+
+
+def metrics_response() -> Response:
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def metrics_endpoint() -> Response:
+    return metrics_response()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+from fastapi import Request
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.shared import settings
+from services.shared.config_schema import TenantLimits
+
+DEFAULT_TENANT_MAX_BYTES = TenantLimits().max_request_bytes
+
+
+class BodyTooLarge(HTTPException):
+    """
+    Levantada pelo `receive` vigiado quando o corpo passa do limite. É uma
+    HTTPException do Starlette: o FastAPI a repassa ao ler o body e o handler
+    de exceções responde 413 sem o corpo ter sido acumulado.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"request body exceeds {limit} bytes")
+        self.limit = limit
+
+
+def request_body_limit(request: Request) -> int:
+    """`limits.max_request_bytes` do tenant; sem tenant, MAX_REQUEST_BYTES (global)."""
+    tenant = getattr(request.state, "tenant", None)
+    if tenant is None:
+        return settings.MAX_REQUEST_BYTES
+    tenant_config = getattr(request.state, "tenant_config", None) or getattr(tenant, "config", None)
+    limits = tenant_config.get("limits") if isinstance(tenant_config, Mapping) else None
+    if not isinstance(limits, Mapping):
+        return DEFAULT_TENANT_MAX_BYTES
+    return int(limits.get("max_request_bytes", DEFAULT_TENANT_MAX_BYTES))
+
+
+def too_large(limit: int) -> Response:
+    return JSONResponse({"detail": f"request body exceeds {limit} bytes"}, status_code=413)
+
+
+def check_content_length(request: Request, limit: int) -> Response | None:
+    """413 imediato pelo `Content-Length` declarado (antes de ler qualquer byte)."""
+    declared = request.headers.get("content-length")
+    if declared is None:
+        return None  # chunked: só a contagem no `receive` pega
+    try:
+        size = int(declared)
+    except ValueError:
+        return JSONResponse({"detail": "invalid Content-Length"}, status_code=400)
+    return too_large(limit) if size > limit else None
+
+
+def limit_receive(receive: Receive, limit: int) -> Receive:
+    """
+    Envolve `receive` contando os bytes que chegam; passou de `limit` ->
+    BodyTooLarge no chunk que estourou (vale também para Content-Length
+    mentiroso e para corpos chunked).
+    """
+    received = 0
+
+    async def guarded() -> Message:
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise BodyTooLarge(limit)
+        return message
+
+    return guarded
+
+
+class BodySizeLimitMiddleware:
+    """
+    Versão standalone do estágio `body_limit` do gateway: precisa rodar depois
+    de quem resolve o tenant (senão vale o limite global).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        limit = request_body_limit(request)
+        error = check_content_length(request, limit)
+        if error is not None:
+            await error(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limit_receive(receive, limit), send_wrapper)
+        except BodyTooLarge as ex:
+            if started:
+                raise
+            await too_large(ex.limit)(scope, receive, send)
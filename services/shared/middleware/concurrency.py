@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Mapping
+from typing import Any
+
+from fastapi import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from services.shared.middleware_utils import route_class_of
+
+# Defaults aplicados quando o tenant não define a seção `concurrency`
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_MAX_WAIT_MS = 2000
+
+
+class _TenantGate:
+    """
+    Semáforo FIFO por tenant com fila limitada.
+
+    - `in_flight`: requests em execução agora.
+    - `waiters`: futures de quem aguarda uma vaga (ordem de chegada).
+    Ao liberar uma vaga com gente na fila, a vaga é repassada diretamente
+    ao primeiro da fila (não há "furo" de fila por quem chega depois).
+    """
+
+    __slots__ = ("in_flight", "waiters")
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future[None]] = deque()
+
+    def try_acquire(self, limit: int) -> bool:
+        if self.in_flight < limit and not self.waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self, limit: int, max_queue: int, max_wait: float) -> str:
+        """
+        Retorna "ok" (vaga obtida), "queue_full" (fila cheia) ou "timeout".
+        """
+        if self.try_acquire(limit):
+            return "ok"
+        if len(self.waiters) >= max_queue:
+            return "queue_full"
+
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=max_wait)
+            return "ok"
+        except TimeoutError:
+            # A vaga pode ter sido repassada no mesmo tick do timeout.
+            if fut.done() and not fut.cancelled():
+                return "ok"
+            return "timeout"
+        except asyncio.CancelledError:
+            # Cliente desconectou enquanto aguardava: devolve a vaga se já a recebeu.
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if not fut.done():
+                fut.cancel()
+            try:
+                self.waiters.remove(fut)
+            except ValueError:
+                pass
+
+    def release(self) -> None:
+        while self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)  # repassa a vaga (in_flight não muda)
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+
+
+# tenant_id -> gate (memória local, por processo)
+_GATES: dict[str, _TenantGate] = {}
+
+
+def _limits_for(request: Request) -> tuple[int, int, float]:
+    """
+    Retorna (max_in_flight, max_queue, max_wait_s) para o tenant atual.
+    Lê a seção `concurrency` do config (ao lado de `rate_limit`).
+    """
+    tenant = getattr(request.state, "tenant", None)
+    tenant_config: Any = getattr(request.state, "tenant_config", None) or getattr(
+        tenant, "config", None
+    )
+    cfg = tenant_config.get("concurrency", {}) if isinstance(tenant_config, Mapping) else {}
+    cfg = cfg or {}
+
+    max_in_flight = max(1, int(cfg.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT)))
+    max_queue = max(0, int(cfg.get("max_queue", DEFAULT_MAX_QUEUE)))
+    max_wait_ms = max(0, int(cfg.get("max_wait_ms", DEFAULT_MAX_WAIT_MS)))
+    return max_in_flight, max_queue, max_wait_ms / 1000.0
+
+
+async def acquire_concurrency_slot(request: Request) -> tuple[Response | None, _TenantGate | None]:
+    """
+    Aguarda uma vaga para o tenant atual.
+
+    Retorna (erro, gate): `erro` é a resposta 429/503 quando não houve vaga;
+    `gate` é onde a vaga deve ser devolvida (`gate.release()`) ao fim da
+    resposta. Fora de /v1/* ou sem tenant, retorna (None, None).
+    """
+    tenant = getattr(request.state, "tenant", None)
+
+    if not tenant or not route_class_of(request).is_v1:
+        return None, None
+
+    tenant_id = str(getattr(tenant, "id", "unknown"))
+    limit, max_queue, max_wait = _limits_for(request)
+
+    gate = _GATES.get(tenant_id)
+    if gate is None:
+        gate = _GATES[tenant_id] = _TenantGate()
+
+    outcome = await gate.acquire(limit, max_queue, max_wait)
+    if outcome == "queue_full":
+        error = JSONResponse(
+            {"detail": "Too Many Concurrent Requests", "tenant": tenant_id},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+        return error, None
+    if outcome == "timeout":
+        error = JSONResponse(
+            {"detail": "Tenant concurrency queue timeout", "tenant": tenant_id},
+            status_code=503,
+            headers={"Retry-After": "1"},
+        )
+        return error, None
+    return None, gate
+
+
+class ConcurrencyLimitMiddlewarePerTenant:
+    """
+    Limita requests simultâneas por tenant (in-flight) em rotas /v1/*.
+
+    Acima do limite, a request aguarda numa fila FIFO limitada por até
+    `max_wait_ms`. Fila cheia -> 429; espera expirada -> 503.
+    Assim um tenant com payloads pesados não ocupa todos os workers.
+    A vaga só é devolvida depois que o corpo da resposta foi todo enviado.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        error, gate = await acquire_concurrency_slot(Request(scope, receive))
+        if error is not None:
+            await error(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if gate is not None:
+                gate.release()
@@ -1,54 +1,72 @@
+from collections.abc import Mapping
+
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from services.shared.middleware_utils import route_class_of, send_with_headers
+
+
+def check_cors(request: Request) -> tuple[Response | None, dict[str, str]]:
+    """
+    Aplica a política de CORS do tenant em /v1/*.
+
+    Retorna (resposta, headers): `resposta` encerra a request (403, 400 ou o
+    204 do preflight); `headers` devem ser acrescentados à resposta normal.
+    """
+    # 1) Fora de /v1 -> não aplica CORS por tenant
+    if not route_class_of(request).is_v1:
+        return None, {}
+
+    # 2) Se não há tenant (rota aberta / erro a montante) -> não bloqueia aqui
+    tenant = getattr(request.state, "tenant", None)
+    if tenant is None:
+        return None, {}
+
+    # 3) Lê allowed_origins do config do tenant (preferindo tenant_config se existir)
+    tenant_config = getattr(request.state, "tenant_config", None) or getattr(tenant, "config", None)
+    if not isinstance(tenant_config, Mapping):
+        return JSONResponse({"detail": "Tenant config não disponível"}, status_code=400), {}
+
+    allowed_origins = tenant_config.get("cors", {}).get("origins", []) or []
+    origin = request.headers.get("origin")
 
+    # 4) Bloqueia origin inválida apenas em /v1 (com tenant presente)
+    if origin and origin not in allowed_origins:
+        return JSONResponse({"detail": "CORS origin não permitida"}, status_code=403), {}
 
-class CORSMiddlewarePerTenant(BaseHTTPMiddleware):
+    # 5) Preflight
+    if request.method == "OPTIONS" and origin in allowed_origins:
+        acrh = request.headers.get("access-control-request-headers") or "*"
+
+        assert origin is not None
+        headers: dict[str, str] = {
+            "Access-Control-Allow-Origin": origin or "*",
+            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+            "Access-Control-Allow-Headers": acrh,
+        }
+        return Response(status_code=204, headers=headers), {}
+
+    # 6) Resposta normal
+    if origin and origin in allowed_origins:
+        return None, {"Access-Control-Allow-Origin": origin, "Vary": "Origin"}
+    return None, {}
+
+
+class CORSMiddlewarePerTenant:
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-
-        # 1) Fora de /v1 -> não aplica CORS por tenant
-        if not path.startswith("/v1/"):
-            return await call_next(request)
-
-        # 2) Se não há tenant (rota aberta / erro a montante) -> não bloqueia aqui
-        tenant = getattr(request.state, "tenant", None)
-        if tenant is None:
-            return await call_next(request)
-
-        # 3) Lê allowed_origins do config do tenant (preferindo tenant_config se existir)
-        tenant_config = getattr(request.state, "tenant_config", None) or getattr(
-            tenant, "config", None
-        )
-        if not isinstance(tenant_config, dict):
-            return JSONResponse({"detail": "Tenant config não disponível"}, status_code=400)
-
-        allowed_origins = tenant_config.get("cors", {}).get("origins", []) or []
-        origin = request.headers.get("origin")
-
-        # 4) Bloqueia origin inválida apenas em /v1 (com tenant presente)
-        if origin and origin not in allowed_origins:
-            return JSONResponse({"detail": "CORS origin não permitida"}, status_code=403)
-
-        # 5) Preflight
-        if request.method == "OPTIONS" and origin in allowed_origins:
-            acrh = request.headers.get("access-control-request-headers") or "*"
-
-            assert origin is not None
-            headers: dict[str, str] = {
-                "Access-Control-Allow-Origin": origin or "*",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": acrh,
-            }
-            return Response(status_code=204, headers=headers)
-
-        # 6) Resposta normal
-        response: Response = await call_next(request)
-        if origin and origin in allowed_origins:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Vary"] = "Origin"
-        return response
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        error, headers = check_cors(Request(scope, receive))
+        if error is not None:
+            await error(scope, receive, send)
+            return
+
+        if headers:
+            send = send_with_headers(send, headers)
+        await self.app(scope, receive, send)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Final
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.shared import settings
+
+IDEMPOTENCY_KEY_HEADER: Final[str] = "idempotency-key"
+REPLAYED_HEADER: Final[str] = "Idempotent-Replayed"
+MAX_KEY_LENGTH: Final[int] = 255
+
+
+@dataclass
+class _Entry:
+    path: str
+    body_digest: bytes = b""  # preenchido ao fim da execução (o corpo passa em streaming)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    status: int = 0
+    headers: list[tuple[bytes, bytes]] = field(default_factory=list)
+    body: bytes = b""
+    expires_at: float = 0.0  # 0 = em andamento
+    size: int = 0  # bytes contados no orçamento do store (só respostas guardadas)
+
+
+class IdempotencyStore:
+    """
+    Respostas por (tenant, Idempotency-Key), em memória do processo. Entrada
+    em andamento tem `done` ainda não setado: duplicatas esperam nela. Expira
+    em `ttl_s`. Dois tetos, despejando as menos usadas (LRU): `max_entries`
+    chaves e `max_bytes` somando as respostas guardadas (corpo + headers);
+    resposta maior que o orçamento inteiro não é guardada.
+    """
+
+    def __init__(self, ttl_s: float, max_entries: int, max_bytes: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple[str, str]) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None or not entry.expires_at:
+            return entry
+        if entry.expires_at <= time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def begin(self, key: tuple[str, str], path: str) -> _Entry:
+        while len(self._entries) >= self.max_entries:
+            self._discard(next(iter(self._entries)))
+        entry = self._entries[key] = _Entry(path)
+        return entry
+
+    def finish(self, key: tuple[str, str], entry: _Entry, keep: bool) -> None:
+        if self._entries.get(key) is entry:  # pode ter sido despejada durante a execução
+            size = len(entry.body) + sum(len(k) + len(v) for k, v in entry.headers)
+            if keep and size <= self.max_bytes:
+                self._entries.move_to_end(key)  # a própria entrada nunca é despejada
+                while self.bytes + size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                entry.size = size
+                self.bytes += size
+                entry.expires_at = time.monotonic() + self.ttl_s
+            else:
+                self._discard(key)
+        entry.done.set()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def _discard(self, key: tuple[str, str]) -> None:
+        self.bytes -= self._entries.pop(key).size
+
+
+STORE = IdempotencyStore(
+    settings.IDEMPOTENCY_TTL_S, settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_MAX_BYTES
+)
+
+
+def _error(status: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status)
+
+
+class IdempotencyMiddleware:
+    """
+    `Idempotency-Key` nos POSTs de `paths`. A primeira request com a chave
+    executa; a resposta (status < 500) fica guardada por IDEMPOTENCY_TTL_S,
+    no escopo do tenant. Duplicatas concorrentes esperam a execução em
+    andamento (até IDEMPOTENCY_WAIT_S; depois, 409); as seguintes recebem a
+    resposta guardada com `Idempotent-Replayed: true`, sem chegar ao handler.
+
+    Fica dentro do gateway (lê `state.tenant`); request sem tenant passa
+    direto, sem guardar (não há escopo seguro para a chave). O corpo não é
+    bufferizado: o hash é calculado conforme o app o consome (uploads em
+    streaming continuam com memória limitada), e uma execução que não leu o
+    corpo inteiro não é guardada. A mesma chave com outro path ou outro corpo
+    é erro do cliente (422). Erro 5xx/exceção não é guardado: o retry executa
+    de novo.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str], store: IdempotencyStore | None = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        raw_key = next(
+            (v for k, v in scope["headers"] if k == IDEMPOTENCY_KEY_HEADER.encode()), None
+        )
+        tenant = getattr((scope.get("state") or {}).get("tenant"), "id", None)
+        if raw_key is None or tenant is None:
+            await self.app(scope, receive, send)
+            return
+
+        idem_key = raw_key.decode("latin-1").strip()
+        if not idem_key or len(idem_key) > MAX_KEY_LENGTH:
+            await _error(400, f"Idempotency-Key must have 1-{MAX_KEY_LENGTH} chars")(
+                scope, receive, send
+            )
+            return
+
+        store = self.store if self.store is not None else STORE
+        key = (str(tenant), idem_key)
+
+        while True:
+            entry = store.get(key)
+            if entry is None:
+                break
+            if not entry.done.is_set():
+                try:
+                    await asyncio.wait_for(entry.done.wait(), settings.IDEMPOTENCY_WAIT_S)
+                except TimeoutError:
+                    await _error(409, "A request with this Idempotency-Key is in progress")(
+                        scope, receive, send
+                    )
+                    return
+                continue  # sem resposta guardada (5xx) -> tenta assumir a execução
+            # o corpo só é lido (em streaming, sem acumular) para comparar
+            digest = await _body_digest(receive)
+            if entry.path != scope["path"] or entry.body_digest != digest:
+                await _error(422, "Idempotency-Key reused with a different request")(
+                    scope, receive, send
+                )
+                return
+            await _replay(entry, send)
+            return
+
+        entry = store.begin(key, scope["path"])
+        keep = False
+        try:
+            keep = await self._execute(scope, receive, send, entry)
+        finally:
+            store.finish(key, entry, keep)
+
+    async def _execute(self, scope: Scope, receive: Receive, send: Send, entry: _Entry) -> bool:
+        sha = hashlib.sha256()
+        complete = False
+
+        async def hashing_receive() -> Message:
+            nonlocal complete
+            message = await receive()
+            if message["type"] == "http.request":
+                sha.update(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            return message
+
+        chunks: list[bytes] = []
+        size = 0
+        keep = True
+
+        async def capture(message: Message) -> None:
+            nonlocal size, keep
+            if message["type"] == "http.response.start":
+                entry.status = message["status"]
+                entry.headers = list(message.get("headers", []))
+                keep = entry.status < 500
+            elif message["type"] == "http.response.body" and keep:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    keep = False
+                    chunks.clear()
+                else:
+                    chunks.append(chunk)
+            await send(message)
+
+        await self.app(scope, hashing_receive, capture)
+        # sem o corpo inteiro não há como comparar a próxima duplicata
+        if keep and complete and entry.status:
+            entry.body_digest = sha.digest()
+            entry.body = b"".join(chunks)
+            return True
+        return False
+
+
+async def _body_digest(receive: Receive) -> bytes:
+    sha = hashlib.sha256()
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        sha.update(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return sha.digest()
+
+
+async def _replay(entry: _Entry, send: Send) -> None:
+    headers = [*entry.headers, (REPLAYED_HEADER.lower().encode(), b"true")]
+    await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+    await send({"type": "http.response.body", "body": entry.body, "more_body": False})
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import time
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.shared.metrics import (
+    AUTH_FAILURES,
+    GATEWAY_STAGE_LATENCY,
+    HTTP_LATENCY,
+    HTTP_RATE_LIMITED,
+    HTTP_REQUESTS,
+)
+from services.shared.route_matcher import route_template
+
+# Rótulo `tenant` de requests sem tenant resolvido (rotas públicas, 401/403)
+NO_TENANT = "none"
+
+
+class MetricsMiddleware:
+    """
+    Alimenta as métricas HTTP (`services.shared.metrics`) por request:
+    total por status, histograma de latência, 429s, falhas de auth e a
+    duração de cada estágio do gateway (`request.state.timings`).
+
+    Rótulos: service, tenant (com orçamento de cardinalidade) e o template da
+    rota (não o path cru), lidos do `request.state` depois que o gateway rodou.
+    """
+
+    def __init__(self, app: ASGIApp, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500  # exceção sem resposta conta como 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._record(scope, status, time.perf_counter() - start)
+
+    def _record(self, scope: Scope, status: int, duration_s: float) -> None:
+        state = scope.get("state") or {}
+        tenant = getattr(state.get("tenant"), "id", None) or NO_TENANT
+        route = route_template(Request(scope))
+
+        HTTP_REQUESTS.inc(self.service, tenant, route, str(status))
+        HTTP_LATENCY.observe(duration_s, self.service, tenant, route)
+        if status == 429:
+            HTTP_RATE_LIMITED.inc(self.service, tenant, route)
+        reason = state.get("auth_failure")
+        if reason:
+            AUTH_FAILURES.inc(self.service, str(reason))
+        for stage, ns in (state.get("timings") or {}).items():
+            GATEWAY_STAGE_LATENCY.observe(ns / 1e9, self.service, stage)
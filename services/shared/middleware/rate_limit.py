@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import time
+from collections.abc import Mapping
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
-from starlette.types import ASGIApp
+from fastapi import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from services.shared.middleware_utils import route_class_of
+from services.shared.route_matcher import compile_templates, route_template
 
 # Token bucket simples por chave (memória local)
 # key -> (tokens, last_ts, capacity, refill_per_sec)
@@ -16,70 +19,100 @@ def _now() -> float:
     return time.monotonic()
 
 
-def _rule_for(request: Request) -> tuple[int, int]:
+def _rule_for(request: Request, route: str | None = None) -> tuple[int, int, str]:
     """
-    Retorna (rpm, burst) a aplicar para o tenant/rota atual.
-    Fallback para default.rpm e default.burst (burst opcional).
+    Retorna (rpm, burst, route_key) a aplicar para o tenant/rota atual
+    (ou para `route`, quando informado). Fallback para default.rpm e
+    default.burst (burst opcional).
+
+    As chaves de `routes` no config podem ser templates (`/v1/items/{item_id}`);
+    `route_key` é o template que casou (ou o da rota da app), nunca o path cru.
     """
     tenant = getattr(request.state, "tenant", None)
-    tenant_config = getattr(tenant, "config", {}) if tenant else {}
+    tenant_config = getattr(request.state, "tenant_config", None) or getattr(tenant, "config", None)
+    if not isinstance(tenant_config, Mapping):
+        tenant_config = {}
 
     cfg = tenant_config.get("rate_limit", {}) or {}
     dflt = cfg.get("default", {}) or {}
     routes = cfg.get("routes", {}) or {}
 
-    path = request.url.path
-    route_cfg = routes.get(path, {}) or {}
+    route_key = route or route_template(request)
+    route_cfg = routes.get(route_key)
+    if route_cfg is None and routes:
+        cfg_key = compile_templates(tuple(routes)).match(route or request.url.path)
+        if cfg_key is not None:
+            route_key = cfg_key
+            route_cfg = routes[cfg_key]
+    route_cfg = route_cfg or {}
 
     rpm = int(route_cfg.get("rpm", dflt.get("rpm", 60)))
     burst = int(route_cfg.get("burst", dflt.get("burst", rpm)))  # burst default = rpm
 
     rpm = max(1, rpm)
     burst = max(1, burst)
-    return rpm, burst
+    return rpm, burst, route_key
 
 
-class RateLimitMiddlewarePerTenant(BaseHTTPMiddleware):
+def check_rate_limit(
+    request: Request, units: float = 1.0, route: str | None = None
+) -> Response | None:
     """
-    Rate limit por tenant + rota usando token bucket em memória.
-    Chave: f"{tenant_id}:{path}". Retorna 429 ao exceder.
+    Consome `units` tokens do bucket do tenant/rota (ou do bucket de `route`,
+    para cobrar itens de um lote na rota unitária). Retorna a resposta 429
+    quando não há tokens, ou None para seguir (inclusive fora de /v1/* ou sem
+    tenant). Um lote maior que a capacidade do bucket nunca passa.
     """
+    tenant = getattr(request.state, "tenant", None)
 
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
+    # Só aplicamos rate limit em rotas versionadas (/v1/*) e com tenant resolvido
+    if not tenant or not route_class_of(request).is_v1:
+        return None
+
+    tenant_id = getattr(tenant, "id", "unknown")
 
-    async def dispatch(self, request: Request, call_next):
-        tenant = getattr(request.state, "tenant", None)
+    rpm, burst, route_key = _rule_for(request, route)
+    refill_per_sec = rpm / 60.0
+    capacity = float(max(burst, rpm))
 
-        # Só aplicamos rate limit em rotas versionadas (/v1/*) e com tenant resolvido
-        if not tenant or not request.url.path.startswith("/v1/"):
-            return await call_next(request)
+    key = f"{tenant_id}:{route_key}"
+    now = _now()
 
-        tenant_id = getattr(tenant, "id", "unknown")
-        path = request.url.path
+    tokens, last_ts, cap, rps = _BUCKETS.get(key, (capacity, now, capacity, refill_per_sec))
 
-        rpm, burst = _rule_for(request)
-        refill_per_sec = rpm / 60.0
-        capacity = float(max(burst, rpm))
+    # Refill
+    elapsed = max(0.0, now - last_ts)
+    tokens = min(capacity, tokens + elapsed * refill_per_sec)
 
-        key = f"{tenant_id}:{path}"
-        now = _now()
+    if tokens < units:
+        return JSONResponse(
+            {"detail": "Too Many Requests", "tenant": str(tenant_id)},
+            status_code=429,
+        )
 
-        tokens, last_ts, cap, rps = _BUCKETS.get(key, (capacity, now, capacity, refill_per_sec))
+    # Consome os tokens e persiste
+    tokens -= units
+    _BUCKETS[key] = (tokens, now, capacity, refill_per_sec)
+    return None
 
-        # Refill
-        elapsed = max(0.0, now - last_ts)
-        tokens = min(capacity, tokens + elapsed * refill_per_sec)
 
-        if tokens < 1.0:
-            return JSONResponse(
-                {"detail": "Too Many Requests", "tenant": str(tenant_id)},
-                status_code=429,
-            )
+class RateLimitMiddlewarePerTenant:
+    """
+    Rate limit por tenant + rota usando token bucket em memória.
+    Chave: f"{tenant_id}:{route_template}". Retorna 429 ao exceder.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        # Consome 1 token e persiste
-        tokens -= 1.0
-        _BUCKETS[key] = (tokens, now, capacity, refill_per_sec)
+        error = check_rate_limit(Request(scope, receive))
+        if error is not None:
+            await error(scope, receive, send)
+            return
 
-        response: Response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
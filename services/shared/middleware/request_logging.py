@@ -1,51 +1,133 @@
 from __future__ import annotations
 
+import logging
+import random
 import time
+from collections.abc import Mapping
 from typing import Any
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from services.shared.logging_utils import get_logger
+from services.shared import settings
+from services.shared.logging_utils import access_logger, log_fields, report_suppressed
+from services.shared.route_matcher import compile_templates, route_template
+from services.shared.server_timing import timings_ms
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    # docstring igual...
+def _header(scope: Scope, name: bytes) -> str | None:
+    for k, v in scope.get("headers") or ():
+        if k == name:
+            return str(v.decode("latin-1"))
+    return None
+
+
+def _sampling_for(scope: Scope) -> tuple[float, int]:
+    """
+    Retorna (sample_rate, slow_ms) para o tenant/rota da request.
+
+    Config do tenant (seção `logging`), com fallback para os defaults globais:
+        logging:
+          sample_rate: 0.2
+          slow_ms: 500
+          routes:
+            "/v1/ping": {sample_rate: 0.01}
+    As chaves de `routes` aceitam templates, como no rate limit.
+    """
+    rate = settings.ACCESS_LOG_SAMPLE_RATE
+    slow_ms = settings.ACCESS_LOG_SLOW_MS
+
+    tenant_config = (scope.get("state") or {}).get("tenant_config")
+    if not isinstance(tenant_config, Mapping):
+        return rate, slow_ms
+    cfg = tenant_config.get("logging") or {}
+    if not cfg:
+        return rate, slow_ms
+
+    rate = float(cfg.get("sample_rate", rate))
+    slow_ms = int(cfg.get("slow_ms", slow_ms))
+
+    routes = cfg.get("routes") or {}
+    if routes:
+        request = Request(scope)
+        route_cfg = routes.get(route_template(request))
+        if route_cfg is None:
+            key = compile_templates(tuple(routes)).match(scope["path"])
+            route_cfg = routes[key] if key is not None else None
+        if route_cfg:
+            rate = float(route_cfg.get("sample_rate", rate))
+            slow_ms = int(route_cfg.get("slow_ms", slow_ms))
+    return rate, slow_ms
+
+
+class RequestLoggingMiddleware:
+    """
+    Loga `request.end` (ou `request.error` com stacktrace) por request, em JSON.
+    O contexto é montado ao final, quando as camadas internas já preencheram
+    `request.state` (request_id, tenant).
+
+    Hot path: logger reutilizado e um único dict de campos por request, lido
+    direto do scope (sem Request/URL) e entregue ao `log_fields`.
+
+    Amostragem: erros (status >= 400) e requests acima de `slow_ms` sempre são
+    logados; sucessos são amostrados por tenant/rota (`sample_rate`, registrado
+    na linha quando < 1 para permitir reponderar as contagens).
+    """
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.base_logger = get_logger("access")
-
-    def _context(self, request: Request) -> dict[str, Any]:
-        rid = getattr(request.state, "request_id", None) or request.headers.get("x-request-id")
-        tenant = getattr(getattr(request.state, "tenant", None), "id", None)
-        return {
-            "request_id": rid,
-            "tenant_id": tenant,
-            "path": request.url.path,
-            "method": request.method,
+        self.app = app
+        self.base_logger = access_logger()
+
+    def _fields(self, scope: Scope, status: int, duration_ms: int) -> dict[str, Any]:
+        state = scope.get("state") or {}
+        tenant = state.get("tenant")
+        fields = {
+            "request_id": state.get("request_id") or _header(scope, b"x-request-id"),
+            "tenant_id": getattr(tenant, "id", None),
+            "path": scope["path"],
+            "method": scope["method"],
+            "status": status,
+            "duration_ms": duration_ms,
         }
+        timings = state.get("timings")
+        if timings:  # estágios do gateway (os mesmos do Server-Timing)
+            fields["stages_ms"] = timings_ms(timings)
+        return fields
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
         start = time.perf_counter()
-        ctx = self._context(request)
-        # opcional: log de início
-        # get_logger("access", ctx).debug("request.start")
+        status = 500  # se nenhuma resposta for enviada, tratamos como erro
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
         try:
-            response: Response = await call_next(request)
-            status = response.status_code
+            await self.app(scope, receive, send_wrapper)
         except Exception:
             duration_ms = int((time.perf_counter() - start) * 1000)
-            get_logger("access", {**ctx, "status": 500, "duration_ms": duration_ms}).exception(
-                "request.error"
-            )
+            fields = self._fields(scope, 500, duration_ms)
+            log_fields(self.base_logger, logging.ERROR, "request.error", fields, exc_info=True)
             raise
         else:
             duration_ms = int((time.perf_counter() - start) * 1000)
-            get_logger("access", {**ctx, "status": status, "duration_ms": duration_ms}).info(
-                "request.end"
-            )
-            return response
+            sample_rate = 1.0
+            if status < 400:
+                rate, slow_ms = _sampling_for(scope)
+                if duration_ms < slow_ms and rate < 1.0:
+                    if rate <= 0.0 or random.random() >= rate:
+                        return  # sucesso rápido fora da amostra
+                    sample_rate = rate
+            fields = self._fields(scope, status, duration_ms)
+            if sample_rate < 1.0:
+                fields["sample_rate"] = sample_rate
+            log_fields(self.base_logger, logging.INFO, "request.end", fields)
+        finally:
+            # janelas de throttle encerradas viram `log.suppressed` (checagem barata)
+            report_suppressed(self.base_logger)
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import logging
 import uuid
+from collections.abc import Mapping
 from typing import Final
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from . import tenant_repo
 from .config_loader import load_config
-from .logging_utils import get_logger
+from .logging_utils import access_logger, get_logger, log_throttled
+from .route_classifier import RouteClass, RouteClassifier
 from .tenant_context import TenantInfo, set_current_tenant
 
 REQUEST_ID_HEADER: Final[str] = "X-Request-Id"
@@ -25,6 +29,9 @@ def _looks_like_uuid(value: str) -> bool:
 
 
 def _ensure_request_id(request: Request) -> str:
+    req_id = getattr(request.state, "request_id", None)
+    if req_id:
+        return str(req_id)
     req_id = request.headers.get(REQUEST_ID_HEADER)
     if not req_id or not _looks_like_uuid(req_id):
         req_id = str(uuid.uuid4())
@@ -64,92 +71,201 @@ def _to_tenant_info(tenant_obj: object) -> TenantInfo:
     )
 
 
-def _attach_headers(
-    response: Response, *, request_id: str, tenant_id: str | None = None
-) -> Response:
-    response.headers[REQUEST_ID_HEADER] = request_id
+def send_with_headers(send: Send, headers: Mapping[str, str]) -> Send:
+    """
+    Envolve `send` para acrescentar `headers` no `http.response.start`.
+    Equivale a mexer em `response.headers`, sem precisar materializar a Response.
+    """
+
+    async def wrapped(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            out = MutableHeaders(scope=message)
+            for k, v in headers.items():
+                out[k] = v
+        await send(message)
+
+    return wrapped
+
+
+def _id_headers(request_id: str, tenant_id: str | None = None) -> dict[str, str]:
+    headers = {REQUEST_ID_HEADER: request_id}
     if tenant_id:
-        response.headers[TENANT_ID_HEADER] = tenant_id
-    return response
+        headers[TENANT_ID_HEADER] = tenant_id
+    return headers
 
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        req_id = _ensure_request_id(request)
-        response: Response = await call_next(request)
-        return _attach_headers(response, request_id=req_id)
+class RequestIdMiddleware:
+    """Garante `X-Request-Id` (UUID) em `request.state` e na resposta."""
 
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-class TenantMiddleware(BaseHTTPMiddleware):
-    SAFE_PATHS = {"/", "/openapi.json", "/readiness", "/health", "/healthz"}
-    SAFE_PREFIXES = ("/docs", "/redoc", "/static")
-    OPEN_V1: set[str] = set()  # se quiser rotas /v1/* sem x-api-key, adicione aqui
-    _log = get_logger("access")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
-        req_id = _ensure_request_id(request)
-        path = request.url.path
-
-        def respond(status: int, payload: dict) -> Response:
-            resp = JSONResponse(payload, status_code=status)
-            return _attach_headers(resp, request_id=req_id)
-
-        # Bypasses (docs, health, OPTIONS, etc.)
-        if (
-            request.method == "OPTIONS"
-            or path in self.SAFE_PATHS
-            or any(path.startswith(p) for p in self.SAFE_PREFIXES)
-        ):
-            resp = await call_next(request)
-            return _attach_headers(resp, request_id=req_id)
-
-        # Só exigimos x-api-key em /v1/* (a menos que a rota esteja liberada em OPEN_V1)
-        if not path.startswith("/v1/") or path in self.OPEN_V1:
-            resp = await call_next(request)
-            return _attach_headers(resp, request_id=req_id)
-
-        api_key = request.headers.get("x-api-key")
-        if not api_key:
-            return respond(401, {"detail": "x-api-key is required"})
-
-        # Resolve tenant (compat com testes: prioriza find_tenant_by_api_key se existir)
-        resolver = getattr(
-            tenant_repo,
-            "find_tenant_by_api_key",
-            tenant_repo.resolve_tenant_by_api_key,
+        req_id = _ensure_request_id(Request(scope))
+        await self.app(scope, receive, send_with_headers(send, _id_headers(req_id)))
+
+
+# Rotas que dispensam x-api-key (docs, health, etc.)
+SAFE_PATHS: set[str] = {"/", "/openapi.json", "/readiness", "/health", "/healthz", "/metrics"}
+SAFE_PREFIXES: tuple[str, ...] = ("/docs", "/redoc", "/static")
+OPEN_V1: set[str] = set()  # se quiser rotas /v1/* sem x-api-key, adicione aqui
+
+# Dentre as rotas seguras, quais são documentação (tag "docs" em vez de "public")
+DOCS_PATHS: frozenset[str] = frozenset({"/openapi.json"})
+DOCS_PREFIXES: frozenset[str] = frozenset({"/docs", "/redoc"})
+
+_log = get_logger("access")
+_default_classifier: RouteClassifier | None = None
+
+
+def build_route_classifier() -> RouteClassifier:
+    """Monta o classificador a partir de SAFE_PATHS/SAFE_PREFIXES/OPEN_V1 atuais."""
+    return RouteClassifier(
+        public_paths=SAFE_PATHS - DOCS_PATHS,
+        public_prefixes=[p for p in SAFE_PREFIXES if p not in DOCS_PREFIXES],
+        docs_paths=SAFE_PATHS & DOCS_PATHS,
+        docs_prefixes=[p for p in SAFE_PREFIXES if p in DOCS_PREFIXES],
+        open_v1=OPEN_V1,
+    )
+
+
+def classify_request(request: Request, classifier: RouteClassifier) -> RouteClass:
+    """Classifica a request e grava a tag em `request.state.route_class` (no scope)."""
+    tag = classifier.classify(request.scope["path"])
+    request.state.route_class = tag
+    return tag
+
+
+def route_class_of(request: Request) -> RouteClass:
+    """
+    Tag calculada na entrada da pilha (gateway/TenantMiddleware). Middlewares
+    usados isoladamente (sem essas camadas) caem no classificador padrão.
+    """
+    tag = getattr(request.state, "route_class", None)
+    if tag is not None:
+        return RouteClass(tag)
+
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = build_route_classifier()
+    return classify_request(request, _default_classifier)
+
+
+def _reject(status: int, payload: dict) -> Response:
+    return JSONResponse(payload, status_code=status)
+
+
+def requires_tenant(request: Request) -> bool:
+    """Só exigimos x-api-key em /v1/* (fora os bypasses, OPTIONS e as rotas em OPEN_V1)."""
+    if request.method == "OPTIONS":
+        return False
+    return route_class_of(request) is RouteClass.V1_PROTECTED
+
+
+def authenticate_tenant(request: Request) -> Response | None:
+    """
+    Resolve o tenant pelo x-api-key e grava em `request.state.tenant`.
+    Retorna a resposta de erro (401/403/503) ou None em caso de sucesso; na
+    falha, o motivo fica em `request.state.auth_failure` (para as métricas).
+    """
+    api_key = request.headers.get("x-api-key")
+    if not api_key:
+        request.state.auth_failure = "missing_key"
+        return _reject(401, {"detail": "x-api-key is required"})
+
+    # Resolve tenant (compat com testes: prioriza find_tenant_by_api_key se existir)
+    resolver = getattr(
+        tenant_repo,
+        "find_tenant_by_api_key",
+        tenant_repo.resolve_tenant_by_api_key,
+    )
+    try:
+        tenant_row = resolver(api_key)
+    except tenant_repo.TenantRepoUnavailable:
+        request.state.auth_failure = "repo_unavailable"
+        log_throttled(
+            access_logger(),
+            logging.ERROR,
+            "tenant.repo_unavailable",
+            {"path": request.scope["path"]},
         )
-        try:
-            tenant_row = resolver(api_key)
-        except tenant_repo.TenantRepoUnavailable:
-            self._log.error("tenant.repo_unavailable", extra={"path": str(request.url.path)})
-            return respond(503, {"detail": "Tenant repository unavailable"})
+        return _reject(503, {"detail": "Tenant repository unavailable"})
+
+    if tenant_row is None:
+        request.state.auth_failure = "invalid_key"
+        return _reject(403, {"detail": "Invalid API key"})
 
-        if tenant_row is None:
-            return respond(403, {"detail": "Invalid API key"})
+    request.state.tenant = _to_tenant_info(tenant_row)
+    return None
 
-        tenant_info = _to_tenant_info(tenant_row)
 
-        # Carrega config do tenant (yaml). Se não existir, tenta provisionar via DB -> disco.
+def load_tenant_config(request: Request) -> Response | None:
+    """
+    Carrega o config do tenant (yaml) em `request.state.tenant_config`.
+    Se não existir, tenta provisionar via DB -> disco; falhando, 503.
+    """
+    tenant_info: TenantInfo = request.state.tenant
+    try:
+        config = load_config(tenant_info.id)
+    except FileNotFoundError:
         try:
+            from .config_provisioner import sync_from_db
+
+            sync_from_db(overwrite=False)
             config = load_config(tenant_info.id)
-        except FileNotFoundError:
-            try:
-                from .config_provisioner import sync_from_db
-
-                sync_from_db(overwrite=False)
-                config = load_config(tenant_info.id)
-            except Exception:
-                self._log.error("tenant.config_unavailable", extra={"path": str(request.url.path)})
-                return respond(503, {"detail": "Tenant config not available"})
-
-        # injeta no request e no contexto
-        request.state.tenant = tenant_info
-        request.state.tenant_config = config
-        set_current_tenant(tenant_info)
+        except Exception:
+            log_throttled(
+                access_logger(),
+                logging.ERROR,
+                "tenant.config_unavailable",
+                {"path": request.scope["path"]},
+            )
+            return _reject(503, {"detail": "Tenant config not available"})
+
+    request.state.tenant_config = config
+    return None
+
+
+class TenantMiddleware:
+    SAFE_PATHS = SAFE_PATHS
+    SAFE_PREFIXES = SAFE_PREFIXES
+    OPEN_V1 = OPEN_V1
+    _log = _log
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._classifier = build_route_classifier()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        req_id = _ensure_request_id(request)
+        classify_request(request, self._classifier)
 
+        if not requires_tenant(request):
+            await self.app(scope, receive, send_with_headers(send, _id_headers(req_id)))
+            return
+
+        error = authenticate_tenant(request) or load_tenant_config(request)
+        if error is not None:
+            await error(scope, receive, send_with_headers(send, _id_headers(req_id)))
+            return
+
+        # injeta no contexto (request.state já preenchido acima)
+        tenant_info: TenantInfo = request.state.tenant
+        set_current_tenant(tenant_info)
         try:
-            response: Response = await call_next(request)
+            await self.app(
+                scope,
+                receive,
+                send_with_headers(send, _id_headers(req_id, tenant_info.id)),
+            )
         finally:
             set_current_tenant(None)
-
-        return _attach_headers(response, request_id=req_id, tenant_id=tenant_info.id)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Annotated, Final
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from . import settings
+from .admin_guard import ensure_admin_enabled
+
+PROFILE_FEATURE: Final[str] = "profile"  # feature do X-Debug-Token
+PROFILE_SUMMARY_HEADER: Final[str] = "X-Profile-Summary"
+
+Stack = tuple[str, ...]
+
+
+def _frame_label(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_qualname}"
+
+
+def _walk(frame: FrameType | None) -> Stack:
+    labels: list[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()  # raiz -> folha
+    return tuple(labels)
+
+
+class StackSampler:
+    """
+    Profiler por amostragem: uma thread daemon lê `sys._current_frames()` a
+    cada `interval_s` e conta as pilhas vistas. Não instrumenta chamadas
+    (ao contrário do cProfile), então o custo é fixo por amostra e roda no
+    worker em produção.
+
+    A atribuição é por janela de tempo: com requests concorrentes, as pilhas
+    de todas as threads do processo entram na contagem.
+    """
+
+    def __init__(self, interval_s: float | None = None):
+        self.interval_s = interval_s or settings.PROFILER_INTERVAL_MS / 1000
+        self.stacks: Counter[Stack] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _take(self) -> None:
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                self.stacks[_walk(frame)] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self._take()
+
+    def start(self) -> StackSampler:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter[Stack]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+
+def sample(seconds: float, interval_s: float | None = None) -> Counter[Stack]:
+    """Amostra o processo por `seconds` (bloqueante: chamar fora do event loop)."""
+    sampler = StackSampler(interval_s).start()
+    time.sleep(seconds)
+    return sampler.stop()
+
+
+def collapse(stacks: Counter[Stack]) -> str:
+    """Formato "collapsed" (uma linha `raiz;...;folha N`), entrada do flamegraph.pl/speedscope."""
+    return "".join(f"{';'.join(stack)} {n}\n" for stack, n in stacks.most_common())
+
+
+def summarize(stacks: Counter[Stack], samples: int, top: int = 5, of: int | None = None) -> str:
+    """
+    Resumo curto (cabe num header): funções-folha mais vistas. Com `of`, o
+    total de amostras da janela (`samples=<atribuídas>/<total>`).
+    """
+    leaves: Counter[str] = Counter()
+    for stack, n in stacks.items():
+        if stack:
+            leaves[stack[-1]] += n
+    head = f"samples={samples}" if of is None else f"samples={samples}/{of}"
+    return ", ".join([head] + [f"{fn}={n}" for fn, n in leaves.most_common(top)])
+
+
+class TaskSampler(StackSampler):
+    """
+    Amostra só a thread do event loop, e só quando a task corrente do loop é
+    `task`: as pilhas de outras requests (outras tasks ou threads) ficam de
+    fora. `samples` conta as amostras atribuídas; `ticks`, todas da janela.
+    """
+
+    def __init__(self, task: asyncio.Task, interval_s: float | None = None):
+        super().__init__(interval_s)
+        self.ticks = 0
+        self._task = task
+        self._loop = task.get_loop()
+        self._loop_thread = threading.get_ident()  # criado de dentro do loop
+
+    def _take(self) -> None:
+        self.ticks += 1
+        if asyncio.current_task(self._loop) is not self._task:
+            return
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is not None:
+            self.stacks[_walk(frame)] += 1
+            self.samples += 1
+
+
+class RequestProfile:
+    """
+    Profiling opt-in de uma request (X-Debug-Token com a feature "profile").
+    Só conta o tempo em que a task da request roda no event loop; o trabalho
+    que ela manda para threadpool/process pool não aparece (o header mostra
+    `samples=<da request>/<da janela>`).
+    """
+
+    __slots__ = ("_sampler", "summary")
+
+    def __init__(self) -> None:
+        task = asyncio.current_task()
+        assert task is not None, "RequestProfile precisa rodar dentro de uma task"
+        self._sampler = TaskSampler(task)
+        self._sampler.start()
+        self.summary = ""
+
+    def finish(self) -> str:
+        if not self.summary:
+            stacks = self._sampler.stop()
+            self.summary = summarize(stacks, self._sampler.samples, of=self._sampler.ticks)
+        return self.summary
+
+
+# --- endpoint admin -----------------------------------------------------------
+
+profiler_router = APIRouter(tags=["admin"])
+_busy = threading.Lock()  # um profiling de processo por vez
+
+
+@profiler_router.get(
+    "/admin/profile",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(ensure_admin_enabled)],
+)
+async def profile_process(
+    seconds: Annotated[float, Query(gt=0)] = 5.0,
+    interval_ms: Annotated[float, Query(gt=0)] | None = None,
+) -> PlainTextResponse:
+    """
+    Amostra as pilhas do worker por `seconds` e devolve o formato collapsed.
+    O event loop segue atendendo (a espera roda numa thread) e aparece no perfil.
+    """
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail="seconds above PROFILER_MAX_SECONDS")
+    if not _busy.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="profiler already running")
+    try:
+        interval_s = interval_ms / 1000 if interval_ms else None
+        stacks = await asyncio.to_thread(sample, seconds, interval_s)
+    finally:
+        _busy.release()
+    return PlainTextResponse(collapse(stacks))
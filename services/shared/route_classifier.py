@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from enum import StrEnum
+
+
+class RouteClass(StrEnum):
+    PUBLIC = "public"  # health, raiz, estáticos, rotas fora de /v1
+    DOCS = "docs"  # swagger/redoc/openapi
+    V1_PROTECTED = "v1-protected"  # /v1/* que exige x-api-key
+    V1_OPEN = "v1-open"  # /v1/* liberada sem x-api-key (OPEN_V1)
+
+    @property
+    def is_v1(self) -> bool:
+        return self in (RouteClass.V1_PROTECTED, RouteClass.V1_OPEN)
+
+
+class RouteClassifier:
+    """
+    Classifica o path da request uma única vez, a partir de tabelas montadas no
+    startup (no lugar de `in SAFE_PATHS` + `any(startswith(...))` em cada camada):
+
+      1) paths exatos -> dict (O(1));
+      2) prefixos de bypass agrupados por tamanho -> `path[:n] in tabela[n]`;
+      3) prefixo versionado (`/v1/`).
+
+    A precedência reproduz a ordem antiga do TenantMiddleware: bypass antes de /v1.
+    """
+
+    __slots__ = ("_exact", "_prefix_tables", "_v1_prefix")
+
+    def __init__(
+        self,
+        *,
+        public_paths: Iterable[str] = (),
+        public_prefixes: Iterable[str] = (),
+        docs_paths: Iterable[str] = (),
+        docs_prefixes: Iterable[str] = (),
+        open_v1: Iterable[str] = (),
+        v1_prefix: str = "/v1/",
+    ):
+        exact: dict[str, RouteClass] = {}
+        for p in open_v1:
+            if p.startswith(v1_prefix):
+                exact[p] = RouteClass.V1_OPEN
+        for p in public_paths:
+            exact[p] = RouteClass.PUBLIC
+        for p in docs_paths:
+            exact[p] = RouteClass.DOCS
+
+        by_len: dict[int, dict[str, RouteClass]] = {}
+        for prefixes, tag in (
+            (public_prefixes, RouteClass.PUBLIC),
+            (docs_prefixes, RouteClass.DOCS),
+        ):
+            for prefix in prefixes:
+                by_len.setdefault(len(prefix), {})[prefix] = tag
+
+        self._exact = exact
+        self._prefix_tables = tuple(sorted(by_len.items()))
+        self._v1_prefix = v1_prefix
+
+    def classify(self, path: str) -> RouteClass:
+        hit = self._exact.get(path)
+        if hit is not None:
+            return hit
+        for size, table in self._prefix_tables:
+            hit = table.get(path[:size])
+            if hit is not None:
+                return hit
+        if path.startswith(self._v1_prefix):
+            return RouteClass.V1_PROTECTED
+        return RouteClass.PUBLIC
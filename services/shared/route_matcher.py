@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import re
+import weakref
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Any, Final
+
+from starlette.requests import Request
+from starlette.routing import Mount, compile_path
+
+# Chave usada quando o path não casa com nenhuma rota conhecida (404s).
+# Evita que paths aleatórios criem uma entrada nova por request.
+UNMATCHED_ROUTE: Final[str] = "<unmatched>"
+
+
+class RouteMatcher:
+    """
+    Casa paths concretos (`/v1/items/42`) com templates (`/v1/items/{item_id}`).
+
+    Compilado uma vez: templates sem parâmetros vão para um dict (O(1));
+    os dinâmicos viram regex (via `starlette.routing.compile_path`, que entende
+    conversores como `{id:int}` e `{rest:path}`) testadas em ordem.
+    """
+
+    __slots__ = ("_static", "_dynamic")
+
+    def __init__(self, templates: Iterable[str]):
+        self._static: dict[str, str] = {}
+        self._dynamic: list[tuple[re.Pattern[str], str]] = []
+        for tmpl in templates:
+            if "{" not in tmpl:
+                self._static.setdefault(tmpl, tmpl)
+                continue
+            regex, _fmt, _convertors = compile_path(tmpl)
+            self._dynamic.append((regex, tmpl))
+
+    def match(self, path: str) -> str | None:
+        hit = self._static.get(path)
+        if hit is not None:
+            return hit
+        for regex, tmpl in self._dynamic:
+            if regex.match(path):
+                return tmpl
+        return None
+
+
+@lru_cache(maxsize=512)
+def compile_templates(templates: tuple[str, ...]) -> RouteMatcher:
+    """Matcher cacheado por conjunto de templates (ex.: chaves de `rate_limit.routes`)."""
+    return RouteMatcher(templates)
+
+
+def _collect_templates(routes: Iterable[Any], prefix: str = "") -> list[str]:
+    out: list[str] = []
+    for route in routes:
+        if isinstance(route, Mount):
+            if route.routes:
+                out.extend(_collect_templates(route.routes, prefix + route.path))
+            else:  # app montado sem rotas próprias (ex.: StaticFiles)
+                out.append(prefix + route.path + "/{path:path}")
+            continue
+        included = getattr(route, "original_router", None)
+        if included is not None:  # FastAPI recente: include_router guarda o router
+            ctx = getattr(route, "include_context", None)
+            sub_prefix = prefix + (getattr(ctx, "prefix", "") or "")
+            out.extend(_collect_templates(included.routes, sub_prefix))
+            continue
+        path = getattr(route, "path", None)
+        if isinstance(path, str):
+            out.append(prefix + path)
+    return out
+
+
+# app -> (nº de rotas quando compilado, matcher)
+_APP_MATCHERS: weakref.WeakKeyDictionary[Any, tuple[int, RouteMatcher]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _matcher_for_app(app: Any) -> RouteMatcher | None:
+    routes = getattr(app, "routes", None)
+    if routes is None:
+        return None
+    cached = _APP_MATCHERS.get(app)
+    if cached is not None and cached[0] == len(routes):
+        return cached[1]
+    matcher = RouteMatcher(_collect_templates(routes))
+    _APP_MATCHERS[app] = (len(routes), matcher)
+    return matcher
+
+
+def route_template(request: Request) -> str:
+    """
+    Template da rota que vai atender a request (resolvido uma vez e guardado em
+    `request.state.route_template`). Sem rotas conhecidas, cai no path cru.
+    """
+    cached = getattr(request.state, "route_template", None)
+    if cached is not None:
+        return str(cached)
+
+    matcher = _matcher_for_app(request.scope.get("app"))
+    if matcher is None:
+        template = request.url.path
+    else:
+        template = matcher.match(request.url.path) or UNMATCHED_ROUTE
+
+    request.state.route_template = template
+    return template
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Final
+
+from fastapi import Request
+
+from .admin_guard import DEBUG_TOKEN_HEADER, debug_features
+
+SERVER_TIMING_HEADER: Final[str] = "Server-Timing"
+TIMING_FEATURE: Final[str] = "timing"  # feature do X-Debug-Token
+
+# Duração (ns) do app/handler até o início da resposta, ao lado dos estágios
+APP_STAGE: Final[str] = "app"
+
+
+def server_timing_enabled(request: Request) -> bool:
+    """
+    `Server-Timing` sai na resposta se o tenant habilitou
+    (`diagnostics.server_timing`) ou se a request traz um X-Debug-Token
+    assinado com a feature "timing" (vale também para rotas públicas).
+    """
+    tenant_config = getattr(request.state, "tenant_config", None)
+    if isinstance(tenant_config, Mapping):
+        diag = tenant_config.get("diagnostics") or {}
+        if diag.get("server_timing"):
+            return True
+    token = request.headers.get(DEBUG_TOKEN_HEADER)
+    return TIMING_FEATURE in debug_features(token)
+
+
+def format_server_timing(timings: Mapping[str, int]) -> str:
+    """{"auth": 1_250_000} -> "auth;dur=1.250" (ms, como pede a spec)."""
+    return ", ".join(f"{name};dur={ns / 1_000_000:.3f}" for name, ns in timings.items())
+
+
+def timings_ms(timings: Mapping[str, int]) -> dict[str, float]:
+    """Durações em ms (3 casas) para o access log."""
+    return {name: round(ns / 1_000_000, 3) for name, ns in timings.items()}
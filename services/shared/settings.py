@@ -13,3 +13,75 @@ TEXT_PORT = int(os.getenv("TEXT_PORT", "8081"))
 VISION_PORT = int(os.getenv("VISION_PORT", "8083"))
 RELOAD = _env_bool("RELOAD", True)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+# Access log assíncrono (fila limitada + thread escritora)
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+ACCESS_LOG_BATCH_SIZE = int(os.getenv("ACCESS_LOG_BATCH_SIZE", "256"))
+ACCESS_LOG_OVERFLOW = os.getenv("ACCESS_LOG_OVERFLOW", "drop").strip().lower()  # drop | block
+LOG_JSON_ENCODER = os.getenv("LOG_JSON_ENCODER", "auto").strip().lower()  # auto | json | orjson
+
+# Amostragem do access log (sucessos); erros e requests lentas sempre são logados
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = int(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+# Janela (s) para suprimir mensagens de erro idênticas repetidas
+LOG_ERROR_THROTTLE_S = float(os.getenv("LOG_ERROR_THROTTLE_S", "10"))
+
+# Métricas (/metrics): teto de tenants distintos como rótulo e de séries por métrica
+METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", "200"))
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "5000"))
+
+# Profiler por amostragem (/admin/profile e X-Debug-Token com "profile")
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+# Tracing: exportador (none | file | otlp) e fração de requests amostradas
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").strip().lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+# Monitor de lag do event loop (métrica + readiness; debug captura a pilha do bloqueio)
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+LOOP_LAG_READY_MS = float(os.getenv("LOOP_LAG_READY_MS", "1000"))
+LOOP_MONITOR_DEBUG = _env_bool("LOOP_MONITOR_DEBUG", False)
+
+# Text API: process pool de análise (0 = nº de CPUs) e a partir de quantos
+# caracteres um lote / um documento único é distribuído entre os workers
+# (documento: só sem teto de tokens ou com `max_input_tokens` à altura do texto)
+TEXT_POOL_WORKERS = int(os.getenv("TEXT_POOL_WORKERS", "0"))
+TEXT_BATCH_PARALLEL_MIN_CHARS = int(os.getenv("TEXT_BATCH_PARALLEL_MIN_CHARS", "200000"))
+TEXT_PARALLEL_MIN_CHARS = int(os.getenv("TEXT_PARALLEL_MIN_CHARS", "2000000"))
+
+# Vision API: process pool do lote (0 = nº de CPUs) e a partir de quantos bytes
+# de base64 o lote é distribuído entre os workers
+VISION_POOL_WORKERS = int(os.getenv("VISION_POOL_WORKERS", "0"))
+VISION_BATCH_PARALLEL_MIN_BYTES = int(
+    os.getenv("VISION_BATCH_PARALLEL_MIN_BYTES", str(4 * 1024 * 1024))
+)
+
+# Vision API: dedupe por SHA-256 da imagem (resultados por processo). Entradas
+# em memória (0 desliga); com VISION_DEDUPE_DISK_DIR, as que saem da memória
+# vão para um arquivo mapeado (mmap) de até VISION_DEDUPE_DISK_MAX_BYTES
+VISION_DEDUPE_MAX_ENTRIES = int(os.getenv("VISION_DEDUPE_MAX_ENTRIES", "10000"))
+VISION_DEDUPE_DISK_DIR = os.getenv("VISION_DEDUPE_DISK_DIR", "")
+VISION_DEDUPE_DISK_MAX_BYTES = int(os.getenv("VISION_DEDUPE_DISK_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Text API: cache de resultados por processo (0 desliga) e cota default por
+# tenant (`limits.result_cache_bytes` no config do tenant sobrescreve)
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+TEXT_CACHE_TENANT_MAX_BYTES = int(os.getenv("TEXT_CACHE_TENANT_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Idempotency-Key nos POSTs de análise: validade da resposta guardada, teto de
+# chaves e de bytes guardados por processo, maior resposta guardada (acima
+# disso só executa) e quanto uma duplicata espera a execução em andamento
+# antes do 409
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(64 * 1024 * 1024)))
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+IDEMPOTENCY_WAIT_S = float(os.getenv("IDEMPOTENCY_WAIT_S", "30"))
+
+# Teto do corpo da request em rotas sem tenant (as do tenant usam
+# `limits.max_request_bytes`); estourou -> 413 antes de bufferizar
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(10 * 1024 * 1024)))
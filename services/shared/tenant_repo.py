@@ -3,6 +3,8 @@ from __future__ import annotations
 import os
 from typing import Any, TypedDict, cast
 
+from .tracing import db_span
+
 # Tenta usar Postgres se houver driver/DSN; caso contrário, cai no fallback.
 try:
     import psycopg  # usado mais abaixo
@@ -112,7 +114,7 @@ def _resolve_via_db(api_key: str) -> TenantRow | None:
 
     try:
         with psycopg.connect(dsn) as conn:
-            with conn.cursor() as cur:
+            with conn.cursor() as cur, db_span("SELECT", "tenants_api_keys"):
                 cur.execute(
                     """
                     SELECT tenant_id, name
@@ -188,7 +190,7 @@ def list_all_tenants() -> list[TenantBasicRow]:
         raise RuntimeError("DATABASE_URL não configurado para list_all_tenants()")
 
     with psycopg.connect(dsn) as conn:
-        with conn.cursor() as cur:
+        with conn.cursor() as cur, db_span("SELECT", "tenants_api_keys"):
             cur.execute(
                 """
                 SELECT tenant_id, MIN(name) AS name
@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Final, Protocol
+
+from . import settings
+from .logging_utils import report_internal_error
+
+TRACEPARENT_HEADER: Final[str] = "traceparent"
+
+# Teto de spans por trace: loops com query por item não estouram memória/exportação
+MAX_SPANS_PER_TRACE: Final[int] = 256
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: str | None = None
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+
+    def as_dict(self, service: str) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": service,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """
+    Spans de uma request. `sampled` é decidido na cabeça do trace: herdado do
+    `traceparent` de entrada ou, sem ele, assim que o tenant é conhecido
+    (`decide`). Depois de um "não", novos spans viram no-op.
+    """
+
+    __slots__ = ("trace_id", "parent_id", "service", "sampled", "spans", "root")
+
+    def __init__(self, service: str, trace_id: str, parent_id: str | None, sampled: bool | None):
+        self.service = service
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.spans: list[Span] = []
+        self.root: Span | None = None
+
+    def decide(self, sample_rate: float) -> bool:
+        if self.sampled is None:
+            self.sampled = sample_rate >= 1.0 or random.random() < sample_rate
+        return self.sampled
+
+    def traceparent(self) -> str:
+        span_id = self.root.span_id if self.root else "0" * 16
+        return f"00-{self.trace_id}-{span_id}-{'01' if self.sampled else '00'}"
+
+
+# trace + span ativo (pai dos próximos spans); propaga para threads via contextvars
+_current: ContextVar[tuple[Trace, Span] | None] = ContextVar("trace_span", default=None)
+
+
+class _SpanScope:
+    __slots__ = ("_trace", "_span", "_token")
+
+    def __init__(self, trace: Trace, parent: Span | None, name: str, attributes: dict):
+        self._trace = trace
+        self._span = Span(
+            trace.trace_id, parent.span_id if parent else trace.parent_id, name, attributes
+        )
+
+    def __enter__(self) -> Span:
+        self._token = _current.set((self._trace, self._span))
+        return self._span
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        _current.reset(self._token)
+        span = self._span
+        span.end()
+        if exc_type is not None:
+            span.error = exc_type.__name__
+        trace = self._trace
+        if trace.sampled is not False and len(trace.spans) < MAX_SPANS_PER_TRACE:
+            trace.spans.append(span)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+
+_NOOP: Final[_NoopScope] = _NoopScope()
+
+
+def span(name: str, attributes: dict[str, Any] | None = None) -> _SpanScope | _NoopScope:
+    """
+    `with span("db.query", {...}):` — filho do span ativo. Fora de um trace
+    amostrado (ou com tracing desligado) é um no-op de custo ~ um ContextVar.get.
+    """
+    active = _current.get()
+    if active is None:
+        return _NOOP
+    trace, parent = active
+    if trace.sampled is False:
+        return _NOOP
+    return _SpanScope(trace, parent, name, attributes or {})
+
+
+def db_span(operation: str, table: str) -> _SpanScope | _NoopScope:
+    """Span de uma query (sem parâmetros: podem conter segredos, ex.: api keys)."""
+    return span(f"db.{operation.lower()}", {"db.operation": operation, "db.table": table})
+
+
+def _parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    # "00-<trace_id:32hex>-<parent_id:16hex>-<flags:2hex>"
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+@contextmanager
+def traced_request(
+    service: str, traceparent: str | None, attributes: dict[str, Any]
+) -> Iterator[Trace | None]:
+    """
+    Abre o trace e o span raiz de uma request; ao sair, exporta se amostrado.
+    Com o exportador desligado (TRACE_EXPORTER=none) não aloca nada.
+    """
+    exporter = get_exporter()
+    if exporter is None:
+        yield None
+        return
+
+    parent = _parse_traceparent(traceparent)
+    if parent is None:
+        trace = Trace(service, os.urandom(16).hex(), None, None)
+    else:
+        trace = Trace(service, parent[0], parent[1], parent[2])
+
+    scope = _SpanScope(trace, None, "http.request", attributes)
+    trace.root = scope._span
+    try:
+        with scope:
+            yield trace
+    finally:
+        if trace.sampled is None:
+            trace.decide(settings.TRACE_SAMPLE_RATE)
+        if trace.sampled and trace.spans:
+            exporter.submit(trace)
+
+
+def tenant_sample_rate(tenant_config: Mapping[str, Any] | None) -> float:
+    """`tracing.sample_rate` do tenant, com fallback para TRACE_SAMPLE_RATE."""
+    rate = settings.TRACE_SAMPLE_RATE
+    if isinstance(tenant_config, Mapping):
+        cfg = tenant_config.get("tracing") or {}
+        if cfg.get("sample_rate") is not None:
+            rate = float(cfg["sample_rate"])
+    return rate
+
+
+# -------- Exportação --------
+
+
+class SpanSink(Protocol):
+    def write(self, traces: list[Trace]) -> None: ...
+
+
+class FileSpanSink:
+    """Um span por linha (JSON), em append."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, traces: list[Trace]) -> None:
+        lines = [
+            json.dumps(s.as_dict(t.service), ensure_ascii=False) for t in traces for s in t.spans
+        ]
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+
+
+def _otlp_attrs(attrs: Mapping[str, Any]) -> list[dict[str, Any]]:
+    out = []
+    for k, v in attrs.items():
+        if isinstance(v, bool):
+            value: dict[str, Any] = {"boolValue": v}
+        elif isinstance(v, int):
+            value = {"intValue": str(v)}
+        elif isinstance(v, float):
+            value = {"doubleValue": v}
+        else:
+            value = {"stringValue": str(v)}
+        out.append({"key": k, "value": value})
+    return out
+
+
+class OtlpHttpSink:
+    """POST em `<endpoint>/v1/traces` com OTLP/JSON (collector OpenTelemetry)."""
+
+    def __init__(self, endpoint: str, timeout_s: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout_s = timeout_s
+
+    @staticmethod
+    def encode(traces: list[Trace]) -> dict[str, Any]:
+        by_service: dict[str, list[dict[str, Any]]] = {}
+        for trace in traces:
+            spans = by_service.setdefault(trace.service, [])
+            for s in trace.spans:
+                spans.append(
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent_id or "",
+                        "name": s.name,
+                        "kind": 2 if s is trace.root else 1,  # SERVER | INTERNAL
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": _otlp_attrs(s.attributes),
+                        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                    }
+                )
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attrs({"service.name": service})},
+                    "scopeSpans": [{"scope": {"name": "services.shared.tracing"}, "spans": spans}],
+                }
+                for service, spans in by_service.items()
+            ]
+        }
+
+    def write(self, traces: list[Trace]) -> None:
+        body = json.dumps(self.encode(traces)).encode("utf-8")
+        req = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout_s):
+            pass
+
+
+_STOP = object()
+
+
+class BatchSpanExporter:
+    """
+    Exportação fora do caminho da request: `submit` só enfileira (fila
+    limitada; cheia -> descarta e conta em `dropped`). Uma thread junta até
+    `batch_size` traces ou espera `interval_s` e entrega o lote ao sink; lote
+    que o sink recusa também entra em `dropped` (e vai para o stderr).
+    """
+
+    def __init__(
+        self,
+        sink: SpanSink,
+        *,
+        maxsize: int = 2048,
+        batch_size: int = 128,
+        interval_s: float = 1.0,
+    ):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.interval_s = interval_s
+        self.dropped = 0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max(1, maxsize))
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            try:
+                first = q.get(timeout=self.interval_s)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            traces = [t for t in batch if t is not _STOP]
+            if traces:
+                try:
+                    self.sink.write(traces)
+                except Exception:
+                    self.dropped += len(traces)
+                    report_internal_error(
+                        "trace-exporter", f"falha ao exportar lote ({len(traces)} traces)"
+                    )
+            for _ in batch:
+                q.task_done()
+            if len(traces) != len(batch):
+                return
+
+    def flush(self, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while (
+            self._queue.unfinished_tasks and self._thread.is_alive() and time.monotonic() < deadline
+        ):
+            time.sleep(0.001)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=5.0)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=5.0)
+
+
+_exporter: BatchSpanExporter | None = None
+_configured = False
+
+
+def configure(exporter: BatchSpanExporter | None) -> None:
+    """Troca o exportador global (None desliga o tracing). Usado no startup/testes."""
+    global _exporter, _configured
+    if _exporter is not None and _exporter is not exporter:
+        _exporter.close()
+    _exporter = exporter
+    _configured = True
+
+
+def _exporter_from_settings() -> BatchSpanExporter | None:
+    kind = settings.TRACE_EXPORTER
+    sink: SpanSink
+    if kind == "file":
+        sink = FileSpanSink(settings.TRACE_FILE)
+    elif kind == "otlp":
+        sink = OtlpHttpSink(settings.TRACE_OTLP_ENDPOINT)
+    elif kind == "none":
+        return None
+    else:
+        raise ValueError(f"unknown TRACE_EXPORTER: {kind!r}")
+    return BatchSpanExporter(sink)
+
+
+def get_exporter() -> BatchSpanExporter | None:
+    global _exporter, _configured
+    if not _configured:
+        _exporter = _exporter_from_settings()
+        _configured = True
+    return _exporter
+
+
+def flush_traces() -> None:
+    """Drena a fila de exportação (shutdown)."""
+    if _exporter is not None:
+        _exporter.flush()
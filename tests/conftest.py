@@ -0,0 +1,74 @@
+import httpx
+import pytest
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.types import ASGIApp
+
+import services.shared.middleware.rate_limit as rl
+from services.shared import middleware_utils, tenant_repo
+from services.shared.config_loader import load_config, thaw_config
+from services.shared.tenant_context import TenantInfo
+
+# --- middlewares isolados (sem o gateway) ---
+
+
+class FakeTenant:
+    def __init__(self, tid: str, config: dict | None = None):
+        self.id = tid
+        self.config = config or {}
+
+
+class FakeTenantMiddleware(BaseHTTPMiddleware):
+    """
+    Resolve o tenant pelo header x-tenant (cada tenant com seu config em
+    `configs`). Sem o header usa `default`; com `default=None` a request segue
+    sem tenant.
+    """
+
+    def __init__(
+        self, app: ASGIApp, configs: dict[str, dict] | None = None, default: str | None = None
+    ):
+        super().__init__(app)
+        self.configs = configs or {}
+        self.default = default
+
+    async def dispatch(self, request: Request, call_next):
+        tid = request.headers.get("x-tenant", self.default)
+        if tid:
+            request.state.tenant = FakeTenant(tid, self.configs.get(tid, {}))
+        return await call_next(request)
+
+
+def asgi_client(app: ASGIApp) -> httpx.AsyncClient:
+    """Cliente assíncrono: permite requests concorrentes contra o app."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t")
+
+
+@pytest.fixture
+def anyio_backend():
+    # gates e esperas dos middlewares usam primitivas do asyncio
+    return "asyncio"
+
+
+# --- apps dos serviços (gateway completo) ---
+
+
+@pytest.fixture
+def tenant_cfg(monkeypatch):
+    """
+    Tenant "3" (x-api-key: squad789) com o config do repositório; o teste pode
+    alterar o dict devolvido. Zera os buckets de rate limit.
+    """
+    monkeypatch.setattr(
+        tenant_repo,
+        "find_tenant_by_api_key",
+        lambda k: (
+            TenantInfo(id="3", name="Squad Inc", api_key=k, status="active")
+            if k == "squad789"
+            else None
+        ),
+    )
+    rl._BUCKETS.clear()
+    cfg = thaw_config(load_config("3"))
+    monkeypatch.setattr(middleware_utils, "load_config", lambda slug: cfg)
+    return cfg
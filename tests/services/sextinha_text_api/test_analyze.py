@@ -1,6 +1,23 @@
+import asyncio
+
+import pytest
 from fastapi.testclient import TestClient
 
+import services.shared.middleware.rate_limit as rl
+from services.sextinha_text_api.app import pool
+from services.sextinha_text_api.app.analysis import (
+    PREVIEW_CHARS,
+    InputTooLarge,
+    StreamingAnalyzer,
+    TextStreamDecoder,
+    analyze_text,
+    count_words,
+    split_text,
+)
 from services.sextinha_text_api.app.main import app
+from services.sextinha_text_api.app.result_cache import RESULT_CACHE
+from services.shared import settings
+from services.shared.middleware.idempotency import STORE
 
 client = TestClient(app)
 
@@ -38,3 +55,257 @@ def test_analyze_empty_whitespace_422():
 def test_analyze_extra_field_forbidden():
     r = client.post("/analyze", json={"text": "ok", "extra": "nope"})
     assert r.status_code == 422  # extra="forbid" no AppBaseModel
+
+
+# --- /v1/text/analyze (tenant-aware) ---
+
+
+@pytest.fixture
+def tenant_cfg(tenant_cfg):
+    RESULT_CACHE.clear()
+    return tenant_cfg
+
+
+H = {"x-api-key": "squad789"}
+
+
+def test_v1_analyze_requires_api_key(tenant_cfg):
+    assert client.post("/v1/text/analyze", json={"text": "oi"}).status_code == 401
+
+
+def test_v1_analyze_ok(tenant_cfg):
+    r = client.post("/v1/text/analyze", json={"text": "Olá, mundo! 你好"}, headers=H)
+    assert r.status_code == 200
+    assert r.json() == {"length": 14, "word_count": 3, "preview": "Olá, mundo! 你好"}
+
+
+def test_v1_analyze_enforces_max_input_tokens(tenant_cfg):
+    tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_input_tokens": 3}
+    ok = client.post("/v1/text/analyze", json={"text": "um dois três"}, headers=H)
+    assert ok.status_code == 200
+    r = client.post("/v1/text/analyze", json={"text": "um dois três quatro"}, headers=H)
+    assert r.status_code == 413
+    assert "max_input_tokens" in r.json()["detail"]
+
+
+def test_v1_analyze_respects_feature_flag(tenant_cfg):
+    tenant_cfg["features"] = {**tenant_cfg["features"], "enable_text": False}
+    r = client.post("/v1/text/analyze", json={"text": "oi"}, headers=H)
+    assert r.status_code == 403
+
+
+def test_count_words_stops_at_limit():
+    assert count_words("a b c d e") == 5
+    assert count_words("a b c d e", limit=2) == 3  # para no primeiro excedente
+
+
+# --- /v1/text/analyze/batch ---
+
+
+def test_batch_returns_items_in_order_with_per_item_errors(tenant_cfg):
+    tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_input_tokens": 2}
+    texts = ["um dois", "um dois três", "oi"]
+    r = client.post("/v1/text/analyze/batch", json={"texts": texts}, headers=H)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 3
+    assert [i["index"] for i in body["items"]] == [0, 1, 2]
+    assert body["items"][0]["result"]["word_count"] == 2
+    assert "max_input_tokens" in body["items"][1]["error"]
+    assert body["items"][2]["result"]["preview"] == "oi"
+
+
+def test_batch_enforces_max_batch_items(tenant_cfg):
+    tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_batch_items": 2}
+    r = client.post("/v1/text/analyze/batch", json={"texts": ["a", "b", "c"]}, headers=H)
+    assert r.status_code == 413
+
+
+def test_batch_consumes_weighted_units_from_analyze_bucket(tenant_cfg):
+    tenant_cfg["rate_limit"] = {
+        "batch_item_weight": 0.5,
+        "routes": {"/v1/text/analyze": {"rpm": 1, "burst": 4}},
+    }
+    texts = ["a"] * 6  # 3 tokens dos 4
+    assert (
+        client.post("/v1/text/analyze/batch", json={"texts": texts}, headers=H).status_code == 200
+    )
+    assert (
+        client.post("/v1/text/analyze/batch", json={"texts": texts}, headers=H).status_code == 429
+    )
+    # o bucket unitário foi o mesmo: resta 1 token
+    assert client.post("/v1/text/analyze", json={"text": "a"}, headers=H).status_code == 200
+    assert client.post("/v1/text/analyze", json={"text": "a"}, headers=H).status_code == 429
+
+
+def test_batch_is_not_also_charged_to_its_own_bucket(tenant_cfg):
+    # o gateway não cobra o bucket da rota de lote: só o handler, na unitária
+    tenant_cfg["rate_limit"] = {"routes": {"/v1/text/analyze/batch": {"rpm": 1, "burst": 1}}}
+    for _ in range(3):
+        r = client.post("/v1/text/analyze/batch", json={"texts": ["a"]}, headers=H)
+        assert r.status_code == 200
+    assert set(rl._BUCKETS) == {"3:/v1/text/analyze"}
+
+
+def test_large_batch_uses_process_pool(tenant_cfg, monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_BATCH_PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(settings, "TEXT_POOL_WORKERS", 2)
+    try:
+        texts = [f"texto número {i}" for i in range(9)]
+        r = client.post("/v1/text/analyze/batch", json={"texts": texts}, headers=H)
+        assert r.status_code == 200
+        assert [i["result"]["preview"] for i in r.json()["items"]] == texts
+        assert pool._pool is not None
+    finally:
+        pool.shutdown_pool()
+
+
+# --- /v1/text/analyze/stream ---
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_streaming_analyzer_matches_analyze_text_for_any_chunking(size):
+    txt = "  Olá, mundo!  palavra_longa   " + "x" * 150 + " fim \n\t "
+    analyzer = StreamingAnalyzer()
+    for i in range(0, len(txt), size):
+        analyzer.feed(txt[i : i + size])
+    assert analyzer.result() == analyze_text(txt.strip())
+
+
+def test_streaming_analyzer_keeps_no_text_for_a_long_single_token():
+    analyzer = StreamingAnalyzer(max_tokens=1)
+    chunk = "x" * 64 * 1024
+    for _ in range(300):
+        analyzer.feed(chunk)
+    assert analyzer.word_count == 1
+    # só o preview e um flag atravessam os chunks, nunca a palavra em aberto
+    assert analyzer._preview_len == PREVIEW_CHARS
+    assert analyzer.result().length == 300 * len(chunk)
+
+
+def test_streaming_analyzer_limit_counts_words_split_across_chunks():
+    analyzer = StreamingAnalyzer(max_tokens=3)
+    for piece in ["um do", "is tr", "ês"]:
+        analyzer.feed(piece)  # "três" no limite: a continuação não conta de novo
+    assert analyzer.word_count == 3
+    with pytest.raises(InputTooLarge):
+        analyzer.feed(" quatro")
+
+
+def test_text_stream_decoder_handles_split_utf8_and_ndjson_lines():
+    raw = "é 你好".encode()
+    decoder = TextStreamDecoder()
+    out = [t for i in range(len(raw)) for t in decoder.decode(raw[i : i + 1])]
+    assert "".join(out + decoder.close()) == "é 你好"
+
+    nd = TextStreamDecoder(ndjson=True)
+    assert nd.decode(b'{"text": "um "}\n{"te') == ["um "]
+    assert nd.decode(b'xt": "dois"}') == []
+    assert nd.close() == ["dois"]
+
+
+def _chunks(data: bytes, size: int = 5):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def test_stream_plain_text_chunked(tenant_cfg):
+    txt = "Sextinha é braba demais! " * 20
+    r = client.post(
+        "/v1/text/analyze/stream",
+        content=_chunks(txt.encode()),
+        headers={**H, "content-type": "text/plain; charset=utf-8"},
+    )
+    assert r.status_code == 200
+    assert r.json() == analyze_text(txt.strip()).model_dump()
+
+
+def test_stream_ndjson(tenant_cfg):
+    body = b'{"text": "Deu "}\n{"text": "bom!"}\n'
+    r = client.post(
+        "/v1/text/analyze/stream",
+        content=body,
+        headers={**H, "content-type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    assert r.json()["word_count"] == 2
+    assert r.json()["preview"] == "Deu bom!"
+
+
+def test_stream_enforces_max_input_tokens(tenant_cfg):
+    tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_input_tokens": 3}
+    r = client.post(
+        "/v1/text/analyze/stream",
+        content=_chunks(b"um dois tres quatro"),
+        headers={**H, "content-type": "text/plain"},
+    )
+    assert r.status_code == 413
+
+
+@pytest.mark.parametrize(
+    ("content_type", "body", "expected"),
+    [
+        ("application/json", b'{"text": "oi"}', 415),
+        ("text/plain", b"\xff\xfe", 422),
+        ("text/plain", b"   ", 422),
+        ("application/x-ndjson", b'{"texto": "oi"}', 422),
+    ],
+)
+def test_stream_rejects_bad_bodies(tenant_cfg, content_type, body, expected):
+    r = client.post(
+        "/v1/text/analyze/stream", content=body, headers={**H, "content-type": content_type}
+    )
+    assert r.status_code == expected
+
+
+# --- map-reduce de documentos grandes ---
+
+
+@pytest.mark.parametrize("parts", [1, 2, 3, 8, 50])
+def test_split_text_never_breaks_words(parts):
+    txt = "Olá, mundo! palavra_longa 12345 你好世界 fim " * 7 + "ultima"
+    chunks = split_text(txt, parts)
+    assert "".join(chunks) == txt
+    assert len(chunks) <= parts
+    assert sum(count_words(c) for c in chunks) == count_words(txt)
+
+
+def test_large_document_uses_process_pool(tenant_cfg, monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(settings, "TEXT_POOL_WORKERS", 2)
+    txt = "Sextinha é braba demais! " * 200
+    try:
+        r = client.post("/v1/text/analyze", json={"text": txt}, headers=H)
+        assert r.status_code == 200
+        assert r.json() == analyze_text(txt.strip()).model_dump()
+        assert pool._pool is not None
+
+        tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_input_tokens": 500}
+        r = client.post("/v1/text/analyze", json={"text": txt}, headers=H)
+        assert r.status_code == 413
+    finally:
+        pool.shutdown_pool()
+
+
+def test_analyze_idempotency_key_replays_response(tenant_cfg):
+    STORE.clear()
+    h = {**H, "Idempotency-Key": "retry-1"}
+    first = client.post("/v1/text/analyze", json={"text": "Deu bom!"}, headers=h)
+    second = client.post("/v1/text/analyze", json={"text": "Deu bom!"}, headers=h)
+    assert first.json() == second.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.headers["X-Request-Id"] != first.headers["X-Request-Id"]
+
+    # rota pública: sem tenant não há escopo seguro, o header é ignorado
+    public = client.post("/analyze", json={"text": "Deu bom!"}, headers=h)
+    assert "Idempotent-Replayed" not in public.headers
+
+
+def test_capped_document_skips_the_pool(monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(settings, "TEXT_POOL_WORKERS", 2)
+    monkeypatch.setattr(pool, "get_pool", lambda: pytest.fail("pool com teto baixo"))
+    txt = "palavra " * 10_000
+    with pytest.raises(InputTooLarge):
+        asyncio.run(pool.analyze_document(txt, max_tokens=100))
@@ -0,0 +1,67 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import services.shared.middleware.rate_limit as rl
+from services.sextinha_text_api.app.main import app
+from services.shared import tenant_repo
+from services.shared.metrics import (
+    AUTH_FAILURES,
+    GATEWAY_STAGE_LATENCY,
+    HTTP_LATENCY,
+    HTTP_RATE_LIMITED,
+    HTTP_REQUESTS,
+)
+from services.shared.tenant_context import TenantInfo
+
+client = TestClient(app)
+SERVICE = "sextinha_text_api"
+
+
+@pytest.fixture(autouse=True)
+def stub_repo(monkeypatch):
+    def fake_find(api_key: str):
+        if api_key == "camila123":
+            return TenantInfo(id="1", name="Dra. Camila", api_key=api_key, status="active")
+        return None
+
+    monkeypatch.setattr(tenant_repo, "find_tenant_by_api_key", fake_find)
+    rl._BUCKETS.clear()
+    yield
+
+
+def test_metrics_endpoint_is_public_and_prometheus_text():
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in r.text
+
+
+def test_requests_are_labelled_by_tenant_and_route_template():
+    before = HTTP_REQUESTS.value(SERVICE, "1", "/v1/ping", "200")
+    seen = HTTP_LATENCY.count(SERVICE, "1", "/v1/ping")
+    auth_seen = GATEWAY_STAGE_LATENCY.count(SERVICE, "auth")
+
+    r = client.get("/v1/ping", headers={"x-api-key": "camila123"})
+    assert r.status_code == 200
+
+    assert HTTP_REQUESTS.value(SERVICE, "1", "/v1/ping", "200") == before + 1
+    assert HTTP_LATENCY.count(SERVICE, "1", "/v1/ping") == seen + 1
+    assert GATEWAY_STAGE_LATENCY.count(SERVICE, "auth") == auth_seen + 1
+
+
+def test_auth_failures_and_429_are_counted():
+    missing = AUTH_FAILURES.value(SERVICE, "missing_key")
+    invalid = AUTH_FAILURES.value(SERVICE, "invalid_key")
+    limited = HTTP_RATE_LIMITED.value(SERVICE, "1", "/v1/ping")
+
+    assert client.get("/v1/ping").status_code == 401
+    assert client.get("/v1/ping", headers={"x-api-key": "nope"}).status_code == 403
+    # tenant 1: /v1/ping com rpm=2 no config
+    statuses = [
+        client.get("/v1/ping", headers={"x-api-key": "camila123"}).status_code for _ in range(4)
+    ]
+    assert 429 in statuses
+
+    assert AUTH_FAILURES.value(SERVICE, "missing_key") == missing + 1
+    assert AUTH_FAILURES.value(SERVICE, "invalid_key") == invalid + 1
+    assert HTTP_RATE_LIMITED.value(SERVICE, "1", "/v1/ping") == limited + statuses.count(429)
@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 
+import services.shared.middleware.rate_limit as rl
 from services.sextinha_text_api.app.main import app
 from services.shared import tenant_repo
 from services.shared.tenant_context import TenantInfo
@@ -16,6 +17,7 @@ def stub_tenant_repo(monkeypatch):
         return None
 
     monkeypatch.setattr(tenant_repo, "find_tenant_by_api_key", fake_find)
+    rl._BUCKETS.clear()  # limites reais dos configs (ex.: /v1/ping rpm=2 p/ tenant 1)
     yield
 
 
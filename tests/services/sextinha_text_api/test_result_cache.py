@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from services.sextinha_text_api.app import analysis, result_cache
+from services.sextinha_text_api.app.analysis import analyze_text
+from services.sextinha_text_api.app.main import app
+from services.sextinha_text_api.app.result_cache import (
+    RESULT_CACHE,
+    ResultCache,
+    cache_key,
+)
+from services.shared.metrics import CACHE_REQUESTS
+
+client = TestClient(app)
+H = {"x-api-key": "squad789"}
+
+
+def _result(text: str):
+    return analyze_text(text)
+
+
+def test_cache_key_depends_on_text_and_analysis_version(monkeypatch):
+    assert cache_key("oi") == cache_key("oi")
+    assert cache_key("oi") != cache_key("oi!")
+    before = cache_key("oi")
+    monkeypatch.setattr(result_cache, "ANALYSIS_VERSION", "2")
+    assert cache_key("oi") != before
+
+
+def test_lru_respects_global_byte_budget():
+    entry = ResultCache(10**6, 10**6)
+    entry.put("t", b"a", _result("a"))
+    one = entry.bytes
+
+    cache = ResultCache(max_bytes=2 * one, tenant_max_bytes=10**6)
+    cache.put("t1", b"a", _result("a"))
+    cache.put("t2", b"b", _result("b"))
+    assert cache.get("t1", b"a") is not None  # a fica mais recente que b
+    cache.put("t3", b"c", _result("c"))
+    assert cache.get("t2", b"b") is None
+    assert cache.get("t1", b"a") is not None
+    assert cache.bytes <= 2 * one
+
+
+def test_tenant_quota_only_evicts_own_entries():
+    probe = ResultCache(10**6, 10**6)
+    probe.put("t", b"x", _result("x"))
+    one = probe.bytes
+
+    cache = ResultCache(max_bytes=100 * one, tenant_max_bytes=2 * one)
+    cache.put("quiet", b"q", _result("q"))
+    for i in range(20):
+        cache.put("noisy", bytes([i]), _result(f"n{i}"))
+    assert cache.get("quiet", b"q") is not None
+    assert cache.tenant_bytes("noisy") <= 2 * one
+    assert cache.get("noisy", bytes([19])) is not None
+    assert cache.get("noisy", bytes([0])) is None
+
+    cache.put("custom", b"c", _result("c"), quota=0)  # cota 0 = sem cache
+    assert cache.get("custom", b"c") is None
+
+
+def test_tenant_quota_evicts_least_recently_used_of_the_tenant():
+    probe = ResultCache(10**6, 10**6)
+    probe.put("t", b"x", _result("x"))
+    one = probe.bytes
+
+    cache = ResultCache(max_bytes=100 * one, tenant_max_bytes=2 * one)
+    cache.put("t", b"a", _result("a"))
+    cache.put("t", b"b", _result("b"))
+    assert cache.get("t", b"a") is not None  # a passa a ser a mais recente do tenant
+    cache.put("t", b"c", _result("c"))
+    assert cache.get("t", b"b") is None
+    assert cache.get("t", b"a") is not None
+    assert len(cache) == 2
+
+
+def test_entries_are_scoped_by_tenant():
+    cache = ResultCache(10**6, 10**6)
+    cache.put("t1", b"k", _result("k"))
+    assert cache.get("t2", b"k") is None
+
+
+@pytest.fixture
+def tenant_cfg(tenant_cfg):
+    RESULT_CACHE.clear()
+    return tenant_cfg
+
+
+def test_repeated_analyze_is_served_from_cache(tenant_cfg, monkeypatch):
+    calls = []
+    real = analysis.analyze_text
+    monkeypatch.setattr(
+        "services.sextinha_text_api.app.pool.analyze_text",
+        lambda *a: calls.append(a) or real(*a),
+    )
+    hits = CACHE_REQUESTS.value("sextinha_text_api", "text_analysis", "hit")
+
+    first = client.post("/v1/text/analyze", json={"text": "  Deu bom demais "}, headers=H)
+    second = client.post("/v1/text/analyze", json={"text": "Deu bom demais"}, headers=H)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(calls) == 1
+    assert CACHE_REQUESTS.value("sextinha_text_api", "text_analysis", "hit") == hits + 1
+
+
+def test_cache_hit_still_enforces_tenant_limit(tenant_cfg):
+    assert (
+        client.post("/v1/text/analyze", json={"text": "um dois três"}, headers=H).status_code == 200
+    )
+    tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_input_tokens": 2}
+    r = client.post("/v1/text/analyze", json={"text": "um dois três"}, headers=H)
+    assert r.status_code == 413
+
+    r = client.post("/v1/text/analyze/batch", json={"texts": ["um dois três", "oi"]}, headers=H)
+    items = r.json()["items"]
+    assert "max_input_tokens" in items[0]["error"]
+    assert items[1]["result"]["word_count"] == 1
@@ -0,0 +1,108 @@
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.sextinha_vision_api.app.b64stream import (
+    Base64Error,
+    Base64StreamDecoder,
+    JsonFieldError,
+    JsonStringField,
+    sniff_base64,
+)
+from services.sextinha_vision_api.app.image_meta import META_HEADER_BYTES
+from services.sextinha_vision_api.app.main import app
+
+client = TestClient(app)
+H = {"x-api-key": "squad789"}
+RAW = bytes(range(256)) * 3 + b"xy"  # termina com padding "=="
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100_000
+
+
+pytestmark = pytest.mark.usefixtures("tenant_cfg")
+
+
+def _decode(data: bytes, size: int) -> bytes:
+    decoder = Base64StreamDecoder()
+    out = [decoder.feed(data[i : i + size]) for i in range(0, len(data), size)]
+    return b"".join(out) + decoder.close()
+
+
+@pytest.mark.parametrize("raw", [RAW, RAW[:-1], RAW[:-2], b""])
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 4096])
+def test_decoder_matches_b64decode(raw, size):
+    assert _decode(base64.b64encode(raw), size) == raw
+
+
+@pytest.mark.parametrize(
+    "bad", [b"YQ=", b"YQ", b"Y===", b"YQ==YQ==", b"YQ=a", b"Y Q==", b"YQ\n==", b"-_8="]
+)
+def test_decoder_rejects_what_b64decode_validate_rejects(bad):
+    with pytest.raises(ValueError):
+        base64.b64decode(bad, validate=True)
+    for size in (1, 3, len(bad)):
+        with pytest.raises(Base64Error):
+            _decode(bad, size)
+
+
+def test_sniff_keeps_only_the_header():
+    sniffer = sniff_base64(base64.b64encode(PNG).decode())
+    assert sniffer.size == len(PNG)
+    assert sniffer.head == PNG[:META_HEADER_BYTES]
+    with pytest.raises(Base64Error):
+        sniff_base64("YWJjé")
+
+
+@pytest.mark.parametrize("size", [1, 7, 1000])
+def test_json_field_streams_value_split_across_chunks(size):
+    body = b'{ "image_base64" : "YW\\/J\\/j" }'
+    reader = JsonStringField("image_base64")
+    out = [p for i in range(0, len(body), size) for p in reader.feed(body[i : i + size])]
+    reader.close()
+    assert b"".join(out) == b"YW/J/j"
+
+
+@pytest.mark.parametrize(
+    ("body", "kind"),
+    [
+        (b'{"image_base64": "a", "x": 1}', "extra_forbidden"),
+        (b"{}", "missing"),
+        (b'{"image_base64": 1}', "string_type"),
+        (b'{"image_base64": "a\\n"}', "string_type"),
+        (b'{"image_base64": "a"', "json_invalid"),
+        (b"[]", "json_invalid"),
+    ],
+)
+def test_json_field_errors(body, kind):
+    reader = JsonStringField("image_base64")
+    with pytest.raises(JsonFieldError) as exc:
+        reader.feed(body)
+        reader.close()
+    assert exc.value.kind == kind
+
+
+def test_v1_json_upload_in_chunks():
+    body = json.dumps({"image_base64": base64.b64encode(PNG).decode()}).encode()
+    chunks = (body[i : i + 4099] for i in range(0, len(body), 4099))
+    r = client.post(
+        "/v1/vision/analyze",
+        content=chunks,
+        headers={**H, "content-type": "application/json"},
+    )
+    assert r.status_code == 200
+    assert (r.json()["size_bytes"], r.json()["format"]) == (len(PNG), "png")
+
+
+@pytest.mark.parametrize(
+    ("payload", "loc"),
+    [
+        ({"image_base64": "YQ="}, ["body"]),
+        ({"image_base64": ""}, ["body", "image_base64"]),
+        ({}, ["body", "image_base64"]),
+    ],
+)
+def test_v1_json_errors_are_422(payload, loc):
+    r = client.post("/v1/vision/analyze", json=payload, headers=H)
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["loc"] == loc
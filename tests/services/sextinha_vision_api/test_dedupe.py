@@ -0,0 +1,84 @@
+import base64
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.sextinha_vision_api.app import upload
+from services.sextinha_vision_api.app.dedupe import DEDUPE, DedupeStore
+from services.sextinha_vision_api.app.main import app
+from services.shared.metrics import CACHE_REQUESTS, DEDUPE_BYTES
+
+client = TestClient(app)
+H = {"x-api-key": "squad789"}
+SERVICE = "sextinha_vision_api"
+
+
+@pytest.fixture(autouse=True)
+def tenant_cfg(tenant_cfg):
+    DEDUPE.clear()
+    return tenant_cfg
+
+
+def _key(i: int) -> bytes:
+    return hashlib.sha256(str(i).encode()).digest()
+
+
+def test_memory_tier_spills_to_disk_and_promotes_back(tmp_path):
+    store = DedupeStore(2, str(tmp_path), 4096)
+    for i in range(4):
+        store.put(_key(i), b"v%d" % i)
+    assert (len(store), store.disk_entries()) == (4, 2)  # 0 e 1 saíram da memória
+
+    assert store.get(_key(0)) == b"v0"  # hit no disco volta para a memória
+    assert store.get(_key(9)) is None
+    assert (len(store), store.disk_entries()) == (4, 2)
+
+    path = tmp_path / f"vision-dedupe-{os.getpid()}.bin"
+    assert path.stat().st_size == 4096
+    store.close()
+    assert not path.exists()
+
+
+def test_disk_tier_evicts_oldest_records_by_size(tmp_path):
+    value = b"x" * 64
+    record = 36 + len(value)
+    store = DedupeStore(1, str(tmp_path), record * 5 + 10)  # cabem 5 registros
+    for i in range(21):
+        store.put(_key(i), value)
+    # 20 foram para o disco; só os 5 mais recentes sobrevivem ao log circular
+    assert store.disk_entries() == 5
+    assert all(store.get(_key(i)) == value for i in range(15, 21))
+    assert store.get(_key(14)) is None
+    store.close()
+
+
+def test_without_disk_dir_evicted_entries_are_dropped():
+    store = DedupeStore(2)
+    for i in range(3):
+        store.put(_key(i), b"v")
+    assert store.get(_key(0)) is None and len(store) == 2
+    assert not DedupeStore(0).enabled
+
+
+def test_resent_image_is_served_from_the_store(monkeypatch):
+    calls = []
+    real = upload.describe_image
+    monkeypatch.setattr(upload, "describe_image", lambda *a: calls.append(1) or real(*a))
+    png = b"\x89PNG\r\n\x1a\n" + os.urandom(300)
+    hits = CACHE_REQUESTS.value(SERVICE, "image_dedupe", "hit")
+    dup = DEDUPE_BYTES.value(SERVICE, "image_dedupe", "duplicate")
+
+    payload = {"image_base64": base64.b64encode(png).decode()}
+    first = client.post("/v1/vision/analyze", json=payload, headers=H)
+    again = client.post(
+        "/v1/vision/analyze",
+        content=png,
+        headers={**H, "content-type": "application/octet-stream"},
+    )
+    assert first.status_code == again.status_code == 200
+    assert first.json() == again.json()
+    assert len(calls) == 1
+    assert CACHE_REQUESTS.value(SERVICE, "image_dedupe", "hit") == hits + 1
+    assert DEDUPE_BYTES.value(SERVICE, "image_dedupe", "duplicate") == dup + len(png)
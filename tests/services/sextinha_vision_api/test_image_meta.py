@@ -0,0 +1,142 @@
+import base64
+import struct
+import zlib
+
+import pytest
+
+from services.sextinha_vision_api.app.image_meta import (
+    META_HEADER_BYTES,
+    HeaderSniffer,
+    ImageMeta,
+    parse_image_meta,
+)
+from services.sextinha_vision_api.app.upload import describe_image
+
+# PNG 1x1 real (mesmo do test_headers)
+PNG_1X1 = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAusB9oQJm1cAAAAASUVORK5CYII="
+)
+
+
+def _png_chunk(ctype: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data))
+
+
+def _tiff_orientation(value: int, order: bytes = b"MM") -> bytes:
+    e = ">" if order == b"MM" else "<"
+    return (
+        order
+        + struct.pack(e + "HI", 42, 8)
+        + struct.pack(e + "H", 1)
+        + struct.pack(e + "HHIHH", 0x0112, 3, 1, value, 0)
+        + b"\0\0\0\0"
+    )
+
+
+def _png(w: int, h: int, depth: int, color: int, extra: bytes = b"") -> bytes:
+    ihdr = _png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, depth, color, 0, 0, 0))
+    return b"\x89PNG\r\n\x1a\n" + ihdr + extra + _png_chunk(b"IDAT", b"\0" * 32)
+
+
+def _jpeg(w: int, h: int, comps: int, orientation: int | None = None) -> bytes:
+    out = b"\xff\xd8"
+    out += b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9
+    if orientation is not None:
+        exif = b"Exif\0\0" + _tiff_orientation(orientation, b"II")
+        out += b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    sof = struct.pack(">BHHB", 8, h, w, comps) + b"\x01\x11\x00" * comps
+    out += b"\xff\xc2" + struct.pack(">H", len(sof) + 2) + sof
+    return out + b"\xff\xda" + b"\0" * 64
+
+
+def _gif(w: int, h: int, frames: int) -> bytes:
+    out = b"GIF89a" + struct.pack("<HHBBB", w, h, 0xF1, 0, 0) + b"\0" * 12  # paleta de 4 cores
+    for _ in range(frames):
+        out += b"\x21\xf9\x04\x00\x0a\x00\x00\x00"  # graphic control extension
+        out += b"\x2c" + struct.pack("<HHHHB", 0, 0, w, h, 0)
+        out += b"\x02" + b"\x05" + b"\x01" * 5 + b"\x00"
+    return out + b"\x3b"
+
+
+def _riff(chunks: bytes) -> bytes:
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WEBP" + chunks
+
+
+def _webp_chunk(ctype: bytes, data: bytes) -> bytes:
+    return ctype + struct.pack("<I", len(data)) + data + (b"\0" if len(data) & 1 else b"")
+
+
+def _vp8x(w: int, h: int, flags: int) -> bytes:
+    return _webp_chunk(
+        b"VP8X",
+        bytes([flags, 0, 0, 0]) + (w - 1).to_bytes(3, "little") + (h - 1).to_bytes(3, "little"),
+    )
+
+
+def test_png_ihdr_and_apng_frames():
+    assert parse_image_meta(PNG_1X1) == ImageMeta("png", 1, 1, 8, "gray_alpha", None, 1)
+    actl = _png_chunk(b"acTL", struct.pack(">II", 12, 0))
+    exif = _png_chunk(b"eXIf", _tiff_orientation(6))
+    meta = parse_image_meta(_png(640, 480, 16, 6, actl + exif))
+    assert meta == ImageMeta("png", 640, 480, 16, "rgba", 6, 12)
+
+
+@pytest.mark.parametrize(("comps", "color"), [(1, "gray"), (3, "ycbcr"), (4, "cmyk")])
+def test_jpeg_sof_after_exif(comps, color):
+    meta = parse_image_meta(_jpeg(1920, 1080, comps, orientation=8))
+    assert meta == ImageMeta("jpeg", 1920, 1080, 8, color, 8, 1)
+
+
+def test_gif_screen_descriptor_and_frame_walk():
+    data = _gif(32, 16, frames=3)
+    assert parse_image_meta(data) == ImageMeta("gif", 32, 16, 8, "palette", None, 3)
+    assert parse_image_meta(data[:-10]).frames is None
+    assert parse_image_meta(data, count_gif_frames=False).frames is None
+
+
+@pytest.mark.parametrize("size", [1, 5, 13, 4096])
+def test_sniffer_counts_gif_frames_past_the_header_window(size):
+    # frames com sub-blocos grandes: o arquivo passa de META_HEADER_BYTES
+    frame = b"\x2c" + struct.pack("<HHHHB", 0, 0, 4, 4, 0) + b"\x02"
+    frame += (b"\xff" + b"\x01" * 255) * 100 + b"\x00"
+    data = _gif(4, 4, frames=0)[:-1] + frame * 5 + b"\x3b"
+    assert len(data) > META_HEADER_BYTES
+
+    sniffer = HeaderSniffer()
+    for i in range(0, len(data), size):
+        sniffer.feed(data[i : i + size])
+    assert sniffer.gif_frames == 5
+    assert describe_image(sniffer.head, sniffer.size, sniffer.gif_frames).frames == 5
+
+    truncated = HeaderSniffer()
+    truncated.feed(data[:-1])
+    assert truncated.gif_frames is None
+
+
+def test_webp_variants():
+    vp8 = _webp_chunk(b"VP8 ", b"\0\0\0\x9d\x01\x2a" + struct.pack("<HH", 300, 200) + b"\0" * 8)
+    assert parse_image_meta(_riff(vp8)) == ImageMeta("webp", 300, 200, 8, "rgb", None, 1)
+
+    bits = (99) | (49 << 14) | (1 << 28)
+    vp8l = _webp_chunk(b"VP8L", b"\x2f" + struct.pack("<I", bits) + b"\0" * 4)
+    assert parse_image_meta(_riff(vp8l)) == ImageMeta("webp", 100, 50, 8, "rgba", None, 1)
+
+    anim = _vp8x(64, 32, 0x02 | 0x10 | 0x08) + _webp_chunk(b"ANIM", b"\0" * 6)
+    anim += _webp_chunk(b"ANMF", b"\0" * 20) * 4
+    anim += _webp_chunk(b"EXIF", _tiff_orientation(3))
+    assert parse_image_meta(_riff(anim)) == ImageMeta("webp", 64, 32, 8, "rgba", 3, 4)
+    assert parse_image_meta(_riff(anim)[:60]).frames is None  # truncado
+
+
+def test_bmp_info_header_top_down():
+    header = b"BM" + struct.pack("<IHHI", 0, 0, 0, 54)
+    info = struct.pack("<IiiHH", 40, 800, -600, 1, 24) + b"\0" * 24
+    assert parse_image_meta(header + info) == ImageMeta("bmp", 800, 600, 24, "rgb", None, 1)
+
+
+def test_memoryview_and_garbage_inputs():
+    data = bytearray(b"\0" * 10 + PNG_1X1)
+    assert parse_image_meta(memoryview(data)[10:]).width == 1
+    assert parse_image_meta(b"\x89PNG\r\n\x1a\n\0\0") == ImageMeta("png")
+    assert parse_image_meta(b"\xff\xd8\x00\x00\x00") == ImageMeta("jpeg")
+    assert parse_image_meta(b"hello") == ImageMeta("unknown")
@@ -0,0 +1,91 @@
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.sextinha_vision_api.app.main import app
+from services.sextinha_vision_api.app.upload import MultipartImageReader
+
+client = TestClient(app)
+H = {"x-api-key": "squad789"}
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+JPEG = b"\xff\xd8\xff\xe0" + b"\x01" * 300
+
+
+pytestmark = pytest.mark.usefixtures("tenant_cfg")
+
+
+def _multipart(boundary: bytes, data: bytes) -> bytes:
+    return (
+        b"preambulo\r\n--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="note"\r\n\r\n'
+        b"--nao e boundary\r\n"
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="image"; filename="a.jpg"\r\n'
+        b"Content-Type: image/jpeg\r\n\r\n" + data + b"\r\n--" + boundary + b"--\r\n"
+    )
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 4096])
+def test_multipart_reader_returns_only_the_image_part(size):
+    body = _multipart(b"XyZ", JPEG)
+    reader = MultipartImageReader(b"XyZ")
+    out = [part for i in range(0, len(body), size) for part in reader.feed(body[i : i + size])]
+    assert reader.found
+    assert b"".join(out) == JPEG
+
+
+def _chunks(data: bytes, size: int = 17):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def test_octet_stream_upload_is_sniffed_and_counted():
+    r = client.post(
+        "/v1/vision/analyze",
+        content=_chunks(PNG),
+        headers={**H, "content-type": "application/octet-stream"},
+    )
+    assert r.status_code == 200
+    assert (r.json()["size_bytes"], r.json()["format"]) == (len(PNG), "png")
+
+
+def test_multipart_upload():
+    r = client.post("/v1/vision/analyze", files={"image": ("a.jpg", JPEG, "image/jpeg")}, headers=H)
+    assert r.status_code == 200
+    assert (r.json()["size_bytes"], r.json()["format"]) == (len(JPEG), "jpeg")
+
+
+def test_multipart_without_image_part_is_422():
+    body = _multipart(b"B", JPEG).replace(b'filename="a.jpg"', b"").replace(b'"image"', b'"x"')
+    r = client.post(
+        "/v1/vision/analyze",
+        content=body,
+        headers={**H, "content-type": "multipart/form-data; boundary=B"},
+    )
+    assert r.status_code == 422
+
+
+def test_json_path_never_decodes_the_whole_image(monkeypatch):
+    # o caminho JSON decodifica em fatias, sem b64decode do payload inteiro
+    monkeypatch.setattr(base64, "b64decode", lambda *a, **k: pytest.fail("full decode"))
+    payload = {"image_base64": base64.b64encode(PNG).decode()}
+    r = client.post("/v1/vision/analyze", json=payload, headers=H)
+    assert r.status_code == 200
+    assert r.json()["format"] == "png"
+
+
+def test_json_invalid_base64_and_unknown_media_type():
+    r = client.post("/v1/vision/analyze", json={"image_base64": "###"}, headers=H)
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["loc"][0] == "body"
+
+    r = client.post("/v1/vision/analyze", content=PNG, headers={**H, "content-type": "image/png"})
+    assert r.status_code == 415
+
+    r = client.post(
+        "/v1/vision/analyze",
+        content=b"",
+        headers={**H, "content-type": "application/octet-stream"},
+    )
+    assert r.status_code == 422
@@ -0,0 +1,73 @@
+import base64
+
+from fastapi.testclient import TestClient
+
+import services.shared.middleware.rate_limit as rl
+from services.sextinha_vision_api.app import pool
+from services.sextinha_vision_api.app.main import app
+from services.shared import settings
+
+client = TestClient(app)
+H = {"x-api-key": "squad789"}
+PNG = base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32).decode()
+JPEG = base64.b64encode(b"\xff\xd8\xff\xe0" + b"\x01" * 32).decode()
+
+
+def test_batch_returns_results_in_order_with_per_image_errors(tenant_cfg):
+    r = client.post(
+        "/v1/vision/analyze/batch", json={"images_base64": [PNG, "###", JPEG]}, headers=H
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 3
+    assert [i["index"] for i in body["items"]] == [0, 1, 2]
+    assert body["items"][0]["result"]["format"] == "png"
+    assert body["items"][1]["error"] == "image_base64 inválido"
+    assert body["items"][2]["result"]["format"] == "jpeg"
+
+
+def test_batch_enforces_max_images_per_request(tenant_cfg):
+    tenant_cfg["limits"] = {**tenant_cfg["limits"], "max_images_per_request": 2}
+    r = client.post("/v1/vision/analyze/batch", json={"images_base64": [PNG] * 3}, headers=H)
+    assert r.status_code == 413
+
+
+def test_batch_consumes_weighted_units_from_analyze_bucket(tenant_cfg):
+    tenant_cfg["rate_limit"] = {
+        "image_item_weight": 0.5,
+        "routes": {"/v1/vision/analyze": {"rpm": 1, "burst": 3}},
+    }
+    images = {"images_base64": [PNG] * 4}  # 2 tokens dos 3
+    assert client.post("/v1/vision/analyze/batch", json=images, headers=H).status_code == 200
+    assert client.post("/v1/vision/analyze/batch", json=images, headers=H).status_code == 429
+    payload = {"image_base64": PNG}
+    assert client.post("/v1/vision/analyze", json=payload, headers=H).status_code == 200
+    assert client.post("/v1/vision/analyze", json=payload, headers=H).status_code == 429
+
+
+def test_batch_is_not_also_charged_to_its_own_bucket(tenant_cfg):
+    # o gateway não cobra o bucket da rota de lote: só o handler, na unitária
+    tenant_cfg["rate_limit"] = {"routes": {"/v1/vision/analyze/batch": {"rpm": 1, "burst": 1}}}
+    for _ in range(3):
+        r = client.post("/v1/vision/analyze/batch", json={"images_base64": [PNG]}, headers=H)
+        assert r.status_code == 200
+    assert set(rl._BUCKETS) == {"3:/v1/vision/analyze"}
+
+
+def test_large_batch_uses_process_pool(tenant_cfg, monkeypatch):
+    monkeypatch.setattr(settings, "VISION_BATCH_PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(settings, "VISION_POOL_WORKERS", 2)
+    try:
+        images = [PNG, JPEG, "###", PNG]
+        r = client.post("/v1/vision/analyze/batch", json={"images_base64": images}, headers=H)
+        assert r.status_code == 200
+        items = r.json()["items"]
+        assert [i["result"]["format"] if i["result"] else i["error"] for i in items] == [
+            "png",
+            "jpeg",
+            "image_base64 inválido",
+            "png",
+        ]
+        assert pool._pool is not None
+    finally:
+        pool.shutdown_pool()
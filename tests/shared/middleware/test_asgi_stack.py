@@ -0,0 +1,65 @@
+# tests/shared/middleware/test_asgi_stack.py
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.testclient import TestClient
+
+import services.shared.middleware.rate_limit as rl
+from services.shared import tenant_repo
+from services.shared.app_middleware import apply_middlewares
+from services.shared.middleware.concurrency import _GATES
+from services.shared.tenant_context import TenantInfo, get_current_tenant
+
+
+@pytest.fixture(autouse=True)
+def stub_repo(monkeypatch):
+    def fake_find(api_key: str):
+        if api_key == "camila123":
+            return TenantInfo(id="1", name="Dra. Camila", api_key=api_key, status="active")
+        return None
+
+    monkeypatch.setattr(tenant_repo, "find_tenant_by_api_key", fake_find)
+    rl._BUCKETS.clear()
+    _GATES.clear()
+    yield
+    rl._BUCKETS.clear()
+    _GATES.clear()
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/v1/stream")
+    def stream():
+        def gen():
+            tenant = get_current_tenant()
+            for i in range(3):
+                yield f"{i}:{tenant.id if tenant else '-'}\n"
+
+        return StreamingResponse(gen(), media_type="text/plain")
+
+    apply_middlewares(app)
+    return TestClient(app)
+
+
+def test_streaming_response_passes_through_stack_with_headers():
+    c = make_client()
+    with c.stream("GET", "/v1/stream", headers={"x-api-key": "camila123"}) as r:
+        body = "".join(r.iter_text())
+
+    assert r.status_code == 200
+    assert body == "0:1\n1:1\n2:1\n"
+    assert r.headers["X-Request-Id"]
+    assert r.headers["X-Tenant-Id"] == "1"
+    # vaga de concorrência devolvida só após o fim do corpo
+    assert _GATES["1"].in_flight == 0
+
+
+def test_short_circuit_responses_keep_request_id():
+    c = make_client()
+    rid = "3c3c3ad3-0d8e-4f7d-8b1e-f45d9f6b9a11"
+    r = c.get("/v1/stream", headers={"X-Request-Id": rid})
+    assert r.status_code == 401
+    assert r.headers["X-Request-Id"] == rid
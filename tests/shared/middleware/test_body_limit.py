@@ -0,0 +1,105 @@
+import pytest
+from fastapi import FastAPI, Request
+from starlette.testclient import TestClient
+
+import services.shared.middleware.rate_limit as rl
+from services.shared import middleware_utils, settings, tenant_repo
+from services.shared.app_middleware import apply_middlewares
+from services.shared.tenant_context import TenantInfo
+
+H = {"x-api-key": "camila123"}
+
+
+@pytest.fixture(autouse=True)
+def stub_tenant(monkeypatch):
+    monkeypatch.setattr(
+        tenant_repo,
+        "find_tenant_by_api_key",
+        lambda k: (
+            TenantInfo(id="1", name="Dra. Camila", api_key=k, status="active")
+            if k == "camila123"
+            else None
+        ),
+    )
+    cfg = {"limits": {"max_request_bytes": 100}}
+    monkeypatch.setattr(middleware_utils, "load_config", lambda slug: cfg)
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", 50)
+    rl._BUCKETS.clear()
+    yield
+    rl._BUCKETS.clear()
+
+
+def make_client() -> tuple[TestClient, list[int]]:
+    app = FastAPI()
+    seen: list[int] = []
+
+    @app.post("/v1/json")
+    def v1_json(payload: dict):
+        seen.append(len(payload["x"]))
+        return {"ok": True}
+
+    @app.post("/v1/stream")
+    async def v1_stream(request: Request):
+        async for chunk in request.stream():
+            seen.append(len(chunk))
+        return {"ok": True}
+
+    @app.post("/public")
+    def public(payload: dict):
+        seen.append(len(payload["x"]))
+        return {"ok": True}
+
+    apply_middlewares(app, idempotent_paths=("/v1/json",))
+    return TestClient(app), seen
+
+
+def _chunks(data: bytes, size: int = 10):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def test_content_length_over_tenant_limit_is_rejected_before_the_handler():
+    c, seen = make_client()
+    r = c.post("/v1/json", json={"x": "a" * 200}, headers=H)
+    assert r.status_code == 413
+    assert r.headers["X-Request-Id"]
+    assert seen == []
+
+    assert c.post("/v1/json", json={"x": "a" * 50}, headers=H).status_code == 200
+
+
+def test_public_routes_use_global_default():
+    c, seen = make_client()
+    assert c.post("/public", json={"x": "a" * 20}).status_code == 200
+    assert c.post("/public", json={"x": "a" * 80}).status_code == 413
+    assert seen == [20]
+
+
+def test_chunked_body_is_cut_when_streamed_bytes_cross_the_limit():
+    c, seen = make_client()
+    body = b'{"x": "' + b"a" * 300 + b'"}'
+    r = c.post(
+        "/v1/stream",
+        content=_chunks(body),
+        headers={**H, "content-type": "application/octet-stream"},
+    )
+    assert r.status_code == 413
+    assert sum(seen) <= 100  # o handler nunca viu além do limite
+
+
+def test_chunked_body_through_idempotency_layer_gets_413():
+    c, seen = make_client()
+    body = b'{"x": "' + b"a" * 300 + b'"}'
+    r = c.post(
+        "/v1/json",
+        content=_chunks(body),
+        headers={**H, "content-type": "application/json", "Idempotency-Key": "k"},
+    )
+    assert r.status_code == 413
+    assert seen == []
+
+
+def test_invalid_content_length_is_400():
+    c, _ = make_client()
+    r = c.post("/public", content=b"{}", headers={"content-length": "abc"})
+    assert r.status_code == 400
@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+from conftest import FakeTenantMiddleware, asgi_client
+from fastapi import FastAPI, HTTPException
+
+from services.shared import settings
+from services.shared.middleware.idempotency import (
+    REPLAYED_HEADER,
+    IdempotencyMiddleware,
+    IdempotencyStore,
+)
+
+
+def make_app(store: IdempotencyStore) -> tuple[FastAPI, dict, asyncio.Event]:
+    app = FastAPI()
+    calls = {"n": 0}
+    release = asyncio.Event()
+    release.set()
+
+    @app.post("/analyze")
+    async def analyze(payload: dict):
+        calls["n"] += 1
+        await release.wait()
+        if payload.get("fail"):
+            raise HTTPException(status_code=503, detail="indisponível")
+        return {"n": calls["n"], "echo": payload}
+
+    @app.post("/other")
+    async def other(payload: dict):
+        calls["n"] += 1
+        return {"n": calls["n"]}
+
+    app.add_middleware(IdempotencyMiddleware, paths=("/analyze",), store=store)
+    app.add_middleware(FakeTenantMiddleware)
+    return app, calls, release
+
+
+def _h(key: str, tenant: str = "T1") -> dict[str, str]:
+    return {"Idempotency-Key": key, "x-tenant": tenant}
+
+
+@pytest.mark.anyio
+async def test_duplicate_gets_stored_response_with_marker():
+    app, calls, _ = make_app(IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6))
+    async with asgi_client(app) as c:
+        first = await c.post("/analyze", json={"x": 1}, headers=_h("k1"))
+        second = await c.post("/analyze", json={"x": 1}, headers=_h("k1"))
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json() == {"n": 1, "echo": {"x": 1}}
+    assert REPLAYED_HEADER not in first.headers
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert calls["n"] == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_duplicates_wait_for_in_flight_execution():
+    app, calls, release = make_app(IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6))
+    release.clear()
+    async with asgi_client(app) as c:
+        reqs = [
+            asyncio.create_task(c.post("/analyze", json={"x": 1}, headers=_h("k")))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        assert calls["n"] == 1
+        release.set()
+        responses = await asyncio.gather(*reqs)
+    assert [r.json()["n"] for r in responses] == [1, 1, 1]
+    assert sum(REPLAYED_HEADER in r.headers for r in responses) == 2
+
+
+@pytest.mark.anyio
+async def test_keys_are_scoped_by_tenant_and_expire():
+    store = IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6)
+    app, calls, _ = make_app(store)
+    async with asgi_client(app) as c:
+        await c.post("/analyze", json={"x": 1}, headers=_h("k", "T1"))
+        await c.post("/analyze", json={"x": 1}, headers=_h("k", "T2"))
+        assert calls["n"] == 2
+
+        store.ttl_s = 0
+        await c.post("/analyze", json={"x": 1}, headers=_h("k2"))
+        await c.post("/analyze", json={"x": 1}, headers=_h("k2"))
+        assert calls["n"] == 4
+
+
+@pytest.mark.anyio
+async def test_reused_key_with_other_body_is_rejected():
+    app, calls, _ = make_app(IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6))
+    async with asgi_client(app) as c:
+        await c.post("/analyze", json={"x": 1}, headers=_h("k"))
+        r = await c.post("/analyze", json={"x": 2}, headers=_h("k"))
+    assert r.status_code == 422
+    assert calls["n"] == 1
+
+
+@pytest.mark.anyio
+async def test_server_errors_are_not_stored_and_other_paths_ignored():
+    app, calls, _ = make_app(IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6))
+    async with asgi_client(app) as c:
+        assert (await c.post("/analyze", json={"fail": 1}, headers=_h("k"))).status_code == 503
+        assert (await c.post("/analyze", json={"fail": 1}, headers=_h("k"))).status_code == 503
+        assert calls["n"] == 2
+
+        await c.post("/other", json={}, headers=_h("o"))
+        await c.post("/other", json={}, headers=_h("o"))
+        assert calls["n"] == 4
+
+        long_key = await c.post("/analyze", json={}, headers=_h("x" * 300))
+        assert long_key.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_store_caps_entries():
+    store = IdempotencyStore(ttl_s=60, max_entries=2, max_bytes=10**6)
+    app, calls, _ = make_app(store)
+    async with asgi_client(app) as c:
+        for key in ("a", "b", "c", "a"):
+            await c.post("/analyze", json={}, headers=_h(key))
+    assert calls["n"] == 4  # "a" saiu quando "c" entrou
+
+
+@pytest.mark.anyio
+async def test_store_evicts_least_recently_used_to_fit_byte_budget():
+    store = IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=700)
+    app, calls, _ = make_app(store)
+    pad = {"pad": "x" * 200}  # ~300 bytes por resposta guardada: cabem 2
+    async with asgi_client(app) as c:
+        for key in ("a", "b", "c", "d", "e"):
+            await c.post("/analyze", json=pad, headers=_h(key))
+        assert len(store) == 2
+        assert 0 < store.bytes <= store.max_bytes
+
+        again = await c.post("/analyze", json=pad, headers=_h("e"))
+        assert again.headers[REPLAYED_HEADER] == "true"
+        await c.post("/analyze", json=pad, headers=_h("a"))  # despejada: executa de novo
+        assert calls["n"] == 6
+
+        big = await c.post("/analyze", json={"pad": "x" * 1000}, headers=_h("big"))
+        assert big.status_code == 200
+    assert ("T1", "big") not in store._entries  # maior que o orçamento inteiro
+    assert store.bytes <= store.max_bytes
+
+
+@pytest.mark.anyio
+async def test_requests_without_tenant_are_never_stored():
+    app, calls, _ = make_app(IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6))
+    async with asgi_client(app) as c:
+        for _ in range(2):
+            r = await c.post("/analyze", json={"x": 1}, headers={"Idempotency-Key": "k"})
+            assert REPLAYED_HEADER not in r.headers
+    assert calls["n"] == 2
+
+
+@pytest.mark.anyio
+async def test_duplicate_gives_up_with_409_when_first_hangs(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_S", 0.05)
+    app, calls, release = make_app(IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6))
+    release.clear()
+    async with asgi_client(app) as c:
+        first = asyncio.create_task(c.post("/analyze", json={"x": 1}, headers=_h("k")))
+        await asyncio.sleep(0.01)
+        dup = await c.post("/analyze", json={"x": 1}, headers=_h("k"))
+        release.set()
+        await first
+    assert dup.status_code == 409
+    assert calls["n"] == 1
+
+
+@pytest.mark.anyio
+async def test_body_is_streamed_through_not_buffered():
+    store = IdempotencyStore(ttl_s=60, max_entries=100, max_bytes=10**6)
+    seen = []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            seen.append(len(message.get("body", b"")))
+            if not message.get("more_body", False):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def chunks():
+        for _ in range(4):
+            yield b"x" * 10
+
+    wrapped = FakeTenantMiddleware(IdempotencyMiddleware(app, paths=("/up",), store=store))
+    async with asgi_client(wrapped) as c:
+        await c.post("/up", content=chunks(), headers=_h("k"))
+        again = await c.post("/up", content=chunks(), headers=_h("k"))
+        other = await c.post("/up", content=b"y" * 40, headers=_h("k"))
+    assert seen.count(10) == 4  # o app recebeu os chunks um a um
+    assert again.headers[REPLAYED_HEADER] == "true"
+    assert other.status_code == 422
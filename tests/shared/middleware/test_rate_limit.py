@@ -39,6 +39,10 @@ def make_app(tenant_id: str, tenant_config: dict) -> TestClient:
     def ping():
         return {"ok": True}
 
+    @app.get("/v1/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
     # Ordem: CORS (inner) <- RateLimit <- Tenant <- RequestId (outermost)
     # (CORS não é necessário nos testes de RL, então omitimos aqui)
     app.add_middleware(RateLimitMiddlewarePerTenant)  # inner
@@ -85,3 +89,33 @@ def test_distinct_limits_per_tenant_and_route():
     assert c2.get("/v1/ping").status_code == 200
     assert c2.get("/v1/ping").status_code == 200
     assert c2.get("/v1/ping").status_code == 200
+
+
+def test_templated_route_shares_bucket_across_ids():
+    cfg = {"rate_limit": {"default": {"rpm": 2, "burst": 2}}}
+    c = make_app("T1", cfg)
+    assert c.get("/v1/items/1").status_code == 200
+    assert c.get("/v1/items/2").status_code == 200
+    assert c.get("/v1/items/3").status_code == 429
+    assert set(rl._BUCKETS) == {"T1:/v1/items/{item_id}"}
+
+
+def test_config_accepts_template_patterns():
+    cfg = {
+        "rate_limit": {
+            "default": {"rpm": 100, "burst": 100},
+            "routes": {"/v1/items/{id}": {"rpm": 1, "burst": 1}},
+        }
+    }
+    c = make_app("T1", cfg)
+    assert c.get("/v1/items/a").status_code == 200
+    assert c.get("/v1/items/b").status_code == 429
+    assert c.get("/v1/ping").status_code == 200  # outras rotas seguem o default
+
+
+def test_unknown_paths_share_single_bucket():
+    cfg = {"rate_limit": {"default": {"rpm": 100, "burst": 100}}}
+    c = make_app("T1", cfg)
+    for i in range(5):
+        assert c.get(f"/v1/nope/{i}").status_code == 404
+    assert set(rl._BUCKETS) == {"T1:<unmatched>"}
@@ -4,7 +4,7 @@ from __future__ import annotations
 import io
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from starlette.testclient import TestClient
 
 from services.shared.logging_utils import JsonFormatter
@@ -94,3 +94,89 @@ def test_logs_on_error_have_stacktrace():
             assert '"exc_text":' in out
     finally:
         _detach_buffer_logger(logger, handler)
+
+
+class _FakeTenant:
+    id = "T1"
+
+
+def make_sampled_app(tenant_config: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/ok")
+    def ok():
+        return {"ok": True}
+
+    @app.get("/v1/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
+    @app.get("/v1/missing")
+    def missing():
+        raise HTTPException(status_code=404)
+
+    @app.middleware("http")
+    async def fake_tenant(request: Request, call_next):
+        request.state.tenant = _FakeTenant()
+        request.state.tenant_config = tenant_config
+        return await call_next(request)
+
+    app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+
+def _count(out: str, path: str) -> int:
+    return out.count(f'"path": "{path}"')
+
+
+def test_sampling_drops_successes_but_keeps_errors():
+    client = TestClient(make_sampled_app({"logging": {"sample_rate": 0.0}}))
+    logger, buf, handler = _attach_buffer_logger()
+    try:
+        for _ in range(5):
+            assert client.get("/v1/ok").status_code == 200
+        assert client.get("/v1/missing").status_code == 404
+        handler.flush()
+        out = buf.getvalue()
+        assert _count(out, "/v1/ok") == 0
+        assert _count(out, "/v1/missing") == 1
+    finally:
+        _detach_buffer_logger(logger, handler)
+
+
+def test_slow_requests_are_always_logged():
+    client = TestClient(make_sampled_app({"logging": {"sample_rate": 0.0, "slow_ms": 0}}))
+    logger, buf, handler = _attach_buffer_logger()
+    try:
+        client.get("/v1/ok")
+        handler.flush()
+        assert _count(buf.getvalue(), "/v1/ok") == 1
+    finally:
+        _detach_buffer_logger(logger, handler)
+
+
+def test_route_template_rate_overrides_tenant_rate():
+    cfg = {"logging": {"sample_rate": 0.0, "routes": {"/v1/items/{id}": {"sample_rate": 1.0}}}}
+    client = TestClient(make_sampled_app(cfg))
+    logger, buf, handler = _attach_buffer_logger()
+    try:
+        client.get("/v1/items/1")
+        client.get("/v1/ok")
+        handler.flush()
+        out = buf.getvalue()
+        assert _count(out, "/v1/items/1") == 1
+        assert _count(out, "/v1/ok") == 0
+    finally:
+        _detach_buffer_logger(logger, handler)
+
+
+def test_sampled_lines_carry_sample_rate(monkeypatch):
+    monkeypatch.setattr("random.random", lambda: 0.0)
+    client = TestClient(make_sampled_app({"logging": {"sample_rate": 0.25}}))
+    logger, buf, handler = _attach_buffer_logger()
+    try:
+        client.get("/v1/ok")
+        handler.flush()
+        assert '"sample_rate": 0.25' in buf.getvalue()
+    finally:
+        _detach_buffer_logger(logger, handler)
@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+from services.shared.admin_guard import debug_features, sign_debug_token
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv("ADMIN_DEBUG_SECRET", "s3cr3t")
+
+
+def test_signed_token_grants_its_features():
+    token = sign_debug_token(["timing", "profile"], ttl_s=60)
+    assert debug_features(token) == {"timing", "profile"}
+
+
+def test_expired_or_tampered_tokens_grant_nothing():
+    token = sign_debug_token(["timing"], ttl_s=60)
+    assert debug_features(token, now=time.time() + 120) == frozenset()
+
+    _features, expires, sig = token.split(".")
+    assert debug_features(f"timing,profile.{expires}.{sig}") == frozenset()
+    assert debug_features("garbage") == frozenset()
+    assert debug_features(None) == frozenset()
+
+
+def test_without_secret_tokens_are_ignored(monkeypatch):
+    token = sign_debug_token(["timing"])
+    monkeypatch.delenv("ADMIN_DEBUG_SECRET")
+    assert debug_features(token) == frozenset()
+    with pytest.raises(RuntimeError):
+        sign_debug_token(["timing"])
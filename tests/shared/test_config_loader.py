@@ -0,0 +1,52 @@
+import pytest
+import yaml
+
+from services.shared import config_loader
+from services.shared.config_loader import clear_config_cache, load_config, thaw_config
+
+
+@pytest.fixture
+def tenants_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_loader, "BASE_DIR", tmp_path)
+    clear_config_cache()
+    (tmp_path / "7").mkdir()
+    yield tmp_path
+    clear_config_cache()
+
+
+def _write(path, data) -> None:
+    path.write_text(yaml.safe_dump(data), encoding="utf-8")
+
+
+def test_config_is_parsed_once_per_file_version(tenants_dir, monkeypatch):
+    cfg = tenants_dir / "7" / "config.yaml"
+    _write(cfg, {"limits": {"max_input_tokens": 10}})
+    calls = []
+    real = yaml.safe_load
+    monkeypatch.setattr(config_loader.yaml, "safe_load", lambda fh: calls.append(1) or real(fh))
+
+    first = load_config("7")
+    assert load_config("7") is first  # sem reler nem copiar
+    assert len(calls) == 1
+
+    _write(cfg, {"limits": {"max_input_tokens": 20, "max_batch_items": 5}})
+    assert load_config("7")["limits"]["max_input_tokens"] == 20
+    assert len(calls) == 2
+
+
+def test_config_is_read_only_and_thaws_to_a_private_copy(tenants_dir):
+    _write(tenants_dir / "7" / "config.yaml", {"cors": {"origins": ["https://a"]}})
+    cfg = load_config("7")
+    with pytest.raises(TypeError):
+        cfg["cors"]["origins"] = []
+    assert cfg["cors"]["origins"] == ("https://a",)
+
+    mine = thaw_config(cfg)
+    mine["cors"]["origins"].append("https://b")
+    assert load_config("7")["cors"]["origins"] == ("https://a",)
+
+
+def test_missing_config_raises(tenants_dir, monkeypatch):
+    monkeypatch.setattr("services.shared.config_provisioner.sync_from_db", lambda **kw: None)
+    with pytest.raises(FileNotFoundError):
+        load_config("404")
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+import services.shared.middleware.rate_limit as rl
+from services.shared import middleware_utils, tenant_repo
+from services.shared.admin_guard import sign_debug_token
+from services.shared.app_middleware import apply_middlewares
+from services.shared.config_loader import load_config, thaw_config
+from services.shared.gateway import GatewayPipeline
+from services.shared.tenant_context import TenantInfo
+
+
+@pytest.fixture(autouse=True)
+def stub_repo(monkeypatch):
+    def fake_find(api_key: str):
+        if api_key == "squad789":
+            return TenantInfo(id="3", name="Squad Inc", api_key=api_key, status="active")
+        return None
+
+    monkeypatch.setattr(tenant_repo, "find_tenant_by_api_key", fake_find)
+    rl._BUCKETS.clear()
+    yield
+    rl._BUCKETS.clear()
+
+
+def make_app(pipeline: GatewayPipeline | None = None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/ping")
+    def ping():
+        return {"ok": True}
+
+    if pipeline is None:
+        apply_middlewares(app)
+    else:
+        apply_middlewares(app, pipeline)
+    return app
+
+
+@pytest.mark.parametrize(
+    "stages,msg",
+    [
+        (("request_id", "auth", "auth"), "duplicate"),
+        (("auth", "config", "rate_limit", "rate_limit"), "duplicate"),
+        (("auth", "magic"), "unknown"),
+        (("config", "auth"), "requires"),
+        (("auth", "cors"), "requires"),
+    ],
+)
+def test_pipeline_rejects_invalid_definitions(stages, msg):
+    with pytest.raises(ValueError, match=msg):
+        GatewayPipeline(stages=stages)
+
+
+def test_apply_middlewares_twice_is_rejected():
+    app = make_app()
+    with pytest.raises(RuntimeError):
+        apply_middlewares(app)
+
+
+def test_single_pass_consumes_one_token_per_request():
+    c = TestClient(make_app())
+    origin = "https://app.squad.inc"  # permitido no config do tenant 3
+    r = c.get("/v1/ping", headers={"x-api-key": "squad789", "Origin": origin})
+    assert r.status_code == 200
+    assert r.headers["X-Tenant-Id"] == "3"
+    assert r.headers["X-Request-Id"]
+    assert r.headers["Access-Control-Allow-Origin"] == origin
+
+    # tenant 3: /v1/ping com rpm=60/burst=120 -> capacidade 120, sobra 119
+    tokens, *_rest = rl._BUCKETS["3:/v1/ping"]
+    assert int(tokens) == 119
+
+
+def test_short_circuit_keeps_gateway_headers():
+    c = TestClient(make_app())
+    r = c.get("/v1/ping", headers={"x-api-key": "squad789", "Origin": "https://evil.example"})
+    assert r.status_code == 403
+    assert r.headers["X-Tenant-Id"] == "3"
+    assert r.headers["X-Request-Id"]
+
+
+def test_custom_pipeline_without_rate_limit():
+    c = TestClient(make_app(GatewayPipeline(stages=("request_id", "auth", "config"))))
+    for _ in range(3):
+        assert c.get("/v1/ping", headers={"x-api-key": "squad789"}).status_code == 200
+    assert rl._BUCKETS == {}
+
+
+def test_server_timing_is_off_by_default():
+    c = TestClient(make_app())
+    r = c.get("/v1/ping", headers={"x-api-key": "squad789"})
+    assert r.status_code == 200
+    assert "Server-Timing" not in r.headers
+
+
+def test_server_timing_with_signed_debug_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_DEBUG_SECRET", "s3cr3t")
+    c = TestClient(make_app())
+    token = sign_debug_token(["timing"])
+    r = c.get("/v1/ping", headers={"x-api-key": "squad789", "X-Debug-Token": token})
+
+    names = [part.split(";")[0] for part in r.headers["Server-Timing"].split(", ")]
+    assert names == [
+        "request_id",
+        "profile",
+        "auth",
+        "config",
+        "body_limit",
+        "rate_limit",
+        "concurrency",
+        "cors",
+        "app",
+    ]
+
+    # token adulterado não liga o header
+    r = c.get("/v1/ping", headers={"x-api-key": "squad789", "X-Debug-Token": token + "0"})
+    assert "Server-Timing" not in r.headers
+
+
+def test_server_timing_enabled_per_tenant(monkeypatch):
+    cfg = thaw_config(load_config("3"))
+    cfg["diagnostics"] = {"server_timing": True}
+    monkeypatch.setattr(middleware_utils, "load_config", lambda slug: cfg)
+    c = TestClient(make_app())
+    r = c.get("/v1/ping", headers={"x-api-key": "squad789"})
+    assert "auth;dur=" in r.headers["Server-Timing"]
+
+    # short-circuit (401) ainda sem tenant: só os estágios que rodaram
+    r = c.get("/v1/ping")
+    assert r.status_code == 401
+    assert "Server-Timing" not in r.headers
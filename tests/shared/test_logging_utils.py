@@ -0,0 +1,210 @@
+# tests/shared/test_logging_utils.py
+from __future__ import annotations
+
+import io
+import json
+import logging
+import sys
+import threading
+
+import pytest
+
+from services.shared import logging_utils
+from services.shared.logging_utils import (
+    JsonFormatter,
+    LogThrottle,
+    QueuedStreamHandler,
+    log_fields,
+    log_throttled,
+    report_suppressed,
+)
+
+
+class GatedStream(io.StringIO):
+    """Stream cuja escrita fica travada até `gate` abrir (simula back-pressure)."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = threading.Event()
+        self.writes = 0
+
+    def write(self, s: str) -> int:
+        self.gate.wait(timeout=5)
+        self.writes += 1
+        return super().write(s)
+
+
+def _logger(handler: logging.Handler, name: str) -> logging.Logger:
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_close_flushes_everything_in_order():
+    buf = io.StringIO()
+    h = QueuedStreamHandler(buf, maxsize=1000, batch_size=16)
+    log = _logger(h, "test.queued.order")
+    for i in range(100):
+        log.info("line", extra={"__extra__": {"i": i}})
+    h.close()
+
+    assert [rec["i"] for rec in _lines(buf)] == list(range(100))
+
+
+def test_drop_policy_counts_and_reports_overflow():
+    stream = GatedStream()
+    h = QueuedStreamHandler(stream, maxsize=5, batch_size=1, overflow="drop")
+    log = _logger(h, "test.queued.drop")
+
+    for i in range(50):  # writer travado: a fila enche e o resto é descartado
+        log.info("line", extra={"__extra__": {"i": i}})
+    assert h.dropped > 0
+
+    stream.gate.set()
+    h.close()
+
+    recs = _lines(stream)
+    report = [r for r in recs if r["message"] == "log.dropped"]
+    assert sum(r["dropped"] for r in report) == h.dropped
+    assert len(recs) - len(report) + h.dropped == 50
+
+
+def test_block_policy_never_drops():
+    stream = GatedStream()
+    h = QueuedStreamHandler(stream, maxsize=2, batch_size=1, overflow="block")
+    log = _logger(h, "test.queued.block")
+
+    producer = threading.Thread(target=lambda: [log.info("x") for _ in range(20)])
+    producer.start()
+    producer.join(timeout=0.2)
+    assert producer.is_alive()  # bloqueado pela fila cheia
+
+    stream.gate.set()
+    producer.join(timeout=5)
+    h.flush()
+    assert len(_lines(stream)) == 20
+    assert h.dropped == 0
+    h.close()
+
+
+def test_batches_multiple_records_per_write():
+    stream = GatedStream()
+    h = QueuedStreamHandler(stream, maxsize=1000, batch_size=100)
+    log = _logger(h, "test.queued.batch")
+    for _ in range(50):
+        log.info("x")
+    stream.gate.set()
+    h.flush()
+    assert len(_lines(stream)) == 50
+    assert stream.writes < 50
+    h.close()
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        QueuedStreamHandler(io.StringIO(), overflow="explode")
+
+
+def _record(extra: dict | None = None, exc_info=None) -> logging.LogRecord:
+    rec = logging.LogRecord("access", logging.INFO, __file__, 1, "request.end", (), exc_info)
+    if extra is not None:
+        rec.__extra__ = extra
+    return rec
+
+
+def test_fast_path_matches_dict_path():
+    fmt = JsonFormatter()
+    rec = _record({"path": "/v1/ok", "status": 200, "name": "Olá"})
+    fast = fmt.format(rec)
+    assert fast == fmt._format_dict(rec, rec.__extra__)
+    assert '"path": "/v1/ok"' in fast and '"status": 200' in fast
+
+
+def test_extras_overriding_base_keys_keep_old_semantics():
+    fmt = JsonFormatter()
+    out = json.loads(fmt.format(_record({"message": "override"})))
+    assert out["message"] == "override"
+
+
+def test_exception_fields_are_kept():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        out = json.loads(JsonFormatter().format(_record({"a": 1}, exc_info=sys.exc_info())))
+    assert out["exc_type"] == "RuntimeError"
+    assert "boom" in out["exc_text"]
+
+
+def test_orjson_encoder_produces_same_payload():
+    pytest.importorskip("orjson")
+    rec = _record({"path": "/v1/ok", "status": 200})
+    assert json.loads(JsonFormatter(encoder="orjson").format(rec)) == json.loads(
+        JsonFormatter().format(rec)
+    )
+
+
+def test_log_fields_builds_single_record():
+    buf = io.StringIO()
+    h = logging.StreamHandler(buf)
+    log = _logger(h, "test.log_fields")
+    fields = {"request_id": "r1", "status": 200}
+    log_fields(log, logging.INFO, "request.end", fields)
+    log_fields(log, logging.DEBUG, "ignored", fields)  # abaixo do nível
+
+    (rec,) = _lines(buf)
+    assert rec["message"] == "request.end"
+    assert rec["request_id"] == "r1" and rec["status"] == 200
+
+
+def test_throttle_suppresses_repeats_and_reports_counts():
+    t = LogThrottle(window_s=10.0)
+    assert t.allow("k", 0.0) == (True, 0)
+    for now in (1.0, 2.0, 3.0):
+        assert t.allow("k", now) == (False, 0)
+    assert t.allow("other", 3.0) == (True, 0)  # chaves independentes
+
+    # nova janela: passa e carrega o total suprimido na anterior
+    assert t.allow("k", 10.5) == (True, 3)
+
+    t.allow("k", 11.0)
+    t.allow("k", 12.0)
+    assert t.expired(15.0) == []  # janela ainda aberta
+    assert t.expired(25.0) == [("k", 2)]
+
+
+def test_log_throttled_emits_once_per_window(monkeypatch):
+    monkeypatch.setattr(logging_utils, "_throttle", LogThrottle(window_s=60.0))
+    buf = io.StringIO()
+    log = _logger(logging.StreamHandler(buf), "test.throttled")
+    for _ in range(10):
+        log_throttled(log, logging.ERROR, "tenant.repo_unavailable", {"path": "/v1/ping"})
+    report_suppressed(log, force=True)
+
+    recs = _lines(buf)
+    assert [r["message"] for r in recs] == ["tenant.repo_unavailable", "log.suppressed"]
+    assert recs[1]["suppressed"] == 9
+
+
+class BrokenStream(io.StringIO):
+    def write(self, s: str) -> int:
+        raise OSError("disco cheio")
+
+
+def test_failed_write_is_counted_and_reported_with_traceback(capsys):
+    h = QueuedStreamHandler(BrokenStream(), maxsize=100, batch_size=100)
+    log = _logger(h, "test.queued.broken")
+    for _ in range(3):
+        log.info("line")
+    h.close()
+
+    assert h.dropped == 3
+    err = capsys.readouterr().err
+    assert "falha ao escrever lote" in err
+    assert "OSError: disco cheio" in err  # traceback, não só a mensagem
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from services.shared.loop_monitor import LoopLagMonitor
+from services.shared.metrics import LOOP_BLOCKED
+
+
+def _blocking_call() -> None:
+    time.sleep(0.3)  # simula psycopg/YAML síncrono dentro de código async
+
+
+def test_lag_is_measured_and_fails_readiness():
+    async def scenario() -> LoopLagMonitor:
+        mon = LoopLagMonitor("svc-lag", interval_s=0.01, threshold_s=0.1, ready_max_s=0.2)
+        mon.start()
+        await asyncio.sleep(0.05)
+        assert mon.healthy()
+        _blocking_call()
+        await asyncio.sleep(0.05)
+        await mon.stop()
+        return mon
+
+    before = LOOP_BLOCKED.value("svc-lag")
+    mon = asyncio.run(scenario())
+    assert max(mon.recent) >= 0.25
+    assert not mon.healthy()
+    assert LOOP_BLOCKED.value("svc-lag") == before + 1
+
+
+def test_debug_watchdog_captures_blocking_stack():
+    async def scenario() -> LoopLagMonitor:
+        mon = LoopLagMonitor("svc-dbg", interval_s=0.01, threshold_s=0.05, debug=True)
+        mon.start()
+        await asyncio.sleep(0.03)
+        _blocking_call()
+        await asyncio.sleep(0.03)
+        await mon.stop()
+        return mon
+
+    mon = asyncio.run(scenario())
+    assert len(mon.blocked_stacks) == 1  # uma captura por travamento
+    leafs = mon.blocked_stacks[0][:3]
+    assert any("_blocking_call" in frame for frame in leafs)
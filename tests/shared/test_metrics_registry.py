@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.shared.metrics import OTHER_LABEL, LabelBudget, MetricsRegistry, _Metric
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    reg = MetricsRegistry()
+    c = reg.counter("reqs_total", "Requests.", ("tenant",))
+    h = reg.histogram("lat_seconds", "Latency.", ("tenant",), buckets=(0.1, 1.0))
+
+    c.inc("1")
+    c.inc("1", amount=2)
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, "1")
+
+    out = reg.render()
+    assert "# TYPE reqs_total counter" in out
+    assert 'reqs_total{tenant="1"} 3' in out
+    # buckets cumulativos, `le` inclusivo
+    assert 'lat_seconds_bucket{tenant="1",le="0.1"} 2' in out
+    assert 'lat_seconds_bucket{tenant="1",le="1"} 3' in out
+    assert 'lat_seconds_bucket{tenant="1",le="+Inf"} 4' in out
+    assert 'lat_seconds_count{tenant="1"} 4' in out
+    assert 'lat_seconds_sum{tenant="1"} 3.65' in out
+
+
+def test_label_values_are_escaped():
+    reg = MetricsRegistry()
+    reg.counter("x_total", "X.", ("route",)).inc('/a"b\\c')
+    assert 'x_total{route="/a\\"b\\\\c"} 1' in reg.render()
+
+
+def test_tenant_budget_collapses_excess_tenants():
+    reg = MetricsRegistry()
+    c = reg.counter("reqs_total", "Requests.", ("tenant",), budgets={"tenant": LabelBudget(3)})
+    for i in range(10_000):
+        c.inc(str(i))
+
+    assert c.series_count() == 4
+    assert c.value("0") == 1
+    assert c.value(OTHER_LABEL) == 10_000 - 3
+
+
+def test_max_series_is_a_hard_cap():
+    reg = MetricsRegistry()
+    c = reg.counter("reqs_total", "Requests.", ("route", "status"), max_series=5)
+    for i in range(100):
+        c.inc(f"/r{i}", "200")
+
+    assert c.series_count() == 6  # 5 + a série de overflow
+    assert c.value(OTHER_LABEL, OTHER_LABEL) == 95
+
+
+def test_duplicate_metric_name_is_rejected():
+    reg = MetricsRegistry()
+    reg.counter("dup_total", "A.")
+    try:
+        reg.counter("dup_total", "B.")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_updates_from_many_threads_are_not_lost():
+    reg = MetricsRegistry()
+    c = reg.counter("t_total", "T.", ("k",))
+    h = reg.histogram("t_seconds", "T.", ("k",), buckets=(1.0,))
+
+    def work() -> None:
+        for _ in range(5000):
+            c.inc("a")
+            h.observe(0.5, "a")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(8):
+            pool.submit(work)
+    assert c.value("a") == 40_000
+    assert h.count("a") == 40_000
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("x", "X.")
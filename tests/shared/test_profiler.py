@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from services.shared.admin_guard import sign_debug_token
+from services.shared.app_middleware import apply_middlewares
+from services.shared.profiler import (
+    RequestProfile,
+    StackSampler,
+    collapse,
+    profiler_router,
+    summarize,
+)
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_sees_busy_thread_and_collapses():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    sampler = StackSampler(interval_s=0.001).start()
+    time.sleep(0.05)
+    stacks = sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert sampler.samples > 0
+    text = collapse(stacks)
+    hot = [line for line in text.splitlines() if f"{__name__}:_busy_loop" in line]
+    assert hot
+    stack, count = hot[0].rsplit(" ", 1)
+    assert stack.startswith("threading:")  # raiz -> folha
+    assert int(count) >= 1
+    assert summarize(stacks, sampler.samples).startswith(f"samples={sampler.samples}")
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow():
+        time.sleep(0.02)
+        return {"ok": True}
+
+    app.include_router(profiler_router)
+    apply_middlewares(app)
+    return app
+
+
+def test_profile_endpoint_is_admin_guarded(monkeypatch):
+    monkeypatch.setenv("ENV", "prod")
+    monkeypatch.delenv("ADMIN_ROUTES_ENABLED", raising=False)
+    c = TestClient(make_app())
+    assert c.get("/admin/profile", params={"seconds": 0.01}).status_code == 403
+
+
+def test_profile_endpoint_returns_collapsed_stacks(monkeypatch):
+    monkeypatch.setenv("ENV", "dev")
+    c = TestClient(make_app())
+    r = c.get("/admin/profile", params={"seconds": 0.05, "interval_ms": 1})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    line = r.text.splitlines()[0]
+    assert ";" in line and line.rsplit(" ", 1)[1].isdigit()
+
+    assert c.get("/admin/profile", params={"seconds": 3600}).status_code == 422
+
+
+@pytest.mark.parametrize("features,expected", [(["profile"], True), (["timing"], False)])
+def test_per_request_profile_summary(monkeypatch, features, expected):
+    monkeypatch.setenv("ADMIN_DEBUG_SECRET", "s3cr3t")
+    c = TestClient(make_app())
+    r = c.get("/slow", headers={"X-Debug-Token": sign_debug_token(features)})
+    assert r.status_code == 200
+    assert ("X-Profile-Summary" in r.headers) is expected
+    if expected:
+        assert r.headers["X-Profile-Summary"].startswith("samples=")
+
+
+def test_request_profile_ignores_other_tasks():
+    async def main() -> str:
+        profile = RequestProfile()
+        stop = asyncio.Event()
+
+        async def other_request() -> None:
+            while not stop.is_set():
+                sum(range(1000))  # ocupa o loop fora da task perfilada
+                await asyncio.sleep(0)
+
+        other = asyncio.create_task(other_request())
+        await asyncio.sleep(0.05)
+        stop.set()
+        await other
+        return profile.finish()
+
+    summary = asyncio.run(main())
+    assert "other_request" not in summary
+    attributed, total = summary.split(",")[0].removeprefix("samples=").split("/")
+    assert int(total) > 0 and int(attributed) < int(total)
@@ -0,0 +1,54 @@
+import pytest
+from fastapi import FastAPI
+from starlette.requests import Request
+from starlette.testclient import TestClient
+
+from services.shared.app_middleware import apply_middlewares
+from services.shared.middleware_utils import build_route_classifier
+from services.shared.route_classifier import RouteClass, RouteClassifier
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/", RouteClass.PUBLIC),
+        ("/health", RouteClass.PUBLIC),
+        ("/readiness", RouteClass.PUBLIC),
+        ("/static/app.js", RouteClass.PUBLIC),
+        ("/analyze", RouteClass.PUBLIC),
+        ("/openapi.json", RouteClass.DOCS),
+        ("/docs", RouteClass.DOCS),
+        ("/docs/oauth2-redirect", RouteClass.DOCS),
+        ("/redoc", RouteClass.DOCS),
+        ("/v1/ping", RouteClass.V1_PROTECTED),
+        ("/v1", RouteClass.PUBLIC),
+    ],
+)
+def test_default_classifier(path, expected):
+    assert build_route_classifier().classify(path) is expected
+
+
+def test_open_v1_and_precedence():
+    c = RouteClassifier(
+        public_paths={"/v1/status"},
+        public_prefixes=("/v1/public",),
+        open_v1={"/v1/open", "/not-v1"},
+    )
+    assert c.classify("/v1/open") is RouteClass.V1_OPEN
+    assert c.classify("/not-v1") is RouteClass.PUBLIC
+    assert c.classify("/v1/status") is RouteClass.PUBLIC  # bypass vence /v1
+    assert c.classify("/v1/public/x") is RouteClass.PUBLIC
+    assert c.classify("/v1/other") is RouteClass.V1_PROTECTED
+    assert RouteClass.V1_OPEN.is_v1 and not RouteClass.DOCS.is_v1
+
+
+def test_gateway_tags_request_once():
+    app = FastAPI()
+
+    @app.get("/health")
+    def health(request: Request):
+        return {"route_class": request.state.route_class}
+
+    apply_middlewares(app)
+    r = TestClient(app).get("/health")
+    assert r.json() == {"route_class": "public"}
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, FastAPI
+
+from services.shared.route_matcher import RouteMatcher, _matcher_for_app, compile_templates
+
+
+def test_static_and_dynamic_templates():
+    m = RouteMatcher(["/v1/ping", "/v1/items/{item_id}", "/v1/files/{rest:path}"])
+    assert m.match("/v1/ping") == "/v1/ping"
+    assert m.match("/v1/items/42") == "/v1/items/{item_id}"
+    assert m.match("/v1/files/a/b/c.txt") == "/v1/files/{rest:path}"
+    assert m.match("/v1/items/42/extra") is None
+    assert m.match("/v2/ping") is None
+
+
+def test_converters_are_respected():
+    m = RouteMatcher(["/v1/items/{item_id:int}"])
+    assert m.match("/v1/items/7") == "/v1/items/{item_id:int}"
+    assert m.match("/v1/items/abc") is None
+
+
+def test_compile_templates_is_cached():
+    assert compile_templates(("/a", "/b/{x}")) is compile_templates(("/a", "/b/{x}"))
+
+
+def test_app_matcher_sees_included_routers():
+    app = FastAPI()
+    v1 = APIRouter(prefix="/v1")
+
+    @v1.get("/items/{item_id}")
+    def item(item_id: str):
+        return {}
+
+    app.include_router(v1)
+    app.include_router(v1, prefix="/api")
+
+    m = _matcher_for_app(app)
+    assert m is not None
+    assert m.match("/v1/items/1") == "/v1/items/{item_id}"
+    assert m.match("/api/v1/items/1") == "/api/v1/items/{item_id}"
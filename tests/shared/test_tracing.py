@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+import services.shared.middleware.rate_limit as rl
+from services.shared import middleware_utils, tenant_repo, tracing
+from services.shared.app_middleware import apply_middlewares
+from services.shared.config_loader import load_config, thaw_config
+from services.shared.tenant_context import TenantInfo
+from services.shared.tracing import BatchSpanExporter, FileSpanSink, OtlpHttpSink, span
+
+
+@pytest.fixture(autouse=True)
+def stub_repo(monkeypatch):
+    def fake_find(api_key: str):
+        if api_key == "squad789":
+            with tracing.db_span("SELECT", "tenants_api_keys"):
+                return TenantInfo(id="3", name="Squad Inc", api_key=api_key, status="active")
+        return None
+
+    monkeypatch.setattr(tenant_repo, "find_tenant_by_api_key", fake_find)
+    rl._BUCKETS.clear()
+
+
+@pytest.fixture
+def spans_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(BatchSpanExporter(FileSpanSink(str(path)), interval_s=0.01))
+    yield path
+    tracing.configure(None)
+
+
+def _read(path) -> list[dict]:
+    tracing.flush_traces()
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def make_client(sample_rate: float | None, monkeypatch) -> TestClient:
+    cfg = thaw_config(load_config("3"))
+    cfg["tracing"] = {"sample_rate": sample_rate}
+    monkeypatch.setattr(middleware_utils, "load_config", lambda slug: cfg)
+
+    app = FastAPI()
+
+    @app.get("/v1/items/{item_id}")
+    def item(item_id: str):
+        with span("work", {"item": item_id}):
+            return {"id": item_id}
+
+    apply_middlewares(app, service="svc-test")
+    return TestClient(app)
+
+
+def test_sampled_request_exports_stage_db_and_handler_spans(spans_file, monkeypatch):
+    c = make_client(1.0, monkeypatch)
+    r = c.get("/v1/items/7", headers={"x-api-key": "squad789"})
+    assert r.status_code == 200
+
+    spans = {s["name"]: s for s in _read(spans_file)}
+    root = spans["http.request"]
+    assert root["service"] == "svc-test"
+    assert root["attributes"]["tenant.id"] == "3"
+    assert root["attributes"]["http.status_code"] == 200
+    assert r.headers["traceparent"] == f"00-{root['trace_id']}-{root['span_id']}-01"
+
+    for stage in ("request_id", "auth", "config", "rate_limit", "cors"):
+        assert spans[f"gateway.{stage}"]["parent_id"] == root["span_id"]
+    assert spans["db.select"]["parent_id"] == spans["gateway.auth"]["span_id"]
+    assert spans["handler"]["attributes"]["http.route"] == "/v1/items/{item_id}"
+    assert spans["work"]["parent_id"] == spans["handler"]["span_id"]
+    assert {s["trace_id"] for s in spans.values()} == {root["trace_id"]}
+
+
+def test_tenant_sample_rate_zero_exports_nothing(spans_file, monkeypatch):
+    c = make_client(0.0, monkeypatch)
+    r = c.get("/v1/items/7", headers={"x-api-key": "squad789"})
+    assert r.status_code == 200
+    assert "traceparent" not in r.headers
+    assert _read(spans_file) == []
+
+
+def test_incoming_traceparent_is_continued(spans_file, monkeypatch):
+    c = make_client(0.0, monkeypatch)  # o "sampled" do chamador prevalece
+    trace_id, parent = "ab" * 16, "cd" * 8
+    c.get(
+        "/v1/items/7",
+        headers={"x-api-key": "squad789", "traceparent": f"00-{trace_id}-{parent}-01"},
+    )
+
+    spans = {s["name"]: s for s in _read(spans_file)}
+    assert spans["http.request"]["trace_id"] == trace_id
+    assert spans["http.request"]["parent_id"] == parent
+
+
+def test_tracing_disabled_is_a_noop(monkeypatch):
+    tracing.configure(None)
+    c = make_client(1.0, monkeypatch)
+    r = c.get("/v1/items/7", headers={"x-api-key": "squad789"})
+    assert r.status_code == 200
+    assert "traceparent" not in r.headers
+
+
+def test_otlp_encoding_groups_spans_by_service():
+    trace = tracing.Trace("svc", "ab" * 16, None, True)
+    with tracing._SpanScope(trace, None, "root", {"n": 1, "ok": True}):
+        pass
+    body = OtlpHttpSink.encode([trace])
+    (resource,) = body["resourceSpans"]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "svc"}
+    (otlp_span,) = resource["scopeSpans"][0]["spans"]
+    assert otlp_span["traceId"] == "ab" * 16
+    assert otlp_span["attributes"] == [
+        {"key": "n", "value": {"intValue": "1"}},
+        {"key": "ok", "value": {"boolValue": True}},
+    ]
+    assert otlp_span["status"] == {"code": 1}
+
+
+class _BrokenSink:
+    def write(self, traces) -> None:
+        raise ConnectionError("collector fora")
+
+
+def test_failed_export_is_counted_and_reported(capsys):
+    exporter = BatchSpanExporter(_BrokenSink(), interval_s=0.01)
+    for _ in range(2):
+        exporter.submit(object())
+    exporter.flush()
+    exporter.close()
+
+    assert exporter.dropped == 2
+    err = capsys.readouterr().err
+    assert "falha ao exportar lote" in err
+    assert "ConnectionError: collector fora" in err